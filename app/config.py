@@ -23,6 +23,178 @@ def get_optional_key_from_env(provider_key: str) -> str | None:
 
 # Removed previous key-getting functions that stopped execution
 
-# Keeping file in case other shared config is needed later
+# --- Storage Configuration ---
+# Defaults keep everything in local files under ./tmp (single process). For multi-process
+# or multi-node deployments point memory/storage and the vector DB at a shared server, e.g.
+#   AGNO_STORAGE_BACKEND=postgres AGNO_VECTOR_BACKEND=pgvector
+#   AGNO_DB_URL=postgresql+psycopg://ai:ai@localhost:5532/ai
+STORAGE_BACKENDS = ("sqlite", "postgres")
+VECTOR_BACKENDS = ("lancedb", "pgvector")
 
-# No configuration needed from this file currently. 
\ No newline at end of file
+def get_storage_config() -> dict:
+    """Reads the storage backend settings from the environment."""
+    data_dir = os.getenv("AGNO_DATA_DIR", "tmp")
+    config = {
+        "data_dir": data_dir,
+        "storage_backend": os.getenv("AGNO_STORAGE_BACKEND", "sqlite").lower(),
+        "vector_backend": os.getenv("AGNO_VECTOR_BACKEND", "lancedb").lower(),
+        "db_url": os.getenv("AGNO_DB_URL"),
+        "db_schema": os.getenv("AGNO_DB_SCHEMA", "ai"),
+        "sqlite_file": os.path.join(data_dir, "agent_memory.db"),
+        "lancedb_uri": os.getenv("AGNO_LANCEDB_URI", os.path.join(data_dir, "lancedb")),
+    }
+    if config["storage_backend"] not in STORAGE_BACKENDS:
+        raise ValueError(f"AGNO_STORAGE_BACKEND must be one of {STORAGE_BACKENDS}, got {config['storage_backend']!r}")
+    if config["vector_backend"] not in VECTOR_BACKENDS:
+        raise ValueError(f"AGNO_VECTOR_BACKEND must be one of {VECTOR_BACKENDS}, got {config['vector_backend']!r}")
+    if config["storage_backend"] == "postgres" or config["vector_backend"] == "pgvector":
+        if not config["db_url"]:
+            raise ValueError("AGNO_DB_URL is required for the postgres/pgvector backends.")
+    return config 
+
+# --- HTTP Connection Pool Configuration ---
+# One pooled HTTP client per provider is shared by every model instance (see app/http_pool.py)
+def get_http_pool_config() -> dict:
+    """Reads the provider HTTP client pool limits from the environment."""
+    return {
+        "max_connections": int(os.getenv("AGNO_HTTP_MAX_CONNECTIONS", "100")),
+        "max_keepalive_connections": int(os.getenv("AGNO_HTTP_MAX_KEEPALIVE", "20")),
+        "keepalive_expiry": float(os.getenv("AGNO_HTTP_KEEPALIVE_EXPIRY", "60")),
+        "connect_timeout": float(os.getenv("AGNO_HTTP_CONNECT_TIMEOUT", "10")),
+        "timeout": float(os.getenv("AGNO_HTTP_TIMEOUT", "600")),  # Long completions stream for minutes
+        "http2": os.getenv("AGNO_HTTP2", "1").lower() not in ("0", "false", "no"),
+    }
+
+
+# --- Model Call Resilience Configuration ---
+# Used when "Resilient Model Calls" is on (see app/resilience.py)
+def get_resilience_config() -> dict:
+    """Reads model call timeouts, retry, hedging and failover settings from the environment."""
+    return {
+        "timeout": float(os.getenv("AGNO_MODEL_TIMEOUT", "120")),                    # Whole non-streamed call
+        "first_token_timeout": float(os.getenv("AGNO_MODEL_FIRST_TOKEN_TIMEOUT", "30")),
+        "idle_timeout": float(os.getenv("AGNO_MODEL_IDLE_TIMEOUT", "60")),           # Gap between streamed chunks
+        "max_retries": int(os.getenv("AGNO_MODEL_MAX_RETRIES", "2")),
+        "backoff_base": float(os.getenv("AGNO_MODEL_BACKOFF_BASE", "0.5")),
+        "backoff_max": float(os.getenv("AGNO_MODEL_BACKOFF_MAX", "8")),
+        "hedge": os.getenv("AGNO_MODEL_HEDGE", "1").lower() not in ("0", "false", "no"),
+        "hedge_delay": float(os.getenv("AGNO_MODEL_HEDGE_DELAY", "3")),              # Until enough TTFT samples exist
+        # Non-streamed calls (memory, summaries) hedge past their own p95 only, unless this is set
+        "hedge_call_delay": float(os.environ["AGNO_MODEL_HEDGE_CALL_DELAY"]) if os.getenv("AGNO_MODEL_HEDGE_CALL_DELAY") else None,
+        "failover": os.getenv("AGNO_MODEL_FAILOVER", "1").lower() not in ("0", "false", "no"),
+    }
+
+
+# --- Knowledge Configuration ---
+# Tables the agent searches by default (see app/knowledge.py); the sidebar can pick others
+def get_knowledge_config() -> dict:
+    """Reads the knowledge tables and multi-table search settings from the environment."""
+    tables = [name.strip() for name in os.getenv("AGNO_KNOWLEDGE_TABLES", "recipes").split(",") if name.strip()]
+    return {
+        "tables": tables or ["recipes"],
+        "fusion": os.getenv("AGNO_KNOWLEDGE_FUSION", "distance").lower(),  # "distance" or "rrf"
+        "table_timeout": float(os.getenv("AGNO_KNOWLEDGE_TABLE_TIMEOUT", "5")),
+    }
+
+
+# --- User Memory Retrieval Configuration ---
+# Used when "Top-k Memories" is on (see app/memory_index.py)
+def get_memory_retrieval_config() -> dict:
+    """Reads the top-k memory retrieval and duplicate-merging settings from the environment."""
+    return {
+        "top_k": int(os.getenv("AGNO_MEMORY_TOP_K", "5")),
+        "min_score": float(os.getenv("AGNO_MEMORY_MIN_SCORE", "0.2")),
+        "dedup_threshold": float(os.getenv("AGNO_MEMORY_DEDUP_THRESHOLD", "0.92")),
+    }
+
+
+# --- Vector Storage Configuration ---
+# Layout of newly created knowledge tables (see app/vector_storage.py); existing tables keep theirs
+def get_vector_storage_config() -> dict:
+    """Reads the compact vector storage settings for new knowledge tables from the environment."""
+    return {
+        "dtype": os.getenv("AGNO_VECTOR_DTYPE", "float32").lower(),    # "float32", "float16" or "int8"
+        "dims": int(os.getenv("AGNO_VECTOR_DIMS", "0")) or None,        # Truncate to this many dimensions
+        "keep_full": os.getenv("AGNO_VECTOR_KEEP_FULL", "1").lower() not in ("0", "false", "no"),
+    }
+
+
+# --- Ingestion Dedup Configuration ---
+# Near-duplicate chunks are dropped before embedding (see app/dedup.py)
+def get_dedup_config() -> dict:
+    """Reads the near-duplicate chunk filter settings from the environment."""
+    return {
+        "threshold": float(os.getenv("AGNO_INGEST_DEDUP_THRESHOLD", "0.9")),  # 0 disables the filter
+        "num_perm": int(os.getenv("AGNO_INGEST_DEDUP_PERMUTATIONS", "128")),
+        "shingle_words": int(os.getenv("AGNO_INGEST_DEDUP_SHINGLE", "5")),
+    }
+
+
+# --- Tool Result Compaction Configuration ---
+# Used when "Compact Tool Results" is on (see app/tool_compaction.py)
+def get_tool_compaction_config() -> dict:
+    """Reads the tool result compaction mode and budgets from the environment."""
+    return {
+        "mode": os.getenv("AGNO_TOOL_COMPACT_MODE", "auto").lower(),  # auto, fields, summary or truncate
+        "max_tokens": int(os.getenv("AGNO_TOOL_COMPACT_MAX_TOKENS", "800")),
+        "field_chars": int(os.getenv("AGNO_TOOL_COMPACT_FIELD_CHARS", "300")),
+        "max_items": int(os.getenv("AGNO_TOOL_COMPACT_MAX_ITEMS", "5")),
+    }
+
+
+# --- Background Jobs Configuration ---
+# Worker pool for summaries, ingestion and table compaction (see app/jobs.py)
+def get_jobs_config() -> dict:
+    """Reads the background job worker count and status history size from the environment."""
+    return {
+        "workers": int(os.getenv("AGNO_JOB_WORKERS", "2")),
+        "history": int(os.getenv("AGNO_JOB_HISTORY", "100")),
+    }
+
+
+# --- Turn Scheduler Configuration ---
+# Admission control in front of every agent turn (see app/scheduler.py)
+def get_scheduler_config() -> dict:
+    """Reads the in-flight limits, queue bounds and per-provider rate limits from the environment."""
+    # Per-provider overrides, e.g. AGNO_SCHEDULER_RATE_OPENAI=2 (turns/second per API key)
+    prefix = "AGNO_SCHEDULER_RATE_"
+    provider_rates = {name[len(prefix):].lower(): float(value) for name, value in os.environ.items() if name.startswith(prefix) and value}
+    return {
+        "enabled": os.getenv("AGNO_SCHEDULER", "1").lower() not in ("0", "false", "no"),
+        "max_in_flight": int(os.getenv("AGNO_SCHEDULER_MAX_IN_FLIGHT", "16")),
+        "max_per_user": int(os.getenv("AGNO_SCHEDULER_MAX_PER_USER", "2")),
+        "max_queue": int(os.getenv("AGNO_SCHEDULER_MAX_QUEUE", "200")),
+        "max_wait": float(os.getenv("AGNO_SCHEDULER_MAX_WAIT", "120")),
+        "rate": float(os.getenv("AGNO_SCHEDULER_RATE", "0")),      # Turns/second per provider key; 0 = unlimited
+        "burst": float(os.getenv("AGNO_SCHEDULER_BURST", "0")) or None,
+        "provider_rates": provider_rates,
+    }
+
+
+# --- Knowledge Context Packing Configuration ---
+# Used when "Pack Knowledge Context" is on (see app/context_packing.py)
+def get_context_packing_config() -> dict:
+    """Reads the retrieved-context budget and MMR settings from the environment."""
+    return {
+        "budget_tokens": int(os.getenv("AGNO_CONTEXT_BUDGET", "0")),   # 0 = per-model default
+        "mmr_lambda": float(os.getenv("AGNO_CONTEXT_MMR_LAMBDA", "0.7")),
+        "candidate_factor": int(os.getenv("AGNO_CONTEXT_CANDIDATES", "3")),
+        "merge": os.getenv("AGNO_CONTEXT_MERGE", "1").lower() not in ("0", "false", "no"),
+    }
+
+
+# --- Embedder Configuration ---
+# Embedder of every vector DB made by app/storage.py (see app/embedders.py)
+EMBEDDERS = ("openai", "local")
+
+def get_embedder_config() -> dict:
+    """Reads the knowledge embedder choice and the local model settings from the environment."""
+    embedder = os.getenv("AGNO_EMBEDDER", "openai").lower()
+    if embedder not in EMBEDDERS:
+        raise ValueError(f"AGNO_EMBEDDER must be one of {EMBEDDERS}, got {embedder!r}")
+    return {
+        "embedder": embedder,
+        "model_path": os.getenv("AGNO_EMBEDDER_MODEL", os.path.join("models", "embedder.npz")),  # .npz file or ONNX model directory
+        "batch_size": int(os.getenv("AGNO_EMBEDDER_BATCH_SIZE", "64")),
+        "workers": int(os.getenv("AGNO_EMBEDDER_WORKERS", "2")),
+    }
@@ -0,0 +1,246 @@
+# app/context_packing.py
+# Packing knowledge search results into a per-model token budget.
+#
+# ContextPacker is installed as the agent's agno `retriever`, so it runs wherever agno
+# fetches knowledge (the search_knowledge_base tool and references). It asks the
+# knowledge for `candidate_factor` times more hits than usual, then:
+#   1. picks chunks by maximal marginal relevance (MMR): relevance to the query minus
+#      similarity to chunks already picked, computed with numpy on the vectors the
+#      search returned (word overlap stands in when a backend returns none)
+#   2. stops when the next chunk no longer fits the model's context budget, or when
+#      the usual number of documents is reached
+#   3. merges picked chunks that are adjacent in the same document into one, dropping
+#      the overlap app/ingest.py repeats between neighbouring chunks
+# The result is fewer, less redundant tokens in the prompt for the same answers.
+
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .knowledge import TableHit, hit_document
+from .memory_index import estimate_tokens
+
+# --- Constants ---
+# Retrieved-context budget in tokens, by model id prefix (first match wins)
+MODEL_CONTEXT_BUDGETS = (
+    ("gpt-4.1-nano", 1200),
+    ("gpt-4o-mini", 2000),
+    ("gemini-2.0-flash-lite", 1200),
+    ("gemini-1.5-flash", 2000),
+    ("claude-3-5-haiku", 1500),
+)
+DEFAULT_CONTEXT_BUDGET = 3000
+DEFAULT_MMR_LAMBDA = 0.7         # 1.0 = relevance only, 0.0 = diversity only
+DEFAULT_CANDIDATE_FACTOR = 3     # Candidates fetched per document the agent asks for
+MAX_CHUNK_OVERLAP = 400          # Characters searched for the repeated text between neighbours
+_OVERLAP_PROBE = 40              # Characters of the next chunk used to find that overlap
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Per-turn stats; shared with the worker threads a turn's tools run on (see tool_executor)
+_turn_stats: ContextVar = ContextVar("context_packing_stats", default=None)
+
+
+def context_budget(model_id: str, override: Optional[int] = None) -> int:
+    """Token budget for retrieved context with this model."""
+    if override:
+        return override
+    for prefix, budget in MODEL_CONTEXT_BUDGETS:
+        if (model_id or "").startswith(prefix):
+            return budget
+    return DEFAULT_CONTEXT_BUDGET
+
+
+def _relevance(hits: Sequence[TableHit]) -> np.ndarray:
+    """Cosine similarity to the query from squared L2 distances (unit vectors), else from rank."""
+    if all(hit.distance is not None for hit in hits):
+        return 1.0 - np.asarray([hit.distance for hit in hits], dtype=np.float32) / 2.0
+    return 1.0 - np.arange(len(hits), dtype=np.float32) / max(len(hits), 1)
+
+
+def _similarity(hits: Sequence[TableHit]) -> np.ndarray:
+    """Pairwise chunk similarity: cosine of the stored vectors, else Jaccard of the word sets."""
+    if all(hit.vector is not None for hit in hits):
+        vectors = np.asarray([hit.vector for hit in hits], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        return vectors @ vectors.T
+    words = [set(_WORD_RE.findall(hit.content.lower())) for hit in hits]
+    n = len(hits)
+    similarity = np.eye(n, dtype=np.float32)
+    for i in range(n):
+        for j in range(i + 1, n):
+            union = len(words[i] | words[j])
+            similarity[i, j] = similarity[j, i] = len(words[i] & words[j]) / union if union else 0.0
+    return similarity
+
+
+def mmr_select(relevance: np.ndarray, similarity: np.ndarray, costs: Sequence[int], budget: int, max_items: int, mmr_lambda: float) -> List[int]:
+    """Indices picked greedily by MMR among the candidates that still fit the budget."""
+    costs = np.asarray(costs)
+    selected: List[int] = []
+    available = np.ones(len(relevance), dtype=bool)
+    redundancy = np.zeros(len(relevance), dtype=np.float32)  # Max similarity to anything selected
+    while len(selected) < max_items:
+        available &= costs <= budget
+        if not available.any():
+            break
+        scores = np.where(available, mmr_lambda * relevance - (1.0 - mmr_lambda) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        budget -= int(costs[best])
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+
+def merge_text(first: str, second: str) -> str:
+    """`first` followed by `second`, without the text chunking repeated at the start of `second`."""
+    probe = second[:_OVERLAP_PROBE]
+    start = first.rfind(probe, max(0, len(first) - MAX_CHUNK_OVERLAP)) if probe else -1
+    if start >= 0 and second.startswith(first[start:]):
+        return first[:start] + second
+    return first + "\n" + second
+
+
+def _chunk_position(hit: TableHit) -> Optional[Tuple[str, str, int]]:
+    meta = hit.meta_data or {}
+    if meta.get("source") is None or not isinstance(meta.get("chunk"), int):
+        return None
+    return hit.table, meta["source"], meta["chunk"]
+
+
+def merge_adjacent(hits: List[TableHit]) -> Tuple[List[TableHit], int]:
+    """Merges runs of consecutive chunks of the same document; returns the hits and merges done.
+
+    The order of `hits` (the MMR pick order) is kept: a merged run takes the place of its
+    earliest member. Merged hits keep the best rank/distance of their run and list their
+    chunks in meta_data.
+    """
+    positions = [_chunk_position(hit) for hit in hits]
+    by_position = {position: hit for position, hit in zip(positions, hits) if position is not None and positions.count(position) == 1}
+    merged, consumed, merges = [], set(), 0
+    for hit, position in zip(hits, positions):
+        if position not in by_position:  # No position, or an ambiguous one: kept as is
+            merged.append(hit)
+            continue
+        if position in consumed:
+            continue
+        table, source, chunk = position
+        first = chunk
+        while (table, source, first - 1) in by_position and (table, source, first - 1) not in consumed:
+            first -= 1
+        run = []
+        while (table, source, first + len(run)) in by_position and (table, source, first + len(run)) not in consumed:
+            run.append(by_position[(table, source, first + len(run))])
+        consumed.update((table, source, first + i) for i in range(len(run)))
+        if len(run) == 1:
+            merged.append(hit)
+            continue
+        merges += len(run) - 1
+        content = run[0].content
+        for part in run[1:]:
+            content = merge_text(content, part.content)
+        meta_data = {
+            **run[0].meta_data,
+            "last_page": run[-1].meta_data.get("last_page", run[-1].meta_data.get("page")),
+            "chunks": [part.meta_data["chunk"] for part in run],
+        }
+        distances = [part.distance for part in run]
+        merged.append(hit._replace(
+            rank=min(part.rank for part in run),
+            distance=min(distances) if None not in distances else hit.distance,
+            content=content,
+            meta_data=meta_data,
+        ))
+    return merged, merges
+
+
+class ContextPacker:
+    """agno retriever that packs knowledge hits by MMR into a token budget."""
+
+    def __init__(
+        self,
+        budget_tokens: int = DEFAULT_CONTEXT_BUDGET,
+        mmr_lambda: float = DEFAULT_MMR_LAMBDA,
+        candidate_factor: int = DEFAULT_CANDIDATE_FACTOR,
+        merge: bool = True,
+    ):
+        if not 0.0 <= mmr_lambda <= 1.0:
+            raise ValueError(f"mmr_lambda must be in [0, 1], got {mmr_lambda}")
+        self.budget_tokens = budget_tokens
+        self.mmr_lambda = mmr_lambda
+        self.candidate_factor = max(1, candidate_factor)
+        self.merge = merge
+        self._lock = threading.Lock()
+
+    # --- Per-turn accounting ---
+    def start_turn(self) -> None:
+        _turn_stats.set({"searches": 0, "candidates": 0, "chunks": 0, "merged": 0, "tokens_before": 0, "tokens_after": 0, "seconds": 0.0})
+
+    def end_turn(self) -> Dict[str, Any]:
+        """Returns the finished turn's stats (empty if no turn was started)."""
+        stats = _turn_stats.get() or {}
+        _turn_stats.set(None)
+        return stats
+
+    def _record(self, result: Dict[str, Any]) -> None:
+        stats = _turn_stats.get()
+        if stats is None:
+            return
+        with self._lock:
+            stats["searches"] += 1
+            for key in ("candidates", "chunks", "merged", "tokens_before", "tokens_after", "seconds"):
+                stats[key] += result[key]
+
+    # --- Packing ---
+    def pack(self, hits: List[TableHit], max_chunks: int) -> Tuple[List[TableHit], Dict[str, Any]]:
+        """The chunks to send, best first, and what packing them saved.
+
+        `tokens_before` is what the top `max_chunks` hits would have cost unpacked.
+        """
+        start = time.perf_counter()
+        costs = [estimate_tokens(hit.content) for hit in hits]
+        picked: List[TableHit] = []
+        if hits:
+            order = mmr_select(_relevance(hits), _similarity(hits), costs, self.budget_tokens, max_chunks, self.mmr_lambda)
+            picked = [hits[i] for i in order]
+        merges = 0
+        if self.merge and len(picked) > 1:
+            picked, merges = merge_adjacent(picked)
+        return picked, {
+            "candidates": len(hits),
+            "chunks": len(picked),
+            "merged": merges,
+            "tokens_before": sum(costs[:max_chunks]),
+            "tokens_after": sum(estimate_tokens(hit.content) for hit in picked),
+            "seconds": time.perf_counter() - start,
+        }
+
+    def __call__(self, agent: Any, query: str, num_documents: Optional[int] = None, filters: Optional[Dict[str, Any]] = None, **kwargs) -> Optional[List[Dict[str, Any]]]:
+        knowledge = getattr(agent, "knowledge", None)
+        if knowledge is None:
+            return None
+        num_documents = num_documents or getattr(knowledge, "num_documents", 5)
+        if not hasattr(knowledge, "search_hits"):  # Plain AgentKnowledge: nothing to pack with
+            documents = knowledge.search(query=query, num_documents=num_documents, filters=filters)
+            return [doc.to_dict() for doc in documents] or None
+        hits = knowledge.search_hits(query, num_documents * self.candidate_factor, filters)
+        packed, result = self.pack(hits, num_documents)
+        self._record(result)
+        return [hit_document(hit).to_dict() for hit in packed] or None
+
+
+def attach_context_packer(agent: Any, packer: ContextPacker) -> Any:
+    """Makes `packer` the agent's knowledge retriever."""
+    agent.retriever = packer
+    agent.context_packer = packer
+    return agent
+
+
+def get_context_packer(agent: Any) -> Optional[ContextPacker]:
+    """Returns the packer attached to the agent, if context packing is enabled."""
+    return getattr(agent, "context_packer", None)
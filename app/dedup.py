@@ -0,0 +1,112 @@
+# app/dedup.py
+# Near-duplicate chunk elimination before embedding (MinHash + LSH).
+#
+# PDFs and scraped pages repeat headers, footers and whole recipes. Each chunk gets a
+# MinHash signature over its word shingles; signatures are split into LSH bands, and a
+# chunk whose band collides with an earlier chunk is compared signature to signature.
+# If the estimated Jaccard similarity reaches the threshold the chunk is dropped before
+# it costs an embedding call, a vector row and a slot in search results.
+#
+# Only signatures of kept chunks are held (num_perm * 4 bytes each), so the filter
+# streams; it dedups within one ingestion run, not against rows already in the table.
+
+import hashlib
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+# --- Constants ---
+DEFAULT_THRESHOLD = 0.9          # Estimated Jaccard similarity at which a chunk is a duplicate
+DEFAULT_NUM_PERM = 128           # MinHash permutations (signature length)
+DEFAULT_SHINGLE_WORDS = 5        # Words per shingle
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingles(text: str, size: int) -> List[bytes]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words).encode("utf-8")]
+    return [" ".join(words[i:i + size]).encode("utf-8") for i in range(len(words) - size + 1)]
+
+
+def _lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) whose S-curve threshold (1/b)^(1/r) is closest to, but not above, `threshold`.
+
+    Erring low only adds candidates, and every candidate is checked against the full signature.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    curve = lambda br: (1.0 / br[0]) ** (1.0 / br[1])
+    below = [br for br in options if curve(br) <= threshold]
+    return max(below, key=curve) if below else min(options, key=curve)
+
+
+class NearDuplicateFilter:
+    """Drops chunks whose text is a near-duplicate of one already seen in this run."""
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        shingle_words: int = DEFAULT_SHINGLE_WORDS,
+        seed: int = 1,
+    ):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+        self.stats = {"chunks": 0, "kept": 0, "duplicates": 0, "exact": 0, "chars_saved": 0}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s, digest_size=4).digest(), "little") for s in _shingles(text, self.shingle_words)),
+            dtype=np.uint64,
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def is_duplicate(self, text: str) -> bool:
+        """True if `text` matches an earlier kept text; otherwise remembers it."""
+        self.stats["chunks"] += 1
+        signature = self.signature(text)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        candidates = {i for band, key in enumerate(keys) for i in self._buckets[band].get(key, ())}
+        for i in candidates:
+            similarity = float(np.mean(self._signatures[i] == signature))
+            if similarity >= self.threshold:
+                self.stats["duplicates"] += 1
+                self.stats["exact"] += similarity == 1.0
+                self.stats["chars_saved"] += len(text)
+                return True
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(index)
+        self.stats["kept"] += 1
+        return False
+
+    def filter(self, chunks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Passes through the chunk dicts of app/ingest.py that aren't near-duplicates."""
+        for chunk in chunks:
+            if not self.is_duplicate(chunk["content"]):
+                yield chunk
+
+    def filter_documents(self, documents: Iterable[Any]) -> List[Any]:
+        """Same for agno Documents (or anything with `content`)."""
+        return [doc for doc in documents if not self.is_duplicate(doc.content)]
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"Dedup: {s['duplicates']} of {s['chunks']} chunks dropped as near-duplicates "
+            f"({s['exact']} exact), {s['duplicates']} embedding calls and {s['chars_saved']} characters saved"
+        )
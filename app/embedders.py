@@ -0,0 +1,217 @@
+# app/embedders.py
+# Local CPU embedder: a small model file on disk instead of a remote embeddings API.
+#
+# With AGNO_EMBEDDER=local every vector DB made by app/storage.py embeds with
+# LocalEmbedder, so knowledge queries and ingestion need neither a network round trip
+# nor an OPENAI_API_KEY. Two model formats are read from AGNO_EMBEDDER_MODEL:
+#   - `*.npz` (pure numpy): a static embedding table. With a `vocab` array, words are
+#     looked up in it (static/distilled word embeddings exported to npz); without one,
+#     words, word bigrams and character trigrams are hashed into the table's rows. A
+#     text's vector is the sum of its rows, L2-normalised. `python -m app.embedders
+#     build` writes a hashed table to start with.
+#   - a directory with `model.onnx` and `tokenizer.json` (a sentence-transformers
+#     export), run with onnxruntime and mean pooled (pip install onnxruntime tokenizers).
+# Texts are embedded `batch_size` at a time and batches run on a small thread pool;
+# numpy and onnxruntime release the GIL inside their kernels.
+#
+# A table stores the vectors of the embedder that wrote it: switching embedders (or
+# models) means re-ingesting, e.g. `python -m app.ingest docs/ --recreate`.
+
+import argparse
+import hashlib
+import itertools
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from agno.embedder.base import Embedder
+
+from .utils import require_optional
+
+# --- Constants ---
+DEFAULT_MODEL_PATH = os.path.join("models", "embedder.npz")
+DEFAULT_BATCH_SIZE = 64          # Texts per inference call
+DEFAULT_WORKERS = 2              # Inference threads shared by every LocalEmbedder
+DEFAULT_HASHED_DIMS = 256
+DEFAULT_HASHED_BUCKETS = 2 ** 15
+ONNX_MAX_TOKENS = 256            # Longer texts are truncated (chunks are ~500 characters)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=2 ** 18)  # Terms repeat a lot across chunks; hashing dominates inference
+def _bucket(term: str, buckets: int) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), "little") % buckets
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+# --- Models ---
+class NumpyEmbeddingModel:
+    """Static embedding table (`embeddings`, optional `vocab`) from an .npz file."""
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            self.table = np.ascontiguousarray(data["embeddings"], dtype=np.float32)
+            vocab = data["vocab"] if "vocab" in data.files else None
+        self.vocab: Optional[Dict[str, int]] = {str(word): i for i, word in enumerate(vocab)} if vocab is not None else None
+        self.dimensions = int(self.table.shape[1])
+
+    def _rows(self, text: str) -> List[int]:
+        words = _WORD_RE.findall(text.lower())
+        if self.vocab is not None:
+            return [self.vocab[word] for word in words if word in self.vocab]
+        terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        terms += [f"#{word[i:i + 3]}" for word in words if len(word) > 3 for i in range(len(word) - 2)]
+        return [_bucket(term, len(self.table)) for term in terms]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        rows = [self._rows(text) for text in texts]
+        lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        filled = lengths > 0
+        if filled.any():
+            flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=int(lengths.sum()))
+            starts = np.concatenate(([0], np.cumsum(lengths[filled])[:-1]))
+            vectors[filled] = np.add.reduceat(self.table[flat], starts, axis=0)
+        return _normalize(vectors)
+
+
+class OnnxEmbeddingModel:
+    """Transformer encoder exported to ONNX (model.onnx + tokenizer.json), mean pooled."""
+
+    def __init__(self, path: str):
+        InferenceSession = require_optional("onnxruntime", "InferenceSession", "onnxruntime")
+        SessionOptions = require_optional("onnxruntime", "SessionOptions", "onnxruntime")
+        Tokenizer = require_optional("tokenizers", "Tokenizer", "tokenizers")
+        options = SessionOptions()
+        options.intra_op_num_threads = 1  # Parallelism comes from running batches on the pool
+        self.session = InferenceSession(os.path.join(path, "model.onnx"), options, providers=["CPUExecutionProvider"])
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(ONNX_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+        self.inputs = {node.name for node in self.session.get_inputs()}
+        self.dimensions = int(self.encode(["dimensions"]).shape[1])
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        output = self.session.run(None, {name: value for name, value in feed.items() if name in self.inputs})[0]
+        if output.ndim == 3:  # Token embeddings: mean over the real tokens
+            weights = mask[:, :, None].astype(np.float32)
+            output = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1.0)
+        return _normalize(output.astype(np.float32))
+
+
+# Loaded models and the inference pool are process-wide (not on the embedder), so agent
+# copies and every table's vector DB share one copy of the weights
+_lock = threading.Lock()
+_models: Dict[str, object] = {}
+_pools: Dict[int, ThreadPoolExecutor] = {}
+
+
+def load_model(path: str):
+    """The model at `path` (an .npz file or an ONNX model directory), loaded once per process."""
+    path = os.path.abspath(path)
+    with _lock:
+        model = _models.get(path)
+        if model is None:
+            if os.path.isdir(path):
+                model = OnnxEmbeddingModel(path)
+            elif os.path.isfile(path):
+                model = NumpyEmbeddingModel(path)
+            else:
+                raise FileNotFoundError(f"No embedder model at {path} (build one with `python -m app.embedders build {path}`)")
+            _models[path] = model
+        return model
+
+
+def _pool(workers: int) -> ThreadPoolExecutor:
+    with _lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed")
+        return pool
+
+
+@dataclass
+class LocalEmbedder(Embedder):
+    """agno embedder running a local model file on CPU, batched on a thread pool."""
+
+    model_path: str = DEFAULT_MODEL_PATH
+    batch_size: int = DEFAULT_BATCH_SIZE
+    workers: int = DEFAULT_WORKERS
+    id: str = ""
+    dimensions: Optional[int] = None
+
+    def __post_init__(self):
+        # agno's vector DBs read `dimensions` at construction, so the model loads here
+        self.dimensions = load_model(self.model_path).dimensions
+        self.id = self.id or os.path.basename(os.path.normpath(self.model_path))
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Unit vectors for `texts` (one row each); batches run concurrently."""
+        model = load_model(self.model_path)
+        if len(texts) <= self.batch_size:
+            return model.encode(list(texts)) if texts else np.zeros((0, self.dimensions), dtype=np.float32)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        return np.vstack(list(_pool(self.workers).map(model.encode, batches)))
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_batch(texts).tolist()
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0].tolist()
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None  # No tokens billed
+
+
+def create_embedder() -> Optional[Embedder]:
+    """The embedder selected by AGNO_EMBEDDER, or None for agno's default (OpenAI)."""
+    from .config import get_embedder_config
+
+    config = get_embedder_config()
+    if config.pop("embedder") != "local":
+        return None
+    return LocalEmbedder(**config)
+
+
+def build_hashed_model(path: str, dims: int = DEFAULT_HASHED_DIMS, buckets: int = DEFAULT_HASHED_BUCKETS, seed: int = 0) -> str:
+    """Writes a hashed embedding table (random projection of hashed words and n-grams)."""
+    rng = np.random.default_rng(seed)
+    table = rng.standard_normal((buckets, dims), dtype=np.float32) / np.sqrt(dims)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez(path, embeddings=table)
+    return path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Local embedder model files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Write a hashed numpy embedding table")
+    build.add_argument("path", nargs="?", default=DEFAULT_MODEL_PATH)
+    build.add_argument("--dims", type=int, default=DEFAULT_HASHED_DIMS)
+    build.add_argument("--buckets", type=int, default=DEFAULT_HASHED_BUCKETS)
+    build.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    path = build_hashed_model(args.path, args.dims, args.buckets, args.seed)
+    print(f"Wrote {path}: {args.buckets} x {args.dims} (use AGNO_EMBEDDER=local AGNO_EMBEDDER_MODEL={path})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
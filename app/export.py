@@ -0,0 +1,285 @@
+# app/export.py
+# Bulk export of agent sessions to partitioned Parquet for analytics.
+#
+# Streams the session storage table (agent_sessions_v2, SQLite or Postgres) with a
+# server-side cursor, decodes one session at a time and appends its rows to Arrow
+# record batches for four datasets: sessions, runs, messages and tool_calls, with token
+# metrics as columns. Batches are flushed to Parquet every `batch_rows` rows, so memory
+# stays flat however many months of history are exported. Files are Hive-partitioned by
+# day (`<out>/<dataset>/date=YYYY-MM-DD/part-N.parquet`) and can be queried directly:
+#
+#   python -m app.export --out tmp/export --since 2025-01-01
+#   duckdb -c "SELECT date, sum(total_tokens) FROM 'tmp/export/runs/*/*.parquet' GROUP BY 1"
+
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# --- Constants ---
+DATASETS = ("sessions", "runs", "messages", "tool_calls")
+BATCH_ROWS = 10_000              # Rows buffered per dataset before a record batch is written
+FETCH_ROWS = 200                 # Sessions fetched from the database per round trip
+MAX_OPEN_WRITERS = 16            # Parquet files kept open at once (one per dataset and day)
+
+
+def _schemas() -> Dict[str, Any]:
+    import pyarrow as pa
+
+    ts = pa.timestamp("s", tz="UTC")
+    tokens = [("input_tokens", pa.int64()), ("output_tokens", pa.int64()), ("total_tokens", pa.int64()), ("cached_tokens", pa.int64())]
+    return {
+        "sessions": pa.schema([
+            ("session_id", pa.string()), ("user_id", pa.string()), ("agent_id", pa.string()), ("session_name", pa.string()),
+            ("created_at", ts), ("updated_at", ts), ("runs", pa.int32()), ("messages", pa.int32()), ("has_summary", pa.bool_()),
+        ]),
+        "runs": pa.schema([
+            ("session_id", pa.string()), ("user_id", pa.string()), ("run_id", pa.string()), ("run_index", pa.int32()),
+            ("created_at", ts), ("model", pa.string()), ("content", pa.string()), ("messages", pa.int32()),
+            ("tool_calls", pa.int32()), *tokens, ("time", pa.float64()),
+        ]),
+        "messages": pa.schema([
+            ("session_id", pa.string()), ("user_id", pa.string()), ("run_id", pa.string()), ("message_index", pa.int32()),
+            ("created_at", ts), ("role", pa.string()), ("content", pa.string()), *tokens, ("time", pa.float64()),
+        ]),
+        "tool_calls": pa.schema([
+            ("session_id", pa.string()), ("user_id", pa.string()), ("run_id", pa.string()), ("tool_call_id", pa.string()),
+            ("created_at", ts), ("tool_name", pa.string()), ("tool_args", pa.string()), ("result", pa.string()),
+            ("error", pa.bool_()), ("time", pa.float64()),
+        ]),
+    }
+
+
+# --- Decoding ---
+def _json(value: Any) -> Any:
+    if isinstance(value, (str, bytes)):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _timestamp(value: Any) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def _metric(metrics: Any, *keys: str) -> Optional[float]:
+    """First of `keys` in a metrics dict; run metrics hold one value per model call, so lists are summed."""
+    if not isinstance(metrics, dict):
+        return None
+    for key in keys:
+        value = metrics.get(key)
+        if isinstance(value, list):
+            value = sum(v for v in value if isinstance(v, (int, float)))
+        if isinstance(value, (int, float)):
+            return value
+    return None
+
+
+def _token_columns(metrics: Any) -> Dict[str, Any]:
+    return {
+        "input_tokens": _metric(metrics, "input_tokens", "prompt_tokens"),
+        "output_tokens": _metric(metrics, "output_tokens", "completion_tokens"),
+        "total_tokens": _metric(metrics, "total_tokens"),
+        "cached_tokens": _metric(metrics, "cached_tokens", "cache_read_tokens"),
+    }
+
+
+def session_rows(session: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(dataset, row) pairs for one stored session."""
+    session_id, user_id = session.get("session_id"), session.get("user_id")
+    memory = _json(session.get("memory")) or {}
+    session_data = _json(session.get("session_data")) or {}
+    created_at = _timestamp(session.get("created_at"))
+    runs = memory.get("runs") or []
+    total_messages = 0
+    for run_index, run in enumerate(runs):
+        run = run.get("response", run) if isinstance(run, dict) else {}  # Older memory nests the RunResponse
+        run_id = run.get("run_id")
+        run_created = _timestamp(run.get("created_at")) or created_at
+        # Memory v2 stores the replayed history with every run; export each message once
+        messages = [m for m in run.get("messages") or [] if not m.get("from_history")]
+        requested = []  # Tool calls asked for by the model; used when the run has no executed-tool list
+        for message_index, message in enumerate(messages):
+            metrics = message.get("metrics")
+            message_created = _timestamp(message.get("created_at")) or run_created
+            yield "messages", {
+                "session_id": session_id, "user_id": user_id, "run_id": run_id, "message_index": message_index,
+                "created_at": message_created, "role": message.get("role"),
+                "content": _text(message.get("content")), **_token_columns(metrics), "time": _metric(metrics, "time"),
+            }
+            for call in message.get("tool_calls") or []:
+                function = call.get("function") or {}
+                requested.append({
+                    "session_id": session_id, "user_id": user_id, "run_id": run_id, "tool_call_id": call.get("id"),
+                    "created_at": message_created, "tool_name": function.get("name"),
+                    "tool_args": _text(function.get("arguments")), "result": None, "error": None, "time": None,
+                })
+        tools = run.get("tools") or []
+        for tool in tools:  # Executed tools, with their results
+            yield "tool_calls", {
+                "session_id": session_id, "user_id": user_id, "run_id": run_id, "tool_call_id": tool.get("tool_call_id"),
+                "created_at": _timestamp(tool.get("created_at")) or run_created, "tool_name": tool.get("tool_name"),
+                "tool_args": _text(tool.get("tool_args")), "result": _text(tool.get("content")),
+                "error": bool(tool.get("tool_call_error")), "time": _metric(tool.get("metrics"), "time"),
+            }
+        if not tools:
+            for row in requested:
+                yield "tool_calls", row
+        total_messages += len(messages)
+        metrics = run.get("metrics")
+        yield "runs", {
+            "session_id": session_id, "user_id": user_id, "run_id": run_id, "run_index": run_index,
+            "created_at": run_created, "model": run.get("model"), "content": _text(run.get("content")),
+            "messages": len(messages), "tool_calls": len(tools) or len(requested),
+            **_token_columns(metrics), "time": _metric(metrics, "time"),
+        }
+    yield "sessions", {
+        "session_id": session_id, "user_id": user_id, "agent_id": session.get("agent_id"),
+        "session_name": session_data.get("session_name"), "created_at": created_at,
+        "updated_at": _timestamp(session.get("updated_at")), "runs": len(runs), "messages": total_messages,
+        "has_summary": bool(memory.get("summary") or session_data.get("summary")),
+    }
+
+
+# --- Parquet output ---
+class PartitionedWriter:
+    """Appends rows to Hive-partitioned Parquet files, one record batch at a time."""
+
+    def __init__(self, out_dir: str, batch_rows: int = BATCH_ROWS, max_open: int = MAX_OPEN_WRITERS, compression: str = "zstd"):
+        self.out_dir = out_dir
+        self.batch_rows = batch_rows
+        self.max_open = max_open
+        self.compression = compression
+        self.schemas = _schemas()
+        self.rows = {name: 0 for name in DATASETS}
+        self.files = 0
+        self._buffers: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._buffered = 0
+        self._writers: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+
+    def add(self, dataset: str, row: Dict[str, Any]) -> None:
+        created = row.get("created_at")
+        key = (dataset, created.strftime("%Y-%m-%d") if created else "unknown")
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append(row)
+        self.rows[dataset] += 1
+        self._buffered += 1
+        if len(buffer) >= self.batch_rows:
+            self._flush(key)
+        elif self._buffered >= self.batch_rows * len(DATASETS):
+            for key in list(self._buffers):  # Many small partitions: write them all out
+                self._flush(key)
+
+    def _writer(self, key: Tuple[str, str]) -> Any:
+        import pyarrow.parquet as pq
+
+        writer = self._writers.get(key)
+        if writer is not None:
+            self._writers.move_to_end(key)
+            return writer
+        if len(self._writers) >= self.max_open:
+            self._writers.popitem(last=False)[1].close()  # Reopening a partition starts a new part file
+        dataset, day = key
+        directory = os.path.join(self.out_dir, dataset, f"date={day}")
+        os.makedirs(directory, exist_ok=True)
+        part = len([name for name in os.listdir(directory) if name.endswith(".parquet")])
+        writer = pq.ParquetWriter(os.path.join(directory, f"part-{part}.parquet"), self.schemas[dataset], compression=self.compression)
+        self._writers[key] = writer
+        self.files += 1
+        return writer
+
+    def _flush(self, key: Tuple[str, str]) -> None:
+        import pyarrow as pa
+
+        rows = self._buffers.pop(key, None)
+        if rows:
+            self._buffered -= len(rows)
+            self._writer(key).write_batch(pa.RecordBatch.from_pylist(rows, schema=self.schemas[key[0]]))
+
+    def close(self) -> None:
+        for key in list(self._buffers):
+            self._flush(key)
+        while self._writers:
+            self._writers.popitem(last=False)[1].close()
+
+
+# --- Export ---
+def iter_sessions(storage: Any, since: Optional[float] = None, fetch_rows: int = FETCH_ROWS) -> Iterator[Dict[str, Any]]:
+    """Stored sessions as dicts, oldest first, fetched `fetch_rows` at a time."""
+    from sqlalchemy import select
+
+    table = storage.table
+    query = select(table).order_by(table.c.created_at, table.c.session_id)
+    if since is not None:
+        query = query.where(table.c.updated_at >= int(since))
+    with storage.db_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=fetch_rows).execute(query)
+        for row in result:
+            yield dict(row._mapping)
+
+
+def export_sessions(storage: Any, out_dir: str, since: Optional[float] = None, batch_rows: int = BATCH_ROWS) -> Dict[str, Any]:
+    """Writes every session updated since `since` (epoch seconds) to Parquet under `out_dir`."""
+    start = time.perf_counter()
+    writer = PartitionedWriter(out_dir, batch_rows=batch_rows)
+    try:
+        for session in iter_sessions(storage, since):
+            for dataset, row in session_rows(session):
+                writer.add(dataset, row)
+    finally:
+        writer.close()
+    return {**writer.rows, "files": writer.files, "seconds": time.perf_counter() - start}
+
+
+def _parse_since(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export agent sessions, runs, messages and tool calls to Parquet")
+    parser.add_argument("--out", default=os.path.join("tmp", "export"), help="Output directory")
+    parser.add_argument("--since", help="Only sessions updated since this date (YYYY-MM-DD) or epoch seconds")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="Rows per Parquet record batch")
+    parser.add_argument("--overwrite", action="store_true", help="Replace an existing export in --out")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.out) and os.listdir(args.out):
+        if not args.overwrite:
+            parser.error(f"{args.out} is not empty; pass --overwrite or choose another directory")
+        import shutil
+        shutil.rmtree(args.out)
+
+    from .models import STORAGE_TABLE_NAME
+    from .storage import create_storage
+
+    stats = export_sessions(create_storage(table_name=STORAGE_TABLE_NAME), args.out, _parse_since(args.since), args.batch_rows)
+    counts = ", ".join(f"{stats[name]} {name}" for name in DATASETS)
+    print(f"Exported {counts} to {stats['files']} file(s) under {args.out} in {stats['seconds']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
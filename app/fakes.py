@@ -0,0 +1,264 @@
+# app/fakes.py
+# Offline stand-ins for LLM providers, used by the load tests and benchmarks.
+#
+# MockLLMServer speaks enough of the OpenAI HTTP API for agno's OpenAIChat and
+# OpenAIEmbedder to run against it unchanged (point them at `server.base_url`, any API
+# key works).
+
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+class MockLLMServer:
+    """Local OpenAI-compatible chat completions and embeddings server with injectable latency and errors."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        reply: str = "This is a canned reply from the mock model.",
+        first_token_latency: float = 0.05,
+        token_latency: float = 0.005,
+        error_rate: float = 0.0,
+        connect_latency: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        prompt_token_latency: float = 0.0,
+        embedding_dimensions: int = 1536,
+        seed: Optional[int] = None,
+    ):
+        self.reply = reply
+        self.connect_latency = connect_latency  # Simulated TCP + TLS handshake cost per new connection
+        self.slow_rate = slow_rate              # Fraction of requests delayed by slow_latency (tail latency)
+        self.slow_latency = slow_latency
+        self.first_token_latency = first_token_latency
+        self.prompt_token_latency = prompt_token_latency  # Simulated prefill cost per prompt token
+        self.token_latency = token_latency
+        self.embedding_dimensions = embedding_dimensions  # Unless the request asks for `dimensions`
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.errors = 0
+        self.slow = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # --- Response building ---
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def _should_stall(self) -> bool:
+        with self._lock:
+            stall = self.slow_rate > 0 and self._rng.random() < self.slow_rate
+            if stall:
+                self.slow += 1
+            return stall
+
+    def _count_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    @staticmethod
+    def prompt_tokens(body: Dict[str, Any]) -> int:
+        texts = body.get("input", [])  # Embedding requests
+        texts = [texts] if isinstance(texts, str) else texts
+        return sum(len(str(m.get("content", "")).split()) for m in body.get("messages", [])) + sum(len(str(t).split()) for t in texts)
+
+    def completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt_tokens = self.prompt_tokens(body)
+        completion_tokens = len(self.reply.split())
+        return {
+            "id": f"chatcmpl-mock-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def embeddings(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Deterministic unit vectors per input text (same text, same vector)."""
+        texts = body.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        dims = int(body.get("dimensions") or self.embedding_dimensions)
+        data = []
+        for i, text in enumerate(texts):
+            rng = random.Random(hashlib.sha1(str(text).encode()).digest())
+            vector = [rng.gauss(0.0, 1.0) for _ in range(dims)]
+            norm = sum(v * v for v in vector) ** 0.5 or 1.0
+            vector = [v / norm for v in vector]
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{dims}f", *vector)).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = self.prompt_tokens(body)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "mock"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def stream_chunks(self, body: Dict[str, Any]):
+        """Yields the SSE `data:` payloads for a streamed completion."""
+        base = {"id": f"chatcmpl-mock-{self.requests}", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "mock")}
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            delta = {"content": word + (" " if i < len(words) - 1 else "")}
+            if i == 0:
+                delta["role"] = "assistant"
+            yield {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        if body.get("stream_options", {}).get("include_usage"):
+            usage = self.completion(body)["usage"]
+            yield {**base, "choices": [], "usage": usage}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is observable
+
+            def setup(self):
+                super().setup()
+                server._count_connection()
+                if server.connect_latency:
+                    time.sleep(server.connect_latency)
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+
+                embeddings = self.path.endswith("/embeddings")
+                if not embeddings and not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                time.sleep(server.first_token_latency + server.prompt_token_latency * server.prompt_tokens(body))
+                if server._should_stall():
+                    time.sleep(server.slow_latency)
+                if server._should_fail():
+                    self._send_json(500, {"error": {"message": "Injected mock failure", "type": "server_error"}})
+                    return
+
+                if embeddings:
+                    self._send_json(200, server.embeddings(body))
+                    return
+
+                if not body.get("stream"):
+                    self._send_json(200, server.completion(body))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for payload in server.stream_chunks(body):
+                        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+                        if server.token_latency:
+                            time.sleep(server.token_latency)
+                    self._write_chunk(b"data: [DONE]\n\n")
+                    self._write_chunk(b"")  # Terminating zero-length chunk
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # Client abandoned the stream (e.g. a losing hedge)
+
+        return Handler
+
+
+# --- Sample documents ---
+_SAMPLE_WORDS = (
+    "coconut milk galangal lemongrass lime leaves chili fish sauce palm sugar shallots garlic "
+    "simmer stir fry pound paste serve rice noodles basil coriander tamarind broth chicken prawns"
+).split()
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_sample_pdf(path: str, pages: int = 10, lines_per_page: int = 40, words_per_line: int = 12, seed: int = 0) -> str:
+    """Writes a simple text-only PDF (no dependencies) for ingestion tests and benchmarks."""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for page_number in range(1, pages + 1):
+        lines = [f"Page {page_number}"] + [
+            " ".join(rng.choice(_SAMPLE_WORDS) for _ in range(words_per_line)) for _ in range(lines_per_page)
+        ]
+        text_ops = " T* ".join(f"({_pdf_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {text_ops} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return path
@@ -0,0 +1,111 @@
+# app/http_pool.py
+# Shared, pooled HTTP clients for the LLM provider SDKs.
+#
+# Every OpenAIChat/Claude/Gemini instance otherwise builds its own SDK client and so its
+# own connection pool: the main and memory models of one agent, and every agent rebuilt
+# on a cache miss, each pay fresh TCP + TLS handshakes. Here there's one keep-alive pool
+# per provider per process, injected into every model instance (use_http_pool).
+# Gemini's SDK owns its transport, so there it is one shared genai.Client per key,
+# built with the same pool limits, timeout and HTTP/2 setting.
+
+import importlib.util
+import threading
+from typing import Any, Dict, Optional
+
+from .config import get_http_pool_config
+
+_lock = threading.Lock()
+_http_clients: Dict[str, Any] = {}
+_gemini_clients: Dict[str, Any] = {}
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _pool_options(config: Dict[str, Any]) -> Dict[str, Any]:
+    """httpx client arguments for the configured pool limits and HTTP/2."""
+    import httpx  # Installed with the provider SDKs
+
+    limits = httpx.Limits(
+        max_connections=config["max_connections"],
+        max_keepalive_connections=config["max_keepalive_connections"],
+        keepalive_expiry=config["keepalive_expiry"],
+    )
+    return {"limits": limits, "http2": config["http2"] and http2_available()}
+
+
+def get_http_client(provider_key: str):
+    """Returns the process-wide pooled httpx.Client for a provider, creating it once."""
+    client = _http_clients.get(provider_key)
+    if client is not None and not client.is_closed:
+        return client
+    with _lock:
+        client = _http_clients.get(provider_key)
+        if client is None or client.is_closed:
+            import httpx
+
+            config = get_http_pool_config()
+            client = httpx.Client(
+                timeout=httpx.Timeout(config["timeout"], connect=config["connect_timeout"]),
+                **_pool_options(config),
+            )
+            _http_clients[provider_key] = client
+    return client
+
+
+def _get_gemini_client(api_key: Optional[str]):
+    # google-genai manages its own transport (sync and async): share one Client, and so
+    # its pools, per key, configured through http_options
+    client = _gemini_clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _gemini_clients.get(api_key)
+            if client is None:
+                from google.genai import Client as GeminiClient
+                from google.genai.types import HttpOptions
+
+                config = get_http_pool_config()
+                options = _pool_options(config)
+                client = GeminiClient(
+                    api_key=api_key,
+                    http_options=HttpOptions(
+                        timeout=int(config["timeout"] * 1000),  # Milliseconds; there is no separate connect timeout
+                        client_args=options,
+                        async_client_args=options,
+                    ),
+                )
+                _gemini_clients[api_key] = client
+    return client
+
+
+def use_http_pool(model: Any, provider_key: str) -> Any:
+    """Points a newly built model's sync SDK client at the provider's shared pool.
+
+    agno builds the async clients (arun, async memory and summary calls) separately,
+    and a sync httpx.Client would break them, so those keep their own transport.
+    """
+    if provider_key == "openai":
+        # OpenAIChat builds an SDK client per call and would reuse `http_client` for
+        # AsyncOpenAI too; serve one ready sync client instead
+        from openai import OpenAI
+
+        client = OpenAI(**model._get_client_params(), http_client=get_http_client(provider_key))
+        model.get_client = lambda: client
+    elif provider_key == "anthropic":
+        from anthropic import Anthropic
+
+        model.client = Anthropic(**model._get_client_params(), http_client=get_http_client(provider_key))
+    elif provider_key == "google":
+        model.client = _get_gemini_client(model.api_key)
+    return model
+
+
+def close_http_clients() -> None:
+    """Closes every pooled client (e.g. on shutdown or in benchmarks)."""
+    with _lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+        _gemini_clients.clear()
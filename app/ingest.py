@@ -0,0 +1,397 @@
+# app/ingest.py
+# Streaming ingestion of local PDF and text files into a knowledge vector DB.
+#
+# Files are parsed page by page (generators all the way down), chunked incrementally and
+# handed to the writer in fixed-size batches through a bounded queue. When the writer
+# (embedding + vector DB insert) falls behind, the parser blocks, so peak memory depends
+# on batch_size * max_pending_batches, not on the size of the corpus.
+#
+#   python -m app.ingest docs/ more.pdf --table recipes --batch-size 64
+#   python -m app.ingest docs/ --table manuals --vector-dtype int8 --dims 512   # compact vectors
+
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .vector_storage import VECTOR_DTYPES, VectorLayout
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+CHUNK_SIZE = 1000                # Characters per chunk
+CHUNK_OVERLAP = 100              # Characters repeated at the start of the next chunk
+BATCH_SIZE = 64                  # Chunks per embed-and-write call
+MAX_PENDING_BATCHES = 4          # Batches parsed ahead of the writer before parsing blocks
+PAGES_PER_READER = 200           # Reopen a PDF after this many pages to drop pypdf's object cache
+TEXT_BLOCK_CHARS = 64 * 1024     # Text files are read in blocks of this many characters
+TEXT_EXTENSIONS = (".txt", ".md")
+PDF_EXTENSIONS = (".pdf",)
+
+Page = Tuple[str, int, str]      # (source path, 1-based page number, text)
+
+
+# --- Page sources ---
+def iter_pdf_pages(path: str, pages_per_reader: int = PAGES_PER_READER) -> Iterator[Page]:
+    """Yields a PDF's pages one at a time, never holding more than one page's text."""
+    from pypdf import PdfReader
+
+    page_index = 0
+    while True:
+        with open(path, "rb") as f:
+            reader = PdfReader(f)
+            num_pages = len(reader.pages)
+            stop = min(page_index + pages_per_reader, num_pages)
+            while page_index < stop:
+                text = reader.pages[page_index].extract_text() or ""
+                page_index += 1
+                yield path, page_index, text
+        del reader
+        if page_index >= num_pages:
+            return
+
+
+def iter_text_pages(path: str, block_chars: int = TEXT_BLOCK_CHARS) -> Iterator[Page]:
+    """Yields a text file in fixed-size blocks (numbered like pages)."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        block_number = 0
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                return
+            block_number += 1
+            yield path, block_number, block
+
+
+def iter_files(paths: Iterable[str]) -> Iterator[str]:
+    """Expands directories (recursively, sorted) into the supported files they contain."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(PDF_EXTENSIONS + TEXT_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_pages(paths: Iterable[str]) -> Iterator[Page]:
+    for path in iter_files(paths):
+        if path.lower().endswith(PDF_EXTENSIONS):
+            yield from iter_pdf_pages(path)
+        else:
+            yield from iter_text_pages(path)
+
+
+# --- Chunking ---
+def _split_point(text: str, limit: int) -> int:
+    """Latest whitespace before `limit` (so words aren't cut), or `limit` itself."""
+    cut = text.rfind(" ", limit // 2, limit)
+    newline = text.rfind("\n", limit // 2, limit)
+    cut = max(cut, newline)
+    return cut + 1 if cut > 0 else limit
+
+
+def chunk_pages(pages: Iterable[Page], chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[Dict[str, Any]]:
+    """Chunks a stream of pages incrementally; a chunk never spans two files.
+
+    Only the unfinished tail of the current file is buffered between pages.
+    """
+    overlap = min(overlap, chunk_size // 4)  # Each split must make progress
+    buffer = ""
+    current_source: Optional[str] = None
+    first_page = 1
+    chunk_number = 0
+
+    def make_chunk(text: str, last_page: int) -> Dict[str, Any]:
+        return {
+            "name": os.path.splitext(os.path.basename(current_source))[0],
+            "content": text,
+            "meta_data": {"source": current_source, "page": first_page, "last_page": last_page, "chunk": chunk_number},
+        }
+
+    last_page = 1
+    for source, page_number, text in pages:
+        if source != current_source:
+            if buffer.strip() and current_source is not None:
+                chunk_number += 1
+                yield make_chunk(buffer.strip(), last_page)
+            buffer, current_source, first_page, chunk_number = "", source, page_number, 0
+        if not buffer:
+            first_page = page_number
+        buffer += text + "\n"
+        last_page = page_number
+        while len(buffer) >= chunk_size:
+            cut = _split_point(buffer, chunk_size)
+            chunk_number += 1
+            yield make_chunk(buffer[:cut].strip(), page_number)
+            buffer = buffer[max(cut - overlap, 0):] if overlap else buffer[cut:]
+            first_page = page_number
+    if buffer.strip() and current_source is not None:
+        chunk_number += 1
+        yield make_chunk(buffer.strip(), last_page)
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --- Writers ---
+class VectorDbWriter:
+    """Embeds and inserts chunk batches into an agno vector DB, with chunk metadata columns.
+
+    With a `user_id` the chunks are private to that user (see app/knowledge.py).
+    """
+
+    def __init__(self, vector_db: Any, upsert: bool = True, user_id: Optional[str] = None):
+        self.vector_db = vector_db
+        self.upsert = upsert
+        self.user_id = user_id
+
+    def __call__(self, chunks: List[Dict[str, Any]]) -> None:
+        from agno.document import Document
+
+        from .knowledge import write_documents
+
+        documents = [Document(name=c["name"], content=c["content"], meta_data=c["meta_data"]) for c in chunks]
+        write_documents(self.vector_db, documents, user_id=self.user_id, upsert=self.upsert)
+
+
+class NullWriter:
+    """Discards batches after an optional delay; for measuring the parse side on its own."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.chunks = 0
+
+    def __call__(self, chunks: List[Dict[str, Any]]) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        self.chunks += len(chunks)
+
+
+# --- Pipeline ---
+_DONE = object()
+
+
+class IngestPipeline:
+    """Parses and chunks on the calling thread, writes batches on `writers` threads.
+
+    The queue between them holds at most `max_pending_batches` batches, which is the
+    back-pressure that keeps memory bounded.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[List[Dict[str, Any]]], None],
+        batch_size: int = BATCH_SIZE,
+        max_pending_batches: int = MAX_PENDING_BATCHES,
+        writers: int = 1,
+        chunk_size: int = CHUNK_SIZE,
+        overlap: int = CHUNK_OVERLAP,
+        dedup: Optional[Any] = None,
+    ):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.max_pending_batches = max_pending_batches
+        self.writers = writers
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.dedup = dedup  # e.g. app.dedup.NearDuplicateFilter; drops chunks before the writer sees them
+
+    def run(self, paths: Iterable[str], on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Ingests every file under `paths`; returns counts and timings."""
+        batches: "queue.Queue" = queue.Queue(maxsize=self.max_pending_batches)
+        stats = {"files": 0, "pages": 0, "chunks": 0, "batches": 0, "failed_chunks": 0, "write_time": 0.0, "blocked_time": 0.0, "errors": []}
+        lock = threading.Lock()
+
+        def write_loop() -> None:
+            while True:
+                batch = batches.get()
+                if batch is _DONE:
+                    return
+                start = time.perf_counter()
+                error = None
+                try:
+                    self.writer(batch)
+                except Exception as e:
+                    error = f"{batch[0]['meta_data']['source']}: {e}"
+                with lock:
+                    stats["write_time"] += time.perf_counter() - start
+                    if error:  # Only written chunks count; failed ones are reported
+                        stats["errors"].append(error)
+                        stats["failed_chunks"] += len(batch)
+                    else:
+                        stats["batches"] += 1
+                        stats["chunks"] += len(batch)
+                if on_progress:
+                    try:
+                        on_progress(dict(stats))
+                    except Exception:  # A broken callback must not stop the writer (the parser would block)
+                        logger.exception("Ingest progress callback failed")
+
+        threads = [threading.Thread(target=write_loop, name=f"ingest-writer-{i}", daemon=True) for i in range(self.writers)]
+        for t in threads:
+            t.start()
+
+        def put(item: Any) -> bool:
+            """Queues `item` for the writers; False if none of them is alive to take it."""
+            while True:
+                try:
+                    batches.put(item, timeout=0.5)  # Blocks while the writers are behind
+                    return True
+                except queue.Full:
+                    if not any(t.is_alive() for t in threads):
+                        return False
+
+        def counted_pages() -> Iterator[Page]:
+            last_source = None
+            for page in iter_pages(paths):
+                if page[0] != last_source:
+                    last_source = page[0]
+                    stats["files"] += 1
+                stats["pages"] += 1
+                yield page
+
+        chunks = chunk_pages(counted_pages(), self.chunk_size, self.overlap)
+        if self.dedup is not None:
+            chunks = self.dedup.filter(chunks)
+        start = time.perf_counter()
+        try:
+            for batch in batched(chunks, self.batch_size):
+                put_start = time.perf_counter()
+                if not put(batch):
+                    raise RuntimeError("Every ingest writer thread stopped")
+                stats["blocked_time"] += time.perf_counter() - put_start
+        finally:
+            for t in threads:
+                if t.is_alive():
+                    put(_DONE)
+            for t in threads:
+                t.join()
+        stats["seconds"] = time.perf_counter() - start
+        if self.dedup is not None:
+            stats["duplicates"] = self.dedup.stats["duplicates"]  # One embedding call saved each
+        return stats
+
+
+def ingest_files(
+    paths: List[str],
+    table: str = "recipes",
+    user_id: Optional[str] = None,
+    layout: Optional[VectorLayout] = None,
+    recreate: bool = False,
+    dedup_threshold: Optional[float] = None,
+    batch_size: int = BATCH_SIZE,
+    max_pending_batches: int = MAX_PENDING_BATCHES,
+    writers: int = 1,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Creates the table if needed, ingests `paths` into it and indexes it (the CLI's work,
+    also run from the UI as a background job, see app/jobs.py). Waits while another
+    ingestion or compaction of the same table runs in this process.
+
+    `layout` and `dedup_threshold` default to the environment. Progress stats carry
+    `total_files`; the returned stats add `kept_layout` (the table already had rows
+    and its layout wins over `layout`) and the dedup summary, if dedup ran.
+    """
+    from .config import get_dedup_config, get_vector_storage_config
+    from .dedup import NearDuplicateFilter
+    from .knowledge import create_metadata_indexes, create_table, table_lock
+    from .models import KNOWLEDGE_CACHE
+    from .storage import create_vector_db, get_cache_versions
+
+    layout = layout or VectorLayout(**get_vector_storage_config())
+    total_files = sum(1 for _ in iter_files(paths))
+
+    def progress(stats: Dict[str, Any]) -> None:
+        if on_progress:
+            on_progress({**stats, "total_files": total_files})
+
+    dedup_config = get_dedup_config()
+    threshold = dedup_config["threshold"] if dedup_threshold is None else dedup_threshold
+    dedup = NearDuplicateFilter(threshold, dedup_config["num_perm"], dedup_config["shingle_words"]) if threshold > 0 else None
+    # One job per table at a time: create_table may replace a still-empty table, and
+    # concurrent merge_insert writers or a compaction would conflict
+    with table_lock(table):
+        vector_db = create_vector_db(table_name=table)
+        if recreate and vector_db.exists():
+            vector_db.drop()
+        kept_layout = create_table(vector_db, layout)
+        pipeline = IngestPipeline(VectorDbWriter(vector_db, user_id=user_id), batch_size=batch_size, max_pending_batches=max_pending_batches, writers=writers, dedup=dedup)
+        stats = pipeline.run(paths, on_progress=progress)
+        create_metadata_indexes(vector_db)  # Keeps source/user/date pre-filters off full scans
+    stats.update(total_files=total_files, kept_layout=kept_layout)
+    if dedup is not None:
+        stats["dedup_summary"] = dedup.summary()
+
+    # Running app workers reconnect to the updated table
+    get_cache_versions().bump(KNOWLEDGE_CACHE)
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stream local PDF/text files into a knowledge table")
+    parser.add_argument("paths", nargs="+", help="Files or directories (.pdf, .txt, .md)")
+    parser.add_argument("--table", default="recipes", help="Vector DB table name")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING_BATCHES, help="Batches parsed ahead of the writer")
+    parser.add_argument("--writers", type=int, default=1, help="Concurrent embed-and-write threads")
+    parser.add_argument("--recreate", action="store_true", help="Drop the table first")
+    parser.add_argument("--user-id", help="Make the documents private to this user")
+    parser.add_argument("--vector-dtype", choices=VECTOR_DTYPES, help="Vector storage of a new table (default: AGNO_VECTOR_DTYPE)")
+    parser.add_argument("--dims", type=int, help="Store only the first N embedding dimensions (default: AGNO_VECTOR_DIMS)")
+    parser.add_argument("--no-full-vectors", action="store_true", help="Don't keep float32 copies for rescoring")
+    parser.add_argument("--dedup-threshold", type=float, help="Drop chunks this similar to an earlier one, 0 to keep all (default: AGNO_INGEST_DEDUP_THRESHOLD)")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()  # Embedder keys (OPENAI_API_KEY, ...)
+
+    from .config import get_vector_storage_config
+
+    storage = get_vector_storage_config()
+    layout = VectorLayout(
+        dtype=args.vector_dtype or storage["dtype"],
+        dims=args.dims or storage["dims"],
+        keep_full=storage["keep_full"] and not args.no_full_vectors,
+    )
+
+    def progress(stats: Dict[str, Any]) -> None:
+        print(f"\r{stats['chunks']} chunks written ({stats['batches']} batches)", end="", flush=True)
+
+    stats = ingest_files(
+        args.paths,
+        table=args.table,
+        user_id=args.user_id,
+        layout=layout,
+        recreate=args.recreate,
+        dedup_threshold=args.dedup_threshold,
+        batch_size=args.batch_size,
+        max_pending_batches=args.max_pending,
+        writers=args.writers,
+        on_progress=progress,
+    )
+    print(f"\nIngested {stats['files']} file(s), {stats['pages']} pages -> {stats['chunks']} chunks in {stats['seconds']:.1f}s")
+    if stats["kept_layout"]:
+        print(f"Table {args.table} already has rows; kept its vector layout (use --recreate to change it)")
+    if "dedup_summary" in stats:
+        print(stats["dedup_summary"])
+    for error in stats["errors"]:
+        print(f"  failed batch: {error}")
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
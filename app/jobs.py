@@ -0,0 +1,155 @@
+# app/jobs.py
+# In-process background jobs with per-key single-flight.
+#
+# Work that takes seconds to minutes (session summaries, ingestion, table compaction)
+# runs on a small worker pool instead of the Streamlit script thread. A job is keyed
+# by (kind, user_id, session_id, resource): submitting a key that is already queued or
+# running returns the existing job, so double clicks, reruns and several browser tabs
+# share one LLM call or one ingestion instead of starting duplicates.
+#
+# Jobs report progress through `job.update()`; the UI polls `JobQueue.get()` from a
+# fragment (see app/ui.py), which never blocks the script thread.
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# --- Constants ---
+JOB_SUMMARY = "summary"
+JOB_INGEST = "ingest"
+JOB_COMPACT = "compact"
+DEFAULT_WORKERS = 2
+DEFAULT_HISTORY = 100            # Finished jobs kept for status display
+ACTIVE_STATES = ("queued", "running")
+
+JobKey = Tuple[str, Optional[str], Optional[str], Optional[str]]
+
+
+class Job:
+    """Status of one background job; written by its worker, read by any script run."""
+
+    def __init__(self, key: JobKey, fn: Callable[["Job"], Any], label: str = ""):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.fn = fn                            # Lets a caller tell its own job from a deduplicated one
+        self.kind = key[0]
+        self.label = label or key[0]
+        self.state = "queued"
+        self.progress: Optional[float] = None   # 0..1 when the job can tell, else None
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    @property
+    def seconds(self) -> float:
+        """Run time so far (or in total, once finished)."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def update(self, progress: Optional[float] = None, message: Optional[str] = None) -> None:
+        """Called from the job function to report progress."""
+        if progress is not None:
+            self.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+
+class JobQueue:
+    """Worker pool running `fn(job)` callables, at most one per key at a time."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, history: int = DEFAULT_HISTORY):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._active: Dict[JobKey, Job] = {}
+        self._finished: "OrderedDict[JobKey, Job]" = OrderedDict()  # Latest finished job per key
+        self.history = history
+        self.stats = {"submitted": 0, "deduplicated": 0, "succeeded": 0, "failed": 0}
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[[Job], Any],
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        resource: Optional[str] = None,
+        label: str = "",
+    ) -> Job:
+        """Queues `fn` unless a job with the same key is queued or running; returns that job."""
+        key = (kind, user_id, session_id, resource)
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                self.stats["deduplicated"] += 1
+                return job
+            job = Job(key, fn, label)
+            self._active[key] = job
+            self.stats["submitted"] += 1
+        self._pool.submit(self._run, job)
+        return job
+
+    def _run(self, job: Job) -> None:
+        job.state, job.started_at = "running", time.time()
+        result, error = None, None
+        try:
+            result = job.fn(job)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        with self._lock:  # Finishing and leaving _active together, so a new submit never gets a finished job
+            job.result, job.error, job.finished_at = result, error, time.time()
+            job.state = "failed" if error else "done"
+            if not error:
+                job.progress = 1.0
+            self._active.pop(job.key, None)
+            self._finished[job.key] = job
+            self._finished.move_to_end(job.key)
+            while len(self._finished) > self.history:
+                self._finished.popitem(last=False)
+            self.stats["failed" if error else "succeeded"] += 1
+
+    def get(
+        self,
+        kind: str,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        resource: Optional[str] = None,
+    ) -> Optional[Job]:
+        """The queued/running job for the key, else the last finished one, else None."""
+        key = (kind, user_id, session_id, resource)
+        with self._lock:
+            return self._active.get(key) or self._finished.get(key)
+
+    def jobs(self, user_id: Optional[str] = None) -> List[Job]:
+        """Active then finished jobs, newest first; only `user_id`'s (and shared ones) if given."""
+        with self._lock:
+            jobs = list(self._active.values()) + list(reversed(self._finished.values()))
+        if user_id is not None:
+            jobs = [job for job in jobs if job.key[1] in (user_id, None)]
+        return sorted(jobs, key=lambda job: (not job.active, -job.submitted_at))
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+_queue_lock = threading.Lock()
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide queue shared by every Streamlit session (sized by AGNO_JOB_WORKERS)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            from .config import get_jobs_config
+            _queue = JobQueue(**get_jobs_config())
+    return _queue
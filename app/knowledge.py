@@ -0,0 +1,513 @@
+# app/knowledge.py
+# Knowledge retrieval across several vector DB tables at once.
+#
+# MultiTableKnowledge is an AgentKnowledge whose search embeds the query once per
+# embedder, queries every configured table concurrently on a small thread pool and
+# fuses the per-table hits into one ranked list. A table that errors or exceeds the
+# per-table timeout is skipped, so one bad table degrades retrieval instead of failing it.
+#
+# Chunks written through write_documents() also get real `source`, `user_id` and
+# `created_at` columns next to agno's payload, so filters run as a LanceDB `where`
+# pre-filter (backed by scalar indexes) instead of ranking the whole table first.
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from contextvars import ContextVar, Token
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from agno.agent import AgentKnowledge
+from agno.document import Document
+from pydantic import PrivateAttr
+
+from .storage import create_vector_db
+from .vector_storage import FULL_VECTOR_COLUMN, VectorLayout, encode_vectors, search_rows, table_layout, vector_fields
+
+# --- Constants ---
+FUSION_MODES = ("distance", "rrf")
+RRF_K = 60                       # Reciprocal rank fusion damping constant
+DEFAULT_TABLE_TIMEOUT = 5.0      # Seconds a single table may take before it is skipped
+MAX_SEARCH_WORKERS = 8           # Upper bound on tables queried at once (per knowledge object)
+# Chunk metadata stored as LanceDB columns (SQL type used when adding them to a table)
+METADATA_COLUMNS = {"source": "string", "user_id": "string", "created_at": "bigint"}
+# Filter keys with special meaning; anything else is an equality match
+RANGE_FILTERS = {"created_after": ">=", "created_before": "<"}  # On created_at (epoch seconds or datetime)
+VISIBILITY_FILTER = "visible_to"  # Public chunks (no user_id) plus this user's private ones
+
+
+class TableHit(NamedTuple):
+    table: str
+    rank: int                    # 0-based position within its own table's results
+    distance: Optional[float]    # None when the backend doesn't expose it
+    name: Optional[str]
+    content: str
+    meta_data: Dict[str, Any]
+    usage: Optional[Dict[str, Any]]
+    vector: Optional[Any] = None  # Stored embedding (full precision) when the backend returns it
+
+
+# --- Vector DB handles ---
+_vector_db_lock = threading.Lock()
+_vector_dbs: Dict[str, Any] = {}
+
+
+def get_vector_db(table_name: str) -> Any:
+    """Returns the process-wide vector DB for `table_name`, connecting on first call."""
+    vector_db = _vector_dbs.get(table_name)
+    if vector_db is None:
+        with _vector_db_lock:
+            vector_db = _vector_dbs.get(table_name)
+            if vector_db is None:
+                vector_db = _vector_dbs[table_name] = create_vector_db(table_name=table_name)
+    return vector_db
+
+
+def reset_vector_dbs() -> None:
+    """Drops every cached vector DB handle so the next use reconnects."""
+    with _vector_db_lock:
+        _vector_dbs.clear()
+
+
+_table_locks: Dict[str, threading.Lock] = {}
+
+
+def table_lock(table_name: str) -> threading.Lock:
+    """Process-wide lock held by jobs that create or rewrite a table (ingestion, compaction)."""
+    with _vector_db_lock:
+        return _table_locks.setdefault(table_name, threading.Lock())
+
+
+def list_knowledge_tables(lancedb_uri: str) -> List[str]:
+    """Table names in the LanceDB directory (empty if it doesn't exist yet)."""
+    import os
+    if not os.path.exists(lancedb_uri):
+        return []
+    import lancedb
+    return sorted(lancedb.connect(lancedb_uri).table_names())
+
+
+# --- Metadata columns ---
+def ensure_metadata_columns(vector_db: Any) -> List[str]:
+    """Adds any missing metadata columns (NULL for existing rows); returns the added names."""
+    table = vector_db.table
+    missing = {name: f"CAST(NULL AS {sql_type})" for name, sql_type in METADATA_COLUMNS.items() if name not in table.schema.names}
+    if missing:
+        table.add_columns(missing)
+    return list(missing)
+
+
+def create_metadata_indexes(vector_db: Any) -> None:
+    """Builds (or rebuilds) scalar indexes on the metadata columns so pre-filters don't scan.
+
+    `id` is indexed too: upserts match on it and int8 tables fetch their candidates by it.
+    """
+    table = getattr(vector_db, "table", None)
+    if table is None or not hasattr(table, "create_scalar_index"):
+        return
+    for name in ("id", *METADATA_COLUMNS):
+        if name in table.schema.names:
+            table.create_scalar_index(name, replace=True)
+
+
+def compact_table(vector_db: Any, keep_versions_for: Optional[timedelta] = None) -> Dict[str, Any]:
+    """Merges the small fragments left by batched appends and upserts, folds new rows into
+    the indexes and drops versions older than `keep_versions_for` (LanceDB default: 7 days).
+
+    Returns the table's fragment counts before and after.
+    """
+    table = getattr(vector_db, "table", None)
+    if table is None or not hasattr(table, "optimize"):
+        raise ValueError("Table compaction needs the LanceDB vector backend.")
+    with table_lock(vector_db.table_name):  # Not while an ingestion writes to it
+        before = table.stats()["fragment_stats"]
+        table.optimize(cleanup_older_than=keep_versions_for)
+        after = table.stats()["fragment_stats"]
+    return {
+        "fragments_before": before["num_fragments"],
+        "small_fragments_before": before["num_small_fragments"],
+        "fragments_after": after["num_fragments"],
+        "small_fragments_after": after["num_small_fragments"],
+    }
+
+
+def create_table(vector_db: Any, layout: Optional[VectorLayout] = None) -> bool:
+    """Creates the table if missing: agno's own layout, or compact vectors (LanceDB only).
+
+    agno's LanceDb creates an empty float32 table as soon as it is constructed, so an
+    empty table is replaced by the compact one. A table with rows keeps its layout
+    (later writes follow its schema); returns True when that overrode `layout`.
+    """
+    if layout is None or not layout.compact:
+        vector_db.create()
+        return False
+    if not hasattr(vector_db, "connection"):
+        raise ValueError("Compact vector storage needs the LanceDB vector backend.")
+    if vector_db.exists() and vector_db.connection.open_table(vector_db.table_name).count_rows():
+        vector_db.create()
+        return True
+    import pyarrow as pa
+
+    sql_types = {"string": pa.string(), "bigint": pa.int64()}
+    vectors = vector_fields(vector_db.embedder.dimensions, layout)
+    # agno reads the vector and id column names from the first two fields of the schema
+    schema = pa.schema(
+        [vectors[0], pa.field("id", pa.string())]
+        + vectors[1:]
+        + [pa.field("payload", pa.string())]
+        + [pa.field(name, sql_types[sql_type]) for name, sql_type in METADATA_COLUMNS.items()]
+    )
+    vector_db.table = vector_db.connection.create_table(vector_db.table_name, schema=schema, mode="overwrite")
+    vector_db._vector_col, vector_db._id = "vector", "id"
+    return False
+
+
+def embed_documents(embedder: Any, documents: List[Any]) -> None:
+    """Sets each document's embedding: one batched call for local embedders, else one call each."""
+    if hasattr(embedder, "embed_batch"):  # app/embedders.py
+        for doc, vector in zip(documents, embedder.embed_batch([doc.content for doc in documents])):
+            doc.embedding = vector.tolist()
+        return
+    for doc in documents:
+        doc.embed(embedder=embedder)
+
+
+def row_id(content: str, user_id: Optional[str] = None) -> str:
+    """Row id for merge_insert: md5 of the content, like agno's, scoped to the owner for
+    private chunks so a user's copy never overwrites the public row (or another user's)."""
+    key = content if user_id is None else f"{user_id}\n{content}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def write_documents(vector_db: Any, documents: List[Any], user_id: Optional[str] = None, upsert: bool = True) -> None:
+    """Embeds and writes documents with chunk metadata (source, user_id, created_at).
+
+    Rows keep agno's id/vector/payload layout, so agno's own search still reads them
+    (unless the table was created with compact vectors, see app/vector_storage.py).
+    A `user_id` makes the chunks private to that user (see VISIBILITY_FILTER).
+    """
+    created_at = int(time.time())
+    for doc in documents:
+        doc.meta_data = {**(doc.meta_data or {}), "created_at": created_at, **({"user_id": user_id} if user_id else {})}
+    table = getattr(vector_db, "table", None)
+    if table is None or not hasattr(table, "merge_insert"):
+        # Other backends: the metadata lives in meta_data only
+        if upsert and getattr(vector_db, "upsert_available", lambda: False)():
+            vector_db.upsert(documents=documents)
+        else:
+            vector_db.insert(documents=documents)
+        return
+
+    import numpy as np
+    import pyarrow as pa
+
+    ensure_metadata_columns(vector_db)
+    embed_documents(vector_db.embedder, documents)
+    ids, payloads = [], []
+    for doc in documents:
+        content = doc.content.replace("\x00", "\ufffd")
+        ids.append(row_id(content, user_id))
+        payloads.append(json.dumps({"name": doc.name, "meta_data": doc.meta_data, "content": content, "usage": doc.usage}))
+    columns = {
+        "id": ids,
+        "payload": payloads,
+        "source": [doc.meta_data.get("source") for doc in documents],
+        "user_id": [user_id] * len(documents),
+        "created_at": [created_at] * len(documents),
+        **encode_vectors(
+            np.asarray([doc.embedding for doc in documents], dtype=np.float32),
+            table_layout(table.schema),
+            stored_dims=table.schema.field("vector").type.list_size,
+        ),
+    }
+    data = pa.Table.from_pydict(
+        {field.name: columns.get(field.name, pa.nulls(len(documents), field.type)) for field in table.schema},
+        schema=table.schema,
+    )
+    if upsert:
+        table.merge_insert("id").when_matched_update_all().when_not_matched_insert_all().execute(data)
+    else:
+        table.add(data)
+
+
+# --- Per-user scope ---
+# The agent is shared between sessions, so the user a search runs for travels in a
+# context variable set around each chat turn (tools on worker threads inherit it).
+_UNSCOPED = object()
+_search_user: ContextVar = ContextVar("knowledge_search_user", default=_UNSCOPED)
+
+
+def set_knowledge_user(user_id: Optional[str]) -> Token:
+    """Limits knowledge searches in this context to public chunks plus `user_id`'s own."""
+    return _search_user.set(user_id or None)
+
+
+def reset_knowledge_user(token: Token) -> None:
+    _search_user.reset(token)
+
+
+def embedder_key(embedder: Any) -> tuple:
+    """Identifies embedders that produce the same vectors (and comparable distances)."""
+    return (type(embedder).__name__, getattr(embedder, "id", None), getattr(embedder, "dimensions", None))
+
+
+# --- Filters ---
+def _timestamp(value: Any) -> int:
+    return int(value.timestamp()) if isinstance(value, datetime) else int(value)
+
+
+def _sql_literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _where_clause(key: str, value: Any, columns: Iterable[str]) -> Optional[str]:
+    """SQL for one filter, or None if the table has no column to push it down to."""
+    if key == VISIBILITY_FILTER and "user_id" in columns:
+        return "user_id IS NULL" if not value else f"(user_id IS NULL OR user_id = {_sql_literal(value)})"
+    if key in RANGE_FILTERS and "created_at" in columns:
+        return f"created_at {RANGE_FILTERS[key]} {_timestamp(value)}"
+    if key in METADATA_COLUMNS and key in columns:
+        if value is None:
+            return f"{key} IS NULL"
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return f"{key} IN ({', '.join(_sql_literal(v) for v in value)})" if value else "FALSE"
+        return f"{key} = {_sql_literal(value)}"
+    return None
+
+
+def build_where(filters: Optional[Dict[str, Any]], columns: Iterable[str] = tuple(METADATA_COLUMNS)) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Splits filters into a LanceDB `where` pre-filter and the rest (matched on payload meta_data)."""
+    columns = set(columns)
+    clauses, remaining = [], {}
+    for key, value in (filters or {}).items():
+        clause = _where_clause(key, value, columns)
+        if clause is None:
+            remaining[key] = value
+        else:
+            clauses.append(clause)
+    return (" AND ".join(clauses) or None), remaining
+
+
+def _matches(meta_data: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """Python equivalent of build_where(), for tables without metadata columns."""
+    for key, value in (filters or {}).items():
+        if key == VISIBILITY_FILTER:
+            if meta_data.get("user_id") not in (None, value or None):
+                return False
+        elif key in RANGE_FILTERS:
+            created_at = meta_data.get("created_at")
+            if created_at is None:
+                return False
+            if key == "created_after" and created_at < _timestamp(value):
+                return False
+            if key == "created_before" and created_at >= _timestamp(value):
+                return False
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            if meta_data.get(key) not in value:
+                return False
+        elif meta_data.get(key) != value:
+            return False
+    return True
+
+
+# --- Per-table search ---
+def search_table(
+    table_name: str,
+    vector_db: Any,
+    query: str,
+    query_embedding: Optional[List[float]],
+    limit: int,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[TableHit]:
+    """Top `limit` hits from one table.
+
+    LanceDB tables are queried directly with the precomputed embedding so the
+    distance comes back with each row (rescored at full precision for compact
+    vector columns), and filters on metadata columns are applied before the vector
+    search; other backends go through their own search.
+    """
+    table = getattr(vector_db, "table", None)
+    if query_embedding is not None and table is not None and hasattr(table, "search"):
+        where, remaining = build_where(filters, table.schema.names)
+        hits = []
+        for row in search_rows(table, query_embedding, limit, where, getattr(vector_db, "nprobes", None)):
+            payload = json.loads(row["payload"])
+            meta_data = payload.get("meta_data") or {}
+            if not _matches(meta_data, remaining):
+                continue
+            hits.append(TableHit(
+                table_name, len(hits), row.get("_distance"), payload.get("name"),
+                payload["content"], meta_data, payload.get("usage"), row.get(FULL_VECTOR_COLUMN, row.get("vector")),
+            ))
+        return hits
+    if table is None and hasattr(vector_db, "table_name") and hasattr(vector_db, "connection"):
+        return []  # LanceDB table that hasn't been created yet
+    # The backend only knows equality on meta_data; the special keys are checked here
+    plain = {key: value for key, value in (filters or {}).items() if key != VISIBILITY_FILTER and key not in RANGE_FILTERS}
+    documents = vector_db.search(query=query, limit=limit, filters=plain or None) or []
+    hits = []
+    for doc in documents:
+        meta_data = dict(doc.meta_data or {})
+        if _matches(meta_data, filters):
+            hits.append(TableHit(table_name, len(hits), None, doc.name, doc.content, meta_data, doc.usage))
+    return hits
+
+
+def _digest(hit: TableHit) -> str:
+    return hashlib.md5(hit.content.encode("utf-8")).hexdigest()
+
+
+def fuse_hits(hit_lists: Sequence[List[TableHit]], limit: int, mode: str = "distance") -> List[TableHit]:
+    """Merges per-table hits into one list, best first; identical content is kept once.
+
+    "distance" orders by raw vector distance, which is only meaningful when every
+    table uses the same embedder and metric; any hit without a distance makes it
+    fall back to reciprocal rank fusion ("rrf").
+    """
+    hits = [hit for hit_list in hit_lists for hit in hit_list]
+    best: Dict[str, TableHit] = {}
+    if mode == "distance" and all(hit.distance is not None for hit in hits):
+        for hit in sorted(hits, key=lambda hit: hit.distance):
+            best.setdefault(_digest(hit), hit)
+        return list(best.values())[:limit]
+    scores: Dict[str, float] = {}
+    for hit in hits:
+        digest = _digest(hit)
+        scores[digest] = scores.get(digest, 0.0) + 1.0 / (RRF_K + hit.rank + 1)
+        if digest not in best or hit.rank < best[digest].rank:
+            best[digest] = hit
+    ranked = sorted(scores, key=lambda digest: (-scores[digest], best[digest].table))
+    return [best[digest] for digest in ranked[:limit]]
+
+
+class MultiTableSearch:
+    """Fans a query out over several vector DB tables and fuses the results."""
+
+    def __init__(
+        self,
+        vector_dbs: Dict[str, Any],
+        fusion: str = "distance",
+        table_timeout: float = DEFAULT_TABLE_TIMEOUT,
+        max_workers: int = MAX_SEARCH_WORKERS,
+    ):
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"fusion must be one of {FUSION_MODES}, got {fusion!r}")
+        self.vector_dbs = dict(vector_dbs)
+        self.fusion = fusion
+        self.table_timeout = table_timeout
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(self.vector_dbs))), thread_name_prefix="knowledge-search"
+        )
+        self.last_search: Dict[str, Any] = {}
+
+    def _embeddings(self, query: str) -> Dict[tuple, Optional[List[float]]]:
+        """One embedding call per distinct embedder, not per table."""
+        embeddings: Dict[tuple, Optional[List[float]]] = {}
+        for vector_db in self.vector_dbs.values():
+            embedder = getattr(vector_db, "embedder", None)
+            if embedder is None or not hasattr(getattr(vector_db, "table", None), "search"):
+                continue  # Only LanceDB tables are queried with a precomputed embedding
+            key = embedder_key(embedder)
+            if key not in embeddings:
+                embeddings[key] = embedder.get_embedding(query)
+        return embeddings
+
+    def _table_args(self, query: str):
+        embeddings = self._embeddings(query)
+        for table_name, vector_db in self.vector_dbs.items():
+            embedder = getattr(vector_db, "embedder", None)
+            yield table_name, vector_db, embeddings.get(embedder_key(embedder)) if embedder is not None else None
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[TableHit]:
+        """Queries every table concurrently; tables slower than `table_timeout` are skipped."""
+        start = time.perf_counter()
+        if len(self.vector_dbs) == 1:
+            hits = self.search_sequential(query, limit, filters)  # Nothing to overlap
+            self.last_search = {"seconds": time.perf_counter() - start, "tables": 1, "errors": {}}
+            return hits
+        futures = {
+            self._pool.submit(search_table, table_name, vector_db, query, embedding, limit, filters): table_name
+            for table_name, vector_db, embedding in self._table_args(query)
+        }
+        done, not_done = wait(futures, timeout=self.table_timeout)
+        hit_lists, errors = [], {}
+        for future in done:
+            try:
+                hit_lists.append(future.result())
+            except Exception as e:
+                errors[futures[future]] = str(e)
+        for future in not_done:
+            future.cancel()
+            errors[futures[future]] = f"timed out after {self.table_timeout:g}s"
+        fused = fuse_hits(hit_lists, limit, self.fusion)
+        self.last_search = {"seconds": time.perf_counter() - start, "tables": len(futures), "errors": errors}
+        return fused
+
+    def search_sequential(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[TableHit]:
+        """Same result as search(), querying one table after another (baseline for benchmarks)."""
+        hit_lists = [
+            search_table(table_name, vector_db, query, embedding, limit, filters)
+            for table_name, vector_db, embedding in self._table_args(query)
+        ]
+        return fuse_hits(hit_lists, limit, self.fusion)
+
+
+def hit_document(hit: TableHit) -> Document:
+    return Document(name=hit.name, content=hit.content, meta_data={**hit.meta_data, "table": hit.table}, usage=hit.usage)
+
+
+class MultiTableKnowledge(AgentKnowledge):
+    """AgentKnowledge that searches one or more tables and returns the fused top documents.
+
+    `vector_db` is the first table, so loading and existence checks keep working
+    through the usual AgentKnowledge API.
+    """
+
+    table_names: List[str] = []
+    fusion: str = "distance"
+    table_timeout: float = DEFAULT_TABLE_TIMEOUT
+
+    _search: Optional[MultiTableSearch] = PrivateAttr(default=None)
+
+    def _get_search(self) -> MultiTableSearch:
+        if self._search is None:
+            self._search = MultiTableSearch(
+                {name: get_vector_db(name) for name in self.table_names},
+                fusion=self.fusion,
+                table_timeout=self.table_timeout,
+            )
+        return self._search
+
+    def search_hits(self, query: str, limit: int, filters: Optional[Dict[str, Any]] = None) -> List[TableHit]:
+        """Fused hits with distances and vectors (for app/context_packing.py), visibility applied."""
+        filters = dict(filters or {})
+        user_id = _search_user.get()
+        if user_id is not _UNSCOPED:
+            filters.setdefault(VISIBILITY_FILTER, user_id)
+        return self._get_search().search(query, limit=limit, filters=filters)
+
+    def search(self, query: str, num_documents: Optional[int] = None, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [hit_document(hit) for hit in self.search_hits(query, num_documents or self.num_documents, filters)]
+
+    async def async_search(self, query: str, num_documents: Optional[int] = None, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return await asyncio.to_thread(self.search, query, num_documents, filters)
+
+
+def create_knowledge(table_names: Iterable[str], fusion: str = "distance", table_timeout: float = DEFAULT_TABLE_TIMEOUT) -> AgentKnowledge:
+    """Knowledge over `table_names`, with metadata filters and per-user visibility."""
+    table_names = list(dict.fromkeys(table_names))  # Ordered, without duplicates
+    if not table_names:
+        raise ValueError("At least one knowledge table is required.")
+    return MultiTableKnowledge(
+        vector_db=get_vector_db(table_names[0]),
+        table_names=table_names,
+        fusion=fusion,
+        table_timeout=table_timeout,
+    )
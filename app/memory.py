@@ -0,0 +1,188 @@
+# app/memory.py
+# Session memory management: bounded chat transcripts kept in st.session_state.
+
+import json
+import sys
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import streamlit as st
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, delete, func, select
+from sqlalchemy.engine import Engine
+
+# --- Constants ---
+TRANSCRIPT_TABLE_NAME = "chat_transcripts_v1"
+MAX_HOT_MESSAGES = 40              # Messages kept in server RAM per browser tab
+EARLIER_PAGE_SIZE = 20             # Messages reloaded per "Load earlier messages" click
+TRANSCRIPT_RETENTION_DAYS = 7      # Spilled rows of abandoned tabs are pruned after this
+
+
+# --- Spill storage ---
+class TranscriptStore:
+    """Spill table for chat messages evicted from session state.
+
+    Lives in the same database as the agent's storage (reusing its SQLAlchemy engine).
+    """
+
+    def __init__(self, engine: Engine, table_name: str = TRANSCRIPT_TABLE_NAME):
+        self.engine = engine
+        self.table = Table(
+            table_name,
+            MetaData(),
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("transcript_id", String, index=True, nullable=False),
+            Column("seq", Integer, nullable=False),
+            Column("role", String, nullable=False),
+            Column("content", Text),
+            Column("metadata", Text),
+            Column("created_at", Float, nullable=False),
+        )
+        self.table.create(self.engine, checkfirst=True)
+
+    def spill(self, transcript_id: str, first_seq: int, messages: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        rows = [
+            {
+                "transcript_id": transcript_id,
+                "seq": first_seq + offset,
+                "role": message["role"],
+                "content": message.get("content", ""),
+                "metadata": json.dumps(message["metadata"], default=str) if "metadata" in message else None,
+                "created_at": now,
+            }
+            for offset, message in enumerate(messages)
+        ]
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert(), rows)
+
+    def load_before(self, transcript_id: str, before_seq: int, limit: int) -> List[Dict[str, Any]]:
+        """Returns up to `limit` spilled messages preceding `before_seq`, oldest first."""
+        query = (
+            select(self.table.c.seq, self.table.c.role, self.table.c.content, self.table.c.metadata)
+            .where(self.table.c.transcript_id == transcript_id, self.table.c.seq < before_seq)
+            .order_by(self.table.c.seq.desc())
+            .limit(limit)
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+        messages = []
+        for row in reversed(rows):
+            message = {"role": row.role, "content": row.content or "", "seq": row.seq}
+            if row.metadata:
+                message["metadata"] = json.loads(row.metadata)
+            messages.append(message)
+        return messages
+
+    def count(self, transcript_id: str) -> int:
+        query = select(func.count()).select_from(self.table).where(self.table.c.transcript_id == transcript_id)
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar() or 0
+
+    def clear(self, transcript_id: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.transcript_id == transcript_id))
+
+    def prune(self, older_than_days: float = TRANSCRIPT_RETENTION_DAYS) -> None:
+        cutoff = time.time() - older_than_days * 86400
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.created_at < cutoff))
+
+
+@lru_cache(maxsize=8)
+def get_transcript_store(engine: Engine) -> TranscriptStore:
+    """Returns the (process-wide) spill store for a storage engine, creating its table once."""
+    store = TranscriptStore(engine)
+    store.prune()
+    return store
+
+
+# --- Session-state transcript ---
+def _ensure_transcript_state() -> None:
+    st.session_state.setdefault("messages", [])
+    st.session_state.setdefault("transcript_id", uuid.uuid4().hex)  # One per browser tab
+    st.session_state.setdefault("spilled_count", 0)                 # Seq of the first hot message
+    st.session_state.setdefault("earlier_messages", [])            # Reloaded spilled messages
+
+
+def trim_transcript(store: Optional[TranscriptStore], max_hot: int = MAX_HOT_MESSAGES) -> int:
+    """Spills the oldest messages beyond `max_hot` to `store`. Returns how many were spilled.
+
+    Without a store the overflow is simply dropped, which still bounds RAM.
+    """
+    _ensure_transcript_state()
+    messages = st.session_state.messages
+    overflow = len(messages) - max_hot
+    if overflow <= 0:
+        return 0
+    evicted = messages[:overflow]
+    if store is not None:
+        store.spill(st.session_state.transcript_id, st.session_state.spilled_count, evicted)
+    del messages[:overflow]
+    st.session_state.spilled_count += overflow
+    # The earlier-messages view is anchored to the old hot window; reset it
+    st.session_state.earlier_messages = []
+    return overflow
+
+
+def load_earlier_messages(store: Optional[TranscriptStore], page_size: int = EARLIER_PAGE_SIZE) -> int:
+    """Prepends the previous page of spilled messages to the earlier-messages view."""
+    _ensure_transcript_state()
+    if store is None:
+        return 0
+    earlier = st.session_state.earlier_messages
+    before_seq = earlier[0]["seq"] if earlier else st.session_state.spilled_count
+    page = store.load_before(st.session_state.transcript_id, before_seq, page_size)
+    st.session_state.earlier_messages = page + earlier
+    return len(page)
+
+
+def reset_transcript(store: Optional[TranscriptStore]) -> None:
+    """Clears the hot transcript and starts a new spill transcript for this tab.
+
+    Spilled rows are deleted when a store is given, otherwise left to retention pruning.
+    """
+    _ensure_transcript_state()
+    if store is not None:
+        store.clear(st.session_state.transcript_id)
+    st.session_state.transcript_id = uuid.uuid4().hex
+    st.session_state.messages = []
+    st.session_state.earlier_messages = []
+    st.session_state.spilled_count = 0
+
+
+# --- Memory accounting ---
+def deep_sizeof(obj: Any, _seen: Optional[set] = None) -> int:
+    """Approximate bytes held by `obj` and everything it references."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def transcript_memory_stats(store: Optional[TranscriptStore] = None) -> Dict[str, Any]:
+    """Per-session accounting of what the chat transcript holds in server RAM."""
+    _ensure_transcript_state()
+    messages = st.session_state.messages
+    earlier = st.session_state.earlier_messages
+    stats = {
+        "hot_messages": len(messages),
+        "hot_bytes": deep_sizeof(messages),
+        "metadata_bytes": sum(deep_sizeof(m.get("metadata", {})) for m in messages),
+        "earlier_loaded": len(earlier),
+        "earlier_bytes": deep_sizeof(earlier),
+        "spilled_messages": st.session_state.spilled_count,
+        "session_state_bytes": deep_sizeof({k: st.session_state[k] for k in st.session_state.keys()}),
+    }
+    if store is not None:
+        stats["spilled_rows_in_db"] = store.count(st.session_state.transcript_id)
+    return stats
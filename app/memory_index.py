@@ -0,0 +1,247 @@
+# app/memory_index.py
+# Top-k semantic retrieval of user memories, with near-duplicate merging.
+#
+# Memory embeddings are kept as float32 blobs in the shared database (one row per
+# memory, re-embedded only when its text changes) and as one normalised numpy matrix
+# per user in process memory. Each turn ranks the user's memories against the prompt
+# and only the top k go into the context, so the prompt stops growing with the user's
+# history. When a new memory is almost identical to an existing one, the older of the
+# two is deleted.
+
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Column, Float, LargeBinary, MetaData, String, Table, delete, select
+from sqlalchemy.engine import Engine
+
+# --- Constants ---
+MEMORY_VECTOR_TABLE_NAME = "user_memory_vectors_v1"
+DEFAULT_TOP_K = 5                  # Memories included per turn
+DEFAULT_MIN_SCORE = 0.2            # Cosine similarity below which a memory is left out
+DEFAULT_DEDUP_THRESHOLD = 0.92     # Cosine similarity at which two memories count as duplicates
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count that also works for CJK text without spaces."""
+    return max(len(text.split()), len(text) // 4)
+
+
+def _text_hash(text: str, embedder: Any) -> str:
+    # The embedder is part of the key, so switching embedders re-embeds instead of mixing spaces
+    embedder_id = f"{type(embedder).__name__}:{getattr(embedder, 'id', '')}:{getattr(embedder, 'dimensions', '')}"
+    return hashlib.sha1(f"{embedder_id}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _normalize(vector: Any) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+# --- Vector storage ---
+class MemoryVectorStore:
+    """Memory embeddings in the shared database, keyed by memory id and text hash."""
+
+    def __init__(self, engine: Engine, table_name: str = MEMORY_VECTOR_TABLE_NAME):
+        self.engine = engine
+        self.table = Table(
+            table_name,
+            MetaData(),
+            Column("memory_id", String, primary_key=True),
+            Column("user_id", String, index=True, nullable=False),
+            Column("text_hash", String, nullable=False),
+            Column("vector", LargeBinary, nullable=False),  # float32 bytes
+            Column("updated_at", Float, nullable=False),
+        )
+        self.table.create(self.engine, checkfirst=True)
+
+    def load(self, user_id: str) -> Dict[str, Tuple[str, np.ndarray]]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(self.table).where(self.table.c.user_id == user_id))
+            return {row.memory_id: (row.text_hash, np.frombuffer(row.vector, dtype=np.float32)) for row in rows}
+
+    def save(self, user_id: str, vectors: Dict[str, Tuple[str, np.ndarray]]) -> None:
+        if not vectors:
+            return
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.memory_id.in_(list(vectors))))
+            conn.execute(self.table.insert(), [
+                {"memory_id": memory_id, "user_id": user_id, "text_hash": text_hash,
+                 "vector": vector.astype(np.float32).tobytes(), "updated_at": now}
+                for memory_id, (text_hash, vector) in vectors.items()
+            ])
+
+    def delete(self, memory_ids: List[str]) -> None:
+        if memory_ids:
+            with self.engine.begin() as conn:
+                conn.execute(delete(self.table).where(self.table.c.memory_id.in_(memory_ids)))
+
+
+class _UserVectors:
+    """One user's memories and their normalised embeddings, row-aligned."""
+
+    def __init__(self):
+        self.memories: List[Any] = []
+        self.hashes: List[str] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.lock = threading.Lock()
+
+
+# --- Index ---
+class UserMemoryIndex:
+    """Ranks a user's memories against the prompt so only the relevant ones are sent."""
+
+    def __init__(
+        self,
+        memory: Any,
+        embedder: Any,
+        store: MemoryVectorStore,
+        top_k: int = DEFAULT_TOP_K,
+        min_score: float = DEFAULT_MIN_SCORE,
+        dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD,
+    ):
+        self.memory = memory
+        self.embedder = embedder
+        self.store = store
+        self.top_k = top_k
+        self.min_score = min_score
+        self.dedup_threshold = dedup_threshold
+        self._users: Dict[str, _UserVectors] = {}
+        self._users_lock = threading.Lock()
+        # Agents are shared between sessions, so per-turn accounting lives on the calling thread
+        self._turn = threading.local()
+
+    # --- Per-turn accounting ---
+    def start_turn(self) -> None:
+        self._turn.stats = None
+
+    def end_turn(self) -> Dict[str, Any]:
+        """Returns this thread's retrieval stats for the finished turn (empty if none ran)."""
+        stats = getattr(self._turn, "stats", None) or {}
+        self._turn.stats = None
+        return stats
+
+    def _user(self, user_id: str) -> _UserVectors:
+        with self._users_lock:
+            return self._users.setdefault(user_id, _UserVectors())
+
+    def _embed(self, text: str) -> np.ndarray:
+        return _normalize(self.embedder.get_embedding(text))
+
+    # --- Sync and dedup ---
+    def sync(self, user_id: str) -> List[Any]:
+        """Brings the user's vectors in line with the memory DB and merges new duplicates.
+
+        Only memories that are new or whose text changed are embedded.
+        """
+        entry = self._user(user_id)
+        with entry.lock:
+            memories = [m for m in (self.memory.get_user_memories(user_id=user_id) or []) if getattr(m, "memory", None)]
+            hashes = [_text_hash(m.memory, self.embedder) for m in memories]
+            if hashes == entry.hashes and [m.memory_id for m in memories] == [m.memory_id for m in entry.memories]:
+                entry.memories = memories  # Same texts; keep the fresh objects
+                return memories
+
+            known = {m.memory_id: (h, row) for m, h, row in zip(entry.memories, entry.hashes, entry.matrix)}
+            if not known:
+                known = self.store.load(user_id)
+            vectors, new_ids, embedded = [], set(), {}
+            for memory, text_hash in zip(memories, hashes):
+                cached = known.get(memory.memory_id)
+                if cached is not None and cached[0] == text_hash:
+                    vectors.append(np.asarray(cached[1], dtype=np.float32))
+                else:
+                    vector = self._embed(memory.memory)
+                    vectors.append(vector)
+                    embedded[memory.memory_id] = (text_hash, vector)
+                    new_ids.add(memory.memory_id)
+            self.store.save(user_id, embedded)
+            removed = [memory_id for memory_id in known if memory_id not in {m.memory_id for m in memories}]
+            self.store.delete(removed)
+
+            matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+            keep = self._merge_duplicates(user_id, memories, matrix, new_ids)
+            entry.memories = [memories[i] for i in keep]
+            entry.hashes = [hashes[i] for i in keep]
+            entry.matrix = matrix[keep] if len(keep) else np.zeros((0, 0), dtype=np.float32)
+            return entry.memories
+
+    def _merge_duplicates(self, user_id: str, memories: List[Any], matrix: np.ndarray, new_ids: set) -> List[int]:
+        """Deletes the older memory of every near-duplicate pair involving a new memory.
+
+        Returns the row indexes that survive.
+        """
+        alive = list(range(len(memories)))
+        if not new_ids or len(memories) < 2:
+            return alive
+        dropped = set()
+        for i, memory in enumerate(memories):
+            if memory.memory_id not in new_ids or i in dropped:
+                continue
+            similarities = matrix @ matrix[i]
+            similarities[i] = -1.0
+            for j in dropped:
+                similarities[j] = -1.0
+            j = int(np.argmax(similarities))
+            if similarities[j] < self.dedup_threshold:
+                continue
+            older, newer = (j, i) if _updated(memories[j]) <= _updated(memory) else (i, j)
+            self._merge_into(user_id, memories[newer], memories[older])
+            dropped.add(older)
+        if dropped:
+            self.store.delete([memories[i].memory_id for i in dropped])
+            self._record(merged=len(dropped))
+        return [i for i in alive if i not in dropped]
+
+    def _merge_into(self, user_id: str, kept: Any, duplicate: Any) -> None:
+        topics = list(dict.fromkeys((getattr(kept, "topics", None) or []) + (getattr(duplicate, "topics", None) or [])))
+        if topics != (getattr(kept, "topics", None) or []) and hasattr(self.memory, "replace_user_memory"):
+            kept.topics = topics
+            self.memory.replace_user_memory(memory_id=kept.memory_id, memory=kept, user_id=user_id)
+        self.memory.delete_user_memory(user_id=user_id, memory_id=duplicate.memory_id)
+
+    def _record(self, **values: Any) -> None:
+        stats = getattr(self._turn, "stats", None)
+        if stats is None:
+            stats = self._turn.stats = {}
+        for key, value in values.items():
+            stats[key] = stats.get(key, 0) + value if isinstance(value, (int, float)) else value
+
+    # --- Retrieval ---
+    def search(self, user_id: str, query: str, top_k: Optional[int] = None) -> List[Any]:
+        """The user's `top_k` memories most similar to `query`, best first."""
+        memories = self.sync(user_id)
+        top_k = top_k or self.top_k
+        if len(memories) <= top_k:
+            selected = memories
+        else:
+            entry = self._user(user_id)
+            with entry.lock:  # Rows of matrix and memories must line up
+                memories, matrix = entry.memories, entry.matrix
+            scores = matrix @ self._embed(query)
+            order = np.argsort(-scores)[:top_k]
+            selected = [memories[i] for i in order if scores[i] >= self.min_score]
+        all_tokens = sum(estimate_tokens(f"- {m.memory}") for m in memories)
+        included_tokens = sum(estimate_tokens(f"- {m.memory}") for m in selected)
+        self._record(memories=len(memories), included=len(selected), tokens_saved=all_tokens - included_tokens)
+        return selected
+
+
+def _updated(memory: Any) -> float:
+    last_updated = getattr(memory, "last_updated", None)
+    return last_updated.timestamp() if hasattr(last_updated, "timestamp") else float(last_updated or 0)
+
+
+def attach_memory_index(agent: Any, index: UserMemoryIndex) -> Any:
+    """Attaches `index` to the agent; turn context then carries only the top-k memories."""
+    agent.memory_index = index
+    return agent
+
+
+def get_memory_index(agent: Any) -> Optional[UserMemoryIndex]:
+    """Returns the index attached to the agent, if top-k memory retrieval is enabled."""
+    return getattr(agent, "memory_index", None)
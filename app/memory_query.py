@@ -0,0 +1,251 @@
+# app/memory_query.py
+# Typed, paginated queries over the user memory table for the Memories tab.
+#
+# agno's Memory.get_user_memories() loads every memory of a user. MemoryQuery runs
+# search, topic filter, sort and LIMIT/OFFSET in SQL against the memory DB's own table
+# (SqliteMemoryDb or PostgresMemoryDb), and caches the row counts the pager needs and
+# the topic list of the filter box.
+#
+# PostgresMemoryDb stores `memory` as JSONB. SqliteMemoryDb stores str(dict), a Python
+# repr that SQLite's JSON functions reject, so on SQLite the column is read through
+# memory_json(), a SQL function registered on each connection that converts it to JSON.
+
+import ast
+import json
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, cast, func, literal, select, true
+
+from .utils import TTLCache
+
+# --- Constants ---
+SORT_ORDERS = ("recent", "oldest", "topic")
+DEFAULT_PAGE_SIZE = 20
+COUNT_CACHE_TTL = 30.0           # Seconds a cached count or topic list is trusted (Refresh clears it)
+SQLITE_MEMORY_JSON = "memory_json"  # SQLite function registered by MemoryQuery._connect()
+
+
+@dataclass
+class MemoryRecord:
+    memory_id: str
+    memory: str
+    topics: List[str] = field(default_factory=list)
+    updated_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+
+@dataclass
+class MemoryPage:
+    records: List[MemoryRecord]
+    total: int
+    page: int
+    page_size: int
+
+    @property
+    def pages(self) -> int:
+        return max(1, math.ceil(self.total / self.page_size))
+
+    @property
+    def first_index(self) -> int:
+        """1-based position of the first record on this page (0 when empty)."""
+        return self.page * self.page_size + 1 if self.records else 0
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromtimestamp(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_memory(value: Any) -> Dict[str, Any]:
+    """The `memory` column as a dict: JSON, or the Python repr SqliteMemoryDb writes."""
+    if not isinstance(value, str):
+        return value or {}
+    try:
+        return json.loads(value)
+    except ValueError:
+        return ast.literal_eval(value)
+
+
+def _memory_json(value: Optional[str]) -> Optional[str]:
+    """memory_json() on SQLite; NULL for unreadable rows, which then match no filter."""
+    try:
+        return json.dumps(_parse_memory(value)) if value else None
+    except (ValueError, SyntaxError):
+        return None
+
+
+def _record(memory_id: str, payload: Any, updated_at: Any = None, created_at: Any = None) -> MemoryRecord:
+    payload = _parse_memory(payload)
+    return MemoryRecord(
+        memory_id=memory_id,
+        memory=payload.get("memory", ""),
+        topics=list(payload.get("topics") or []),
+        updated_at=_to_datetime(updated_at or payload.get("last_updated")),
+        created_at=_to_datetime(created_at),
+    )
+
+
+class MemoryQuery:
+    """SQL-side search, filtering, sorting and pagination of one memory table."""
+
+    def __init__(self, memory_db: Any, count_cache_ttl: float = COUNT_CACHE_TTL):
+        self.table = memory_db.table
+        self.engine = memory_db.db_engine
+        self._cache = TTLCache(maxsize=1024, ttl=count_cache_ttl)  # Counts and topic lists
+
+    def _connect(self):
+        conn = self.engine.connect()
+        if self.engine.dialect.name == "sqlite":
+            conn.connection.driver_connection.create_function(SQLITE_MEMORY_JSON, 1, _memory_json, deterministic=True)
+        return conn
+
+    def _json_field(self, key: str):
+        """Text of a top-level key of the `memory` column, per dialect."""
+        column = self.table.c.memory
+        if self.engine.dialect.name == "postgresql":
+            return column.op("->>")(key)
+        return func.json_extract(getattr(func, SQLITE_MEMORY_JSON)(column), f"$.{key}")
+
+    def _topic_values(self):
+        """Table-valued function over the `topics` array of each row, per dialect."""
+        column = self.table.c.memory
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import JSONB
+            return func.jsonb_array_elements_text(cast(column, JSONB).op("->")("topics")).table_valued("value")
+        return func.json_each(getattr(func, SQLITE_MEMORY_JSON)(column), "$.topics").table_valued("value")
+
+    def _where(self, user_id: str, search: Optional[str], topic: Optional[str]):
+        clauses = [self.table.c.user_id == user_id]
+        if search:
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append(func.lower(self._json_field("memory")).like(pattern.lower(), escape="\\"))
+        if topic:
+            values = self._topic_values()
+            clauses.append(select(literal(1)).select_from(values).where(values.c.value == topic).exists())
+        return and_(*clauses)
+
+    def count(self, user_id: str, search: Optional[str] = None, topic: Optional[str] = None) -> int:
+        """Number of matching memories (cached for COUNT_CACHE_TTL seconds)."""
+        key = ("count", user_id, search or "", topic or "")
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        with self._connect() as conn:
+            total = conn.execute(select(func.count()).select_from(self.table).where(self._where(user_id, search, topic))).scalar_one()
+        self._cache.set(key, total)
+        return total
+
+    def page(
+        self,
+        user_id: str,
+        page: int = 0,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        search: Optional[str] = None,
+        topic: Optional[str] = None,
+        sort: str = "recent",
+    ) -> MemoryPage:
+        """One page of the user's memories; only that page's rows leave the database."""
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"sort must be one of {SORT_ORDERS}, got {sort!r}")
+        total = self.count(user_id, search, topic)
+        page = min(max(page, 0), max(0, math.ceil(total / page_size) - 1))
+        updated = self.table.c.updated_at
+        order = {
+            "recent": [updated.desc()],
+            "oldest": [updated.asc()],
+            "topic": [self._json_field("topics").asc(), updated.desc()],
+        }[sort]
+        query = (
+            select(self.table.c.id, self.table.c.memory, self.table.c.updated_at, self.table.c.created_at)
+            .where(self._where(user_id, search, topic))
+            .order_by(*order, self.table.c.id)
+            .limit(page_size)
+            .offset(page * page_size)
+        )
+        with self._connect() as conn:
+            records = [_record(row.id, row.memory, row.updated_at, row.created_at) for row in conn.execute(query)]
+        return MemoryPage(records=records, total=total, page=page, page_size=page_size)
+
+    def topics(self, user_id: str) -> List[str]:
+        """Distinct topics across the user's memories, sorted (cached like count())."""
+        key = ("topics", user_id)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return list(cached)
+        values = self._topic_values()
+        query = (
+            select(values.c.value).distinct()
+            .select_from(self.table).join(values, true())
+            .where(self.table.c.user_id == user_id)
+        )
+        with self._connect() as conn:
+            topics = sorted(value for value in conn.execute(query).scalars() if value)
+        self._cache.set(key, topics)
+        return list(topics)
+
+    def invalidate(self) -> None:
+        """Drops cached counts and topics, e.g. after memories were added or deleted."""
+        self._cache.clear()
+
+
+class ListMemoryQuery:
+    """Same API over Memory.get_user_memories(), for memory DBs without a SQL table."""
+
+    def __init__(self, memory: Any):
+        self.memory = memory
+
+    def _records(self, user_id: str, search: Optional[str], topic: Optional[str]) -> List[MemoryRecord]:
+        records = [
+            MemoryRecord(m.memory_id, m.memory, list(m.topics or []), _to_datetime(getattr(m, "last_updated", None)))
+            for m in (self.memory.get_user_memories(user_id=user_id) or [])
+        ]
+        if search:
+            records = [r for r in records if search.lower() in r.memory.lower()]
+        if topic:
+            records = [r for r in records if topic in r.topics]
+        return records
+
+    def count(self, user_id: str, search: Optional[str] = None, topic: Optional[str] = None) -> int:
+        return len(self._records(user_id, search, topic))
+
+    def page(self, user_id: str, page: int = 0, page_size: int = DEFAULT_PAGE_SIZE, search: Optional[str] = None,
+             topic: Optional[str] = None, sort: str = "recent") -> MemoryPage:
+        records = self._records(user_id, search, topic)
+        by_time = lambda r: r.updated_at or datetime.min
+        if sort == "topic":
+            records.sort(key=by_time, reverse=True)
+            records.sort(key=lambda r: r.topics[:1])
+        else:
+            records.sort(key=by_time, reverse=(sort == "recent"))
+        page = min(max(page, 0), max(0, math.ceil(len(records) / page_size) - 1))
+        return MemoryPage(records[page * page_size:(page + 1) * page_size], len(records), page, page_size)
+
+    def topics(self, user_id: str) -> List[str]:
+        return sorted({topic for record in self._records(user_id, None, None) for topic in record.topics})
+
+    def invalidate(self) -> None:
+        pass
+
+
+_queries: Dict[Tuple[str, str], MemoryQuery] = {}
+
+
+def get_memory_query(memory: Any):
+    """MemoryQuery for the memory's SQL table (one per database and table), or a
+    ListMemoryQuery fallback for memory DBs without one."""
+    db = getattr(memory, "db", None)
+    table, engine = getattr(db, "table", None), getattr(db, "db_engine", None)
+    if table is None or engine is None:
+        return ListMemoryQuery(memory)  # Holds no state worth keeping
+    key = (str(engine.url), table.name)
+    query = _queries.get(key)
+    if query is None or query.engine is not engine or query.table is not table:
+        query = _queries[key] = MemoryQuery(db)  # New, or the DB was reconnected
+    return query
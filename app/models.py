@@ -1,52 +1,97 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from agno.agent import Agent
-# Import specific model classes
-from agno.models.openai import OpenAIChat
-from agno.models.google import Gemini
-from agno.models.anthropic import Claude
 # Memory imports
-import os
-from agno.memory.v2.db.sqlite import SqliteMemoryDb
+import importlib
+import threading
 from agno.memory.v2.memory import Memory
-from agno.storage.sqlite import SqliteStorage # Import Storage
-from typing import Tuple, Optional # Import Optional
-from agno.tools.duckduckgo import DuckDuckGoTools # <<< Added Import
+from agno.storage.base import Storage # Base class of the SQLite/Postgres storages
+from typing import Tuple, Optional, TYPE_CHECKING # Import Optional
+from .search import CachedSearchTools # Cached/deduplicated DuckDuckGo search
+from .tool_executor import ParallelToolExecutor, enable_parallel_tool_calls
+from .http_pool import use_http_pool # Shared keep-alive HTTP pool per provider
+from .router import ModelClassifier, ModelRouter, attach_router
+from .resilience import ResilientCaller, enable_resilience
+from .config import get_knowledge_config, get_memory_retrieval_config, get_optional_key_from_env, get_resilience_config, get_storage_config, get_tool_compaction_config, get_context_packing_config
+from .storage import create_memory_db, create_storage, get_cache_versions, get_shared_engine
+from .memory_index import MemoryVectorStore, UserMemoryIndex, attach_memory_index
+from .knowledge import create_knowledge, get_vector_db, reset_vector_dbs
+from .tool_compaction import ToolResultCompactor, attach_tool_compactor
+from .context_packing import ContextPacker, attach_context_packer, context_budget
+from .prompt_cache import attach_turn_context
 
 # --- Knowledge Imports ---
 from agno.agent import AgentKnowledge
-from agno.vectordb.lancedb import LanceDb
-from agno.vectordb.search import SearchType
+
+if TYPE_CHECKING:
+    # Only for type hints; the real import happens lazily in get_recipes_vector_db()
+    from agno.vectordb.lancedb import LanceDb
 
 # Import the unified key getter
 # from app.config import get_api_key_for_provider
 
 # --- Constants ---
-DB_DIR = "tmp"
-DB_FILE = os.path.join(DB_DIR, "agent_memory.db")
+# Paths come from the storage config (AGNO_DATA_DIR, default ./tmp); see app/config.py
+_storage_config = get_storage_config()
+DB_DIR = _storage_config["data_dir"]
+DB_FILE = _storage_config["sqlite_file"]
 MEMORY_TABLE_NAME = "user_memories_v2"
 STORAGE_TABLE_NAME = "agent_sessions_v2" # New constant for storage table
 
 # --- Knowledge Base Setup ---
-LANCEDB_URI = "tmp/lancedb" # Store LanceDB data locally within the project
+LANCEDB_URI = _storage_config["lancedb_uri"] # Store LanceDB data locally within the project by default
 # Default table, not used by the agent in this configuration
 # DEFAULT_KNOWLEDGE_TABLE_NAME = "agent_knowledge_v1"
 RECIPES_TABLE_NAME = "recipes" # Table name from test.py
 
-# Initialize LanceDB Vector DB specifically for the recipes table
-# This is the vector_db the agent will use for knowledge search
-recipes_vector_db = LanceDb(
-    table_name=RECIPES_TABLE_NAME,
-    uri=LANCEDB_URI,
-    # search_type=SearchType.keyword # Optional: Can specify search type
-)
-
-# Initialize the Knowledge Base using the recipes vector_db
-# This knowledge object will be passed to the agent
-recipes_knowledge = AgentKnowledge(
-    vector_db=recipes_vector_db
-)
+# The vector DB and knowledge base are built on first use rather than at import time,
+# so a cold start doesn't pay for lancedb (and its LanceDB connection) up front.
+_knowledge_lock = threading.Lock()
+_recipes_knowledge = None
+
+def get_recipes_vector_db() -> "LanceDb":
+    """Returns the LanceDB vector DB for the recipes table, connecting on first call."""
+    # Shared with multi-table knowledge (app/knowledge.py), one handle per table
+    return get_vector_db(RECIPES_TABLE_NAME)
+
+def get_recipes_knowledge() -> AgentKnowledge:
+    """Returns the Knowledge Base backed by the recipes vector_db, building it on first call."""
+    global _recipes_knowledge
+    if _recipes_knowledge is None:
+        with _knowledge_lock:
+            if _recipes_knowledge is None:
+                _recipes_knowledge = create_knowledge([RECIPES_TABLE_NAME])
+    return _recipes_knowledge
+
+def reset_knowledge() -> None:
+    """Drops the cached vector DB/knowledge so the next use reconnects."""
+    global _recipes_knowledge
+    with _knowledge_lock:
+        _recipes_knowledge = None
+    reset_vector_dbs()
+
+def __getattr__(name: str):
+    # Keep `from app.models import recipes_vector_db` working, but lazily
+    if name == "recipes_vector_db":
+        return get_recipes_vector_db()
+    if name == "recipes_knowledge":
+        return get_recipes_knowledge()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 # --- End Knowledge Base Setup ---
 
+# --- Provider Model Classes ---
+# Provider SDKs are heavy to import; only the one actually selected gets loaded.
+MODEL_CLASS_PATHS = {
+    "openai": ("agno.models.openai", "OpenAIChat"),
+    "google": ("agno.models.google", "Gemini"),
+    "anthropic": ("agno.models.anthropic", "Claude"),
+}
+
+def get_model_class(provider_key: str):
+    """Imports and returns the agno model class for a provider key on first use."""
+    module_path, class_name = MODEL_CLASS_PATHS[provider_key]
+    return getattr(importlib.import_module(module_path), class_name)
+
 # --- Model ID Mappings ---
 # Maps provider key (lowercase) to a list of available model IDs
 AVAILABLE_MODELS = {
@@ -69,6 +114,39 @@ AVAILABLE_MODELS = {
     ]
 }
 
+# Display names shown in the sidebar provider selector
+PROVIDER_DISPLAY_NAMES = {
+    "openai": "OpenAI",
+    "google": "Google/Gemini",
+    "anthropic": "Anthropic/Claude"
+}
+
+# Smaller/faster model per provider used for memory tasks
+MEMORY_MODEL_IDS = {
+    "openai": "gpt-4o-mini-2024-07-18",
+    "google": "gemini-1.5-flash-latest",
+    "anthropic": "claude-3-5-haiku-20241022",
+}
+
+# Cheap tier per provider that model routing sends simple turns to
+CHEAP_MODEL_IDS = {
+    "openai": "gpt-4.1-nano-2025-04-14",
+    "google": "gemini-2.0-flash-lite",
+    "anthropic": "claude-3-5-haiku-20241022",
+}
+
+def _has_field(model_class, name: str) -> bool:
+    """Whether this agno version's model class accepts `name` (dataclass or pydantic)."""
+    fields = getattr(model_class, "__dataclass_fields__", None) or getattr(model_class, "model_fields", None) or {}
+    return name in fields
+
+def get_failover_provider(provider_key: str) -> Optional[str]:
+    """First other provider with an API key in the environment, for failover."""
+    for key in MODEL_CLASS_PATHS:
+        if key != provider_key and get_optional_key_from_env(key):
+            return key
+    return None
+
 # Helper to get provider key from display name
 def get_provider_key(provider_display_name: str) -> str:
     name_lower = provider_display_name.lower()
@@ -89,53 +167,100 @@ def initialize_agent(
     use_session_summary: bool,
     load_chat_history: bool,
     description: str = None,
-    instructions: list = None
-) -> Tuple[Agent, Memory, SqliteStorage, LanceDb, str]:
+    instructions: list = None,
+    parallel_tool_calls: bool = False,
+    model_routing: str = "off",
+    resilient_calls: bool = False,
+    stable_prompt: bool = False,
+    knowledge_tables: tuple = None,
+    memory_retrieval: bool = False,
+    compact_tool_results: bool = False,
+    pack_context: bool = False
+) -> Tuple[Agent, Memory, Storage, "LanceDb", str]:
     """Initializes agent based on selected settings, using provided API key."""
 
     provider_key = get_provider_key(provider_name)
 
     # --- Initialize Model Instance (using passed api_key) --- 
-    model_instance = None
-    if provider_key == "openai":
-        model_instance = OpenAIChat(id=model_id, api_key=api_key)
-    elif provider_key == "google":
-        model_instance = Gemini(id=model_id, api_key=api_key)
-    elif provider_key == "anthropic":
-        model_instance = Claude(id=model_id, api_key=api_key)
-    else:
+    if provider_key not in MODEL_CLASS_PATHS:
         st.error(f"Unsupported provider: {provider_name}")
         st.stop()
+    model_class = get_model_class(provider_key)
+    model_kwargs = {}
+    if stable_prompt and _has_field(model_class, "cache_system_prompt"):
+        model_kwargs["cache_system_prompt"] = True # Claude: cache breakpoint after tools + system prompt
+    # Main and memory models share the provider's pooled HTTP client (and warm connections)
+    model_instance = use_http_pool(model_class(id=model_id, api_key=api_key, **model_kwargs), provider_key)
+
+    # Opt-in: run independent tool calls from the same turn concurrently
+    tool_executor = ParallelToolExecutor() if parallel_tool_calls else None
+    if tool_executor:
+        enable_parallel_tool_calls(model_instance, tool_executor)
+
+    # Opt-in: timeouts, jittered retries and hedging on provider calls, and failover to
+    # the default model of another provider that has a key in the environment
+    if resilient_calls:
+        resilience_config = get_resilience_config()
+        fallback_model = None
+        fallback_key = get_failover_provider(provider_key) if resilience_config["failover"] else None
+        if fallback_key:
+            fallback_api_key = get_optional_key_from_env(fallback_key)
+            fallback_model = use_http_pool(
+                get_model_class(fallback_key)(id=AVAILABLE_MODELS[fallback_key][0], api_key=fallback_api_key),
+                fallback_key,
+            )
+            enable_resilience(fallback_model, ResilientCaller(**{**resilience_config, "hedge": False}))
+            attach_turn_context(fallback_model)
+            if tool_executor:
+                enable_parallel_tool_calls(fallback_model, tool_executor)
+        enable_resilience(model_instance, ResilientCaller(**resilience_config), fallback_model=fallback_model)
+
+    # Per-turn memories/summary (stable layout, top-k memories) reach the provider with the
+    # prompt without entering the run's stored messages (see app/prompt_cache.py)
+    attach_turn_context(model_instance)
 
     # --- Initialize Memory & Storage --- 
-    os.makedirs(DB_DIR, exist_ok=True)
     
     # Use a smaller/faster model for memory tasks as recommended in docs
-    if provider_key == "openai":
-         memory_model = OpenAIChat(id="gpt-4o-mini-2024-07-18", api_key=api_key) 
-    elif provider_key == "google":
-         memory_model = Gemini(id="gemini-1.5-flash-latest", api_key=api_key) 
-    elif provider_key == "anthropic":
-         memory_model = Claude(id="claude-3-5-haiku-20241022", api_key=api_key)
-    else: # Fallback
-        memory_model = OpenAIChat(id="gpt-4o-mini-2024-07-18", api_key=api_key)
+    memory_model_id = MEMORY_MODEL_IDS.get(provider_key, MEMORY_MODEL_IDS["openai"])
+    memory_model = use_http_pool(model_class(id=memory_model_id, api_key=api_key), provider_key)
     
     # Initialize memory database for user memories and session summaries
-    memory_db = SqliteMemoryDb(table_name=MEMORY_TABLE_NAME, db_file=DB_FILE)
+    # (SQLite file by default, or the shared Postgres server in multi-process deployments)
+    memory_db = create_memory_db(table_name=MEMORY_TABLE_NAME)
     memory = Memory(model=memory_model, db=memory_db)
     
     # Initialize storage for chat history
-    storage = SqliteStorage(table_name=STORAGE_TABLE_NAME, db_file=DB_FILE)
+    storage = create_storage(table_name=STORAGE_TABLE_NAME)
+
+    # Knowledge: the recipes table by default, or several tables searched concurrently
+    knowledge_config = get_knowledge_config()
+    table_names = list(knowledge_tables or knowledge_config["tables"])
+    if table_names == [RECIPES_TABLE_NAME]:
+        knowledge = get_recipes_knowledge()
+    else:
+        knowledge = create_knowledge(
+            table_names, fusion=knowledge_config["fusion"], table_timeout=knowledge_config["table_timeout"]
+        )
 
     # Construct info message based on toggles
     active_features = []
     if use_user_memory: active_features.append("UserMem")
     if use_session_summary: active_features.append("Summary")
     if load_chat_history: active_features.append("History")
+    if parallel_tool_calls: active_features.append("ParallelTools")
+    if model_routing != "off": active_features.append(f"Routing({model_routing})")
+    if resilient_calls: active_features.append("Resilient")
+    if stable_prompt: active_features.append("StablePrompt")
+    if len(table_names) > 1: active_features.append(f"Tables({len(table_names)})")
+    if memory_retrieval: active_features.append("TopKMemories")
+    if compact_tool_results: active_features.append("CompactTools")
+    if pack_context: active_features.append("PackContext")
     feature_str = " | Feat: " + ", ".join(active_features) if active_features else ""
     
-    # Simplified info message
-    st.sidebar.caption(f"Agent: {provider_name}/{model_id}{feature_str}") 
+    # Simplified info message (skipped when app/warmup.py builds the agent off the script thread)
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        st.sidebar.caption(f"Agent: {provider_name}/{model_id}{feature_str}")
 
     # --- Initialize Agent --- 
     agent = Agent(
@@ -147,6 +272,11 @@ def initialize_agent(
         enable_user_memories=use_user_memory,      # Run MemoryManager after each response
         enable_agentic_memory=use_user_memory,     # Give agent tool to manage user memories
         enable_session_summaries=use_session_summary,
+        # Stable prompt layout: memories/summary go with the prompt sent to the provider
+        # (app/prompt_cache.py), so the system prompt is a cacheable prefix; None keeps agno's
+        # default. Top-k memories also send (only the relevant) memories that way.
+        add_memory_references=False if stable_prompt or memory_retrieval else None,
+        add_session_summary_references=False if stable_prompt else None,
         
         # Chat history features as per docs recommendation
         add_history_to_messages=load_chat_history, # Add chat history to messages
@@ -159,10 +289,76 @@ def initialize_agent(
         debug_mode=False,
         description=description,
         instructions=instructions,
-        knowledge=recipes_knowledge,      # <<< Use the recipes knowledge base
+        knowledge=knowledge, # <<< Recipes knowledge base, or the selected tables
         # search_knowledge=True, # This is True by default when knowledge is provided
-        tools=[DuckDuckGoTools()],
+        tools=[CachedSearchTools()],      # Shares one process-wide search cache
         show_tool_calls=True,
     )
+    agent.stable_prompt = stable_prompt
+
+    # Opt-in: rank the user's memories against each prompt and send only the top k;
+    # embeddings come from the knowledge embedder and persist in the shared database
+    if memory_retrieval:
+        attach_memory_index(agent, UserMemoryIndex(
+            memory=memory,
+            embedder=get_recipes_vector_db().embedder,
+            store=MemoryVectorStore(get_shared_engine()),
+            **get_memory_retrieval_config()
+        ))
+
+    # Opt-in: shrink large tool results (search hits, knowledge documents) before they are
+    # stored in the run and replayed with the chat history
+    if compact_tool_results:
+        attach_tool_compactor(agent, ToolResultCompactor(**get_tool_compaction_config()))
+
+    # Opt-in: pick knowledge chunks by MMR, merge neighbours and stop at this model's budget
+    if pack_context:
+        packing_config = get_context_packing_config()
+        packing_config["budget_tokens"] = context_budget(model_id, packing_config["budget_tokens"])
+        attach_context_packer(agent, ContextPacker(**packing_config))
+
+    # Opt-in: send simple turns to the provider's cheap tier. The small agent is the
+    # cached agent for the cheap model with the same settings, so both share storage.
+    cheap_model_id = CHEAP_MODEL_IDS.get(provider_key)
+    if model_routing != "off" and cheap_model_id and cheap_model_id != model_id:
+        small_agent = initialize_agent(
+            provider_name=provider_name,
+            model_id=cheap_model_id,
+            api_key=api_key,
+            load_chat_history=load_chat_history,
+            use_user_memory=use_user_memory,
+            use_session_summary=use_session_summary,
+            description=description,
+            instructions=instructions,
+            parallel_tool_calls=parallel_tool_calls,
+            model_routing="off",
+            resilient_calls=resilient_calls,
+            stable_prompt=stable_prompt,
+            knowledge_tables=knowledge_tables,
+            memory_retrieval=memory_retrieval,
+            compact_tool_results=compact_tool_results,
+            pack_context=pack_context
+        )[0]
+        classifier = None
+        if model_routing == "model":
+            classifier = ModelClassifier(model_class(id=cheap_model_id, api_key=api_key, **client_kwargs))
+        attach_router(agent, ModelRouter(large_agent=agent, small_agent=small_agent, classifier=classifier))
+
     # Return the LanceDB URI and the vector_db used by the agent
-    return agent, memory, storage, recipes_vector_db, LANCEDB_URI 
\ No newline at end of file
+    return agent, memory, storage, get_recipes_vector_db(), LANCEDB_URI 
+
+# --- Cross-process Cache Invalidation ---
+# Cache names other processes bump (see app/storage.CacheVersions)
+KNOWLEDGE_CACHE = "knowledge"
+AGENTS_CACHE = "agents"
+
+def _on_knowledge_changed() -> None:
+    reset_knowledge()
+    initialize_agent.clear()  # Agents hold the old knowledge object
+
+def sync_shared_caches() -> bool:
+    """Clears this process's caches if another process invalidated them. Cheap to call every run."""
+    versions = get_cache_versions()
+    versions.on_change(KNOWLEDGE_CACHE, _on_knowledge_changed)
+    versions.on_change(AGENTS_CACHE, initialize_agent.clear)
+    return versions.sync()
@@ -0,0 +1,129 @@
+# app/prompt_cache.py
+# Cache-friendly prompt assembly and prompt cache accounting.
+#
+# Provider prompt caches (OpenAI automatic prefix caching, Claude cache breakpoints, Gemini
+# implicit caching) only reuse an exact prefix: tool schemas, then the system prompt, then
+# history. With the stable layout the system prompt holds only the description and
+# instructions; the per-turn memories and session summary travel with the user message.
+# With top-k memory retrieval (app/memory_index.py) only the memories relevant to the
+# prompt travel with it, whatever the layout.
+#
+# The block is added to the copy of the messages each provider call sends, never to the
+# run's own messages: agno stores those in the session, replays them as history and mines
+# the user message for new memories, and the block must not end up in any of them.
+
+import logging
+from contextvars import ContextVar, Token
+
+from .memory_index import get_memory_index
+
+logger = logging.getLogger(__name__)
+
+_turn_context: ContextVar = ContextVar("turn_context", default="")
+
+
+def select_memories(agent, prompt: str, user_id: str) -> list:
+    """The user's memories for this turn: the top k for `prompt` if retrieval is on, else all."""
+    memory_index = get_memory_index(agent)
+    if memory_index is not None:
+        try:
+            return memory_index.search(user_id, prompt)
+        except Exception as e:
+            # Embedding failures shouldn't cost the user their memories; send them all
+            logger.warning("Top-k memory retrieval failed, sending all memories: %s", e)
+    return agent.memory.get_user_memories(user_id=user_id) or []
+
+
+def build_turn_context(agent, user_id: str, session_id: str, prompt: str = "") -> str:
+    """The memories/summary block agno would otherwise put in the system prompt."""
+    memory = getattr(agent, "memory", None)
+    if memory is None:
+        return ""
+    blocks = []
+    if getattr(agent, "enable_user_memories", False) and user_id:
+        memories = select_memories(agent, prompt, user_id)
+        if memories:
+            lines = "\n".join(f"- {m.memory}" for m in memories if getattr(m, "memory", None))
+            blocks.append(f"<memories_from_previous_interactions>\n{lines}\n</memories_from_previous_interactions>")
+    # Without the stable layout agno still puts the summary in the system prompt
+    if getattr(agent, "stable_prompt", False) and getattr(agent, "enable_session_summaries", False) and user_id and session_id:
+        summary = memory.get_session_summary(user_id=user_id, session_id=session_id)
+        if summary and getattr(summary, "summary", None):
+            blocks.append(f"<summary_of_previous_interactions>\n{summary.summary}\n</summary_of_previous_interactions>")
+    return "\n\n".join(blocks)
+
+
+def set_turn_context(agent, prompt: str, user_id: str, session_id: str) -> Token:
+    """Builds this turn's context (stable layout or top-k memories) for the model calls; pair with reset_turn_context()."""
+    context = ""
+    if getattr(agent, "stable_prompt", False) or get_memory_index(agent) is not None:
+        context = build_turn_context(agent, user_id, session_id, prompt)
+    return _turn_context.set(context)
+
+
+def reset_turn_context(token: Token) -> None:
+    _turn_context.reset(token)
+
+
+def with_turn_context(messages: list, context: str) -> list:
+    """A copy of `messages` whose latest user message starts with `context`."""
+    for i in range(len(messages) - 1, -1, -1):
+        message = messages[i]
+        if getattr(message, "role", None) != "user" or not isinstance(getattr(message, "content", None), str):
+            continue
+        message = message.model_copy(update={"content": f"{context}\n\n{message.content}"})
+        return messages[:i] + [message] + messages[i + 1:]
+    return messages
+
+
+def attach_turn_context(model):
+    """Makes `model`'s provider calls send the current turn's context with the prompt."""
+    def with_context(call):
+        def wrapper(*args, **kwargs):
+            context = _turn_context.get()
+            if context:
+                if "messages" in kwargs:
+                    kwargs["messages"] = with_turn_context(kwargs["messages"], context)
+                elif args:
+                    args = (with_turn_context(args[0], context),) + args[1:]
+            return call(*args, **kwargs)  # Coroutines and async iterators pass straight through
+        return wrapper
+
+    for name in ("invoke", "invoke_stream", "ainvoke", "ainvoke_stream"):
+        if hasattr(model, name):
+            setattr(model, name, with_context(getattr(model, name)))
+    return model
+
+
+def _metric_total(metrics, key: str) -> int:
+    # RunResponse.metrics maps each key to a list with one value per model call
+    value = metrics.get(key) if isinstance(metrics, dict) else getattr(metrics, key, None)
+    if isinstance(value, list):
+        return sum(v for v in value if isinstance(v, (int, float)))
+    return value if isinstance(value, (int, float)) else 0
+
+
+def cache_usage(metrics, provider: str = "") -> dict:
+    """Cached vs uncached input tokens for a run, from agno's response metrics."""
+    if not metrics:
+        return {}
+    input_tokens = _metric_total(metrics, "input_tokens") or _metric_total(metrics, "prompt_tokens")
+    cached = _metric_total(metrics, "cached_tokens")
+    if not cached:
+        details = metrics.get("prompt_tokens_details") if isinstance(metrics, dict) else None
+        for detail in details or []:
+            if isinstance(detail, dict):
+                cached += detail.get("cached_tokens") or 0
+    cache_write = _metric_total(metrics, "cache_write_tokens")
+    if "anthropic" in (provider or "").lower() or "claude" in (provider or "").lower():
+        # Anthropic reports cache reads/writes separately from input_tokens
+        total = input_tokens + cached + cache_write
+    else:
+        total = input_tokens  # OpenAI/Gemini prompt token counts already include the cached part
+    return {
+        "input_tokens": total,
+        "cached_tokens": cached,
+        "cache_write_tokens": cache_write,
+        "uncached_tokens": max(total - cached, 0),
+        "cache_hit_rate": cached / total if total else 0.0,
+    }
@@ -0,0 +1,374 @@
+# app/resilience.py
+# Timeouts, jittered retries, hedged requests and provider failover for model calls.
+#
+# Retries and hedging wrap the model's raw provider calls (`invoke` / `invoke_stream`):
+# those have no side effects, so a duplicate request is safe and the loser is simply
+# abandoned. Failover wraps `response` / `response_stream` instead, because another
+# provider's raw responses can only be parsed by that provider's model class.
+
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .utils import percentile
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+HEDGE_PERCENTILE = 95            # Hedge once the first attempt is slower than this TTFT percentile
+HEDGE_MIN_SAMPLES = 20           # TTFT samples needed before the percentile replaces hedge_delay
+TTFT_WINDOW = 200                # Recent time-to-first-token samples kept per model
+# Model state the agent sets before a call, copied to the fallback model on failover
+_CALL_STATE_ATTRS = ("_tools", "_functions", "tool_choice", "tool_call_limit", "response_format", "show_tool_calls")
+
+
+class ModelCallError(RuntimeError):
+    """A model call that failed after its retries (and failover, if any)."""
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    """HTTP status of a provider error, if it has one (agno's ModelProviderError or an SDK error)."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors, rate limits and 5xx are worth another attempt."""
+    status = status_code_of(error)
+    if status is None:
+        return not isinstance(error, (ValueError, TypeError))
+    return status in (408, 409, 425, 429) or status >= 500
+
+
+def _is_agent_control(error: BaseException) -> bool:
+    # agno's StopAgentRun/RetryAgentRun are raised through the model loop on purpose
+    return any(cls.__name__ == "AgentRunException" for cls in type(error).__mro__)
+
+
+def should_failover(error: BaseException) -> bool:
+    """Anything but a malformed request may succeed on another provider."""
+    return not _is_agent_control(error) and status_code_of(error) not in (400, 422)
+
+
+class ResilientCaller:
+    """Runs one model's provider calls with timeouts, jittered retries and hedging.
+
+    Hedging: when a streamed call has produced no first chunk after the model's p95
+    time-to-first-token (or `hedge_delay` until enough samples exist), a second
+    identical request is started and whichever streams first wins. A non-streamed
+    call's latency covers the whole completion, so it is only hedged past the p95 of
+    full calls, or after `hedge_call_delay` while samples are missing (None: not then).
+    """
+
+    def __init__(
+        self,
+        timeout: float = 120.0,
+        first_token_timeout: float = 30.0,
+        idle_timeout: float = 60.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge: bool = True,
+        hedge_delay: float = 3.0,
+        hedge_call_delay: Optional[float] = None,
+        hedge_percentile: float = HEDGE_PERCENTILE,
+        hedge_min_samples: int = HEDGE_MIN_SAMPLES,
+        **_ignored: Any,
+    ):
+        self.timeout = timeout
+        self.first_token_timeout = first_token_timeout
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_call_delay = hedge_call_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        # Full-call latency for invoke, time to first chunk for invoke_stream
+        self._samples = {"call": deque(maxlen=TTFT_WINDOW), "stream": deque(maxlen=TTFT_WINDOW)}
+        self._samples_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="model-call")
+        # Agents are shared between sessions, so per-turn accounting lives on the calling thread
+        self._turn = threading.local()
+
+    # --- Per-turn accounting ---
+    def start_turn(self) -> None:
+        self._turn.stats = {"attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0, "failover": None}
+
+    def end_turn(self) -> Dict[str, Any]:
+        stats = getattr(self._turn, "stats", None) or {}
+        self._turn.stats = None
+        return stats
+
+    def _record(self, **increments: Any) -> None:
+        stats = getattr(self._turn, "stats", None)
+        if stats is not None:
+            for key, value in increments.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stats[key] += value
+                else:
+                    stats[key] = value
+
+    # --- Policy ---
+    def current_hedge_delay(self, kind: str = "stream") -> Optional[float]:
+        """Seconds before a `kind` attempt is hedged, or None if it isn't."""
+        with self._samples_lock:
+            samples = list(self._samples[kind])
+        if len(samples) < self.hedge_min_samples:
+            return self.hedge_delay if kind == "stream" else self.hedge_call_delay
+        return percentile(samples, self.hedge_percentile)
+
+    def _observe(self, kind: str, seconds: float) -> None:
+        with self._samples_lock:
+            self._samples[kind].append(seconds)
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter exponential backoff before retry number `retry` (1-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (retry - 1))))
+
+    def _retry_or_raise(self, retry: int, error: BaseException) -> None:
+        if retry > self.max_retries or not is_retryable(error):
+            raise error
+        self._record(retries=1)
+        time.sleep(self.backoff(retry))
+
+    # --- Non-streamed calls ---
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Runs `fn` with a timeout, retrying retryable failures; hedges slow attempts."""
+        retry = 0
+        while True:
+            try:
+                return self._call_once(fn, args, kwargs)
+            except Exception as e:
+                retry += 1
+                self._retry_or_raise(retry, e)
+
+    def _call_once(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        start = time.monotonic()
+        self._record(attempts=1)
+        first = self._pool.submit(fn, *args, **kwargs)
+        futures = {first}
+        hedge_delay = self.current_hedge_delay("call") if self.hedge else None
+        hedge_at = start + hedge_delay if hedge_delay is not None else None
+        deadline = start + self.timeout
+        last_error: Optional[BaseException] = None
+        while futures:
+            now = time.monotonic()
+            wake = min(deadline, hedge_at) if hedge_at else deadline
+            done, futures = wait(futures, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._observe("call", time.monotonic() - start)
+                    if future is not first:
+                        self._record(hedge_wins=1)
+                    return future.result()
+                last_error = future.exception()
+            now = time.monotonic()
+            if hedge_at and now >= hedge_at and futures:
+                hedge_at = None
+                self._record(attempts=1, hedges=1)
+                futures.add(self._pool.submit(fn, *args, **kwargs))
+            elif now >= deadline:
+                self._record(timeouts=1)
+                raise TimeoutError(f"Model call timed out after {self.timeout:g}s")
+        raise last_error
+
+    # --- Streamed calls ---
+    def stream(self, fn: Callable[..., Iterator[Any]], *args: Any, **kwargs: Any) -> Iterator[Any]:
+        """Streams `fn(...)`. Retries and hedging only apply before the first chunk arrives."""
+        retry = 0
+        while True:
+            try:
+                attempt_id, chunks, first = self._first_chunk(fn, args, kwargs)
+                break
+            except Exception as e:
+                retry += 1
+                self._retry_or_raise(retry, e)
+        yield from self._rest_of_stream(attempt_id, chunks, first)
+
+    def _first_chunk(self, fn: Callable[..., Iterator[Any]], args: tuple, kwargs: dict):
+        """Starts the attempt (and maybe a hedge); returns the winner and its first chunk."""
+        chunks: "queue.Queue" = queue.Queue()
+        cancelled: Dict[int, threading.Event] = {}
+
+        def launch() -> None:
+            attempt_id = len(cancelled)
+            cancelled[attempt_id] = threading.Event()
+            self._record(attempts=1)
+            threading.Thread(
+                target=_pump, args=(fn, args, kwargs, attempt_id, chunks, cancelled[attempt_id]),
+                name=f"model-stream-{attempt_id}", daemon=True,
+            ).start()
+
+        start = time.monotonic()
+        hedge_at = start + self.current_hedge_delay() if self.hedge else None
+        deadline = start + self.first_token_timeout
+        launch()
+        failed = 0
+        replacements = 0
+        while True:
+            now = time.monotonic()
+            wake = min(deadline, hedge_at) if hedge_at else deadline
+            try:
+                attempt_id, kind, payload = chunks.get(timeout=max(0.0, wake - now))
+            except queue.Empty:
+                now = time.monotonic()
+                if hedge_at and now >= hedge_at:
+                    hedge_at = None
+                    self._record(hedges=1)
+                    launch()
+                elif now >= deadline:
+                    for event in cancelled.values():
+                        event.set()
+                    self._record(timeouts=1)
+                    raise TimeoutError(f"No response from the model within {self.first_token_timeout:g}s")
+                continue
+
+            if kind == "error":
+                failed += 1
+                if failed == len(cancelled):
+                    raise payload  # Every attempt so far failed; the caller decides on a retry
+                if is_retryable(payload) and replacements < self.max_retries:
+                    # A hedge failed while the original is still stalled: replace it right away
+                    replacements += 1
+                    self._record(retries=1)
+                    launch()
+                continue  # The other attempt may still succeed
+
+            # First chunk (or an empty stream's end): this attempt wins, the others are dropped
+            self._observe("stream", time.monotonic() - start)
+            if attempt_id > 0:
+                self._record(hedge_wins=1)
+            for other_id, event in cancelled.items():
+                if other_id != attempt_id:
+                    event.set()
+            return attempt_id, (chunks, cancelled[attempt_id]), (kind, payload)
+
+    def _rest_of_stream(self, attempt_id: int, chunks, first) -> Iterator[Any]:
+        chunk_queue, cancel = chunks
+        kind, payload = first
+        try:
+            while kind != "done":
+                if kind == "error":
+                    raise payload
+                yield payload
+                while True:
+                    try:
+                        source_id, kind, payload = chunk_queue.get(timeout=self.idle_timeout)
+                    except queue.Empty:
+                        self._record(timeouts=1)
+                        raise TimeoutError(f"Model stream stalled for {self.idle_timeout:g}s")
+                    if source_id == attempt_id:
+                        break  # Items from abandoned attempts are skipped
+        finally:
+            cancel.set()
+
+
+def _pump(fn, args, kwargs, attempt_id: int, chunks: "queue.Queue", cancel: threading.Event) -> None:
+    """Moves one streamed attempt's chunks onto the shared queue until done or cancelled."""
+    iterator = None
+    try:
+        iterator = iter(fn(*args, **kwargs))
+        for item in iterator:
+            if cancel.is_set():
+                break
+            chunks.put((attempt_id, "item", item))
+        else:
+            chunks.put((attempt_id, "done", None))
+    except BaseException as e:
+        chunks.put((attempt_id, "error", e))
+    finally:
+        close = getattr(iterator, "close", None)
+        if cancel.is_set() and close is not None:
+            try:
+                close()  # Releases the abandoned HTTP response
+            except Exception:
+                pass
+
+
+# --- Failover ---
+def failover_stream(primary: Callable[[], Iterator[Any]], fallback: Optional[Callable[[], Iterator[Any]]], on_failover: Optional[Callable[[BaseException], None]] = None) -> Iterator[Any]:
+    """Streams `primary()`; if it fails before yielding anything, streams `fallback()` instead."""
+    yielded = False
+    try:
+        for item in primary():
+            yielded = True
+            yield item
+    except Exception as e:
+        if yielded or fallback is None or not should_failover(e):
+            raise
+        if on_failover:
+            on_failover(e)
+        yield from fallback()
+
+
+def _describe(model: Any) -> str:
+    return f"{getattr(model, 'provider', None) or type(model).__name__}/{getattr(model, 'id', '?')}"
+
+
+def enable_resilience(model: Any, caller: ResilientCaller, fallback_model: Any = None) -> Any:
+    """Routes `model`'s provider calls through `caller`, failing over to `fallback_model`."""
+    original_invoke = model.invoke
+    original_invoke_stream = model.invoke_stream
+    original_response = model.response
+    original_response_stream = model.response_stream
+
+    model.invoke = lambda *args, **kwargs: caller.call(original_invoke, *args, **kwargs)
+    model.invoke_stream = lambda *args, **kwargs: caller.stream(original_invoke_stream, *args, **kwargs)
+
+    def prepare_fallback(error: BaseException) -> None:
+        for attr in _CALL_STATE_ATTRS:
+            if hasattr(model, attr) and hasattr(fallback_model, attr):
+                setattr(fallback_model, attr, getattr(model, attr))
+        caller._record(failover=_describe(fallback_model))
+        logger.warning("%s failed (%s); failing over to %s", _describe(model), error, _describe(fallback_model))
+
+    def response(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return original_response(*args, **kwargs)
+        except Exception as e:
+            if _is_agent_control(e):
+                raise
+            if fallback_model is None or not should_failover(e):
+                raise ModelCallError(f"{_describe(model)} failed: {e}") from e
+            prepare_fallback(e)
+            try:
+                return fallback_model.response(*args, **kwargs)
+            except Exception as fallback_error:
+                raise ModelCallError(f"{_describe(model)} failed ({e}) and failover to {_describe(fallback_model)} failed: {fallback_error}") from fallback_error
+
+    def response_stream(*args: Any, **kwargs: Any) -> Iterator[Any]:
+        fallback = (lambda: fallback_model.response_stream(*args, **kwargs)) if fallback_model is not None else None
+        failed_over = []
+
+        def on_failover(error: BaseException) -> None:
+            failed_over.append(error)
+            prepare_fallback(error)
+
+        try:
+            yield from failover_stream(lambda: original_response_stream(*args, **kwargs), fallback, on_failover)
+        except Exception as e:
+            if _is_agent_control(e):
+                raise
+            if failed_over:
+                raise ModelCallError(f"{_describe(model)} failed ({failed_over[0]}) and failover to {_describe(fallback_model)} failed: {e}") from e
+            raise ModelCallError(f"{_describe(model)} failed: {e}") from e
+
+    model.response = response
+    model.response_stream = response_stream
+    model.resilient_caller = caller
+    return model
+
+
+def get_resilient_caller(agent: Any) -> Optional[ResilientCaller]:
+    """Returns the caller attached to the agent's model, if resilient model calls are enabled."""
+    return getattr(getattr(agent, "model", None), "resilient_caller", None)
@@ -0,0 +1,221 @@
+# app/router.py
+# Per-turn model routing: simple prompts go to the provider's cheap tier, hard ones to
+# the selected large model.
+
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from .utils import percentile
+
+# --- Constants ---
+TIER_SMALL = "small"
+TIER_LARGE = "large"
+ROUTING_MODES = ("off", "heuristic", "model")  # "model" asks the cheap model about unclear prompts
+COMPLEXITY_THRESHOLD = 0.3       # Heuristic score at or above which a turn goes to the large model
+AMBIGUOUS_BAND = (0.15, 0.45)    # Scores in this range are sent to the model classifier, if enabled
+STATS_WINDOW = 500               # Latencies kept per tier for percentiles
+
+_COMPLEX_KEYWORDS = (
+    "analyze", "analyse", "compare", "contrast", "design", "architecture", "implement",
+    "debug", "refactor", "prove", "derive", "optimize", "optimise", "trade-off", "tradeoff",
+    "step by step", "step-by-step", "plan", "strategy", "evaluate", "critique", "in depth",
+    "in detail", "detailed", "explain why", "pros and cons", "essay", "report", "show your work",
+    "分析", "比较", "设计", "实现", "优化", "详细", "为什么",
+)
+_SIMPLE_PATTERN = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|ok|okay|yes|no|good (morning|evening)|你好|谢谢|好的)\b"
+    r"|^\s*(what|who|when|where) (is|are|was|were) \S+(\s+\S+){0,5}\??\s*$"
+    r"|^\s*(define|translate|spell)\b",
+    re.IGNORECASE,
+)
+_CODING_WORDS = re.compile(r"\b(function|script|code|algorithm|regex|query|bug|crash(es)?|stack trace|O\([^)]*\))", re.IGNORECASE)
+_CODE_PATTERN = re.compile(r"```|^\s*(def|class|import|function|SELECT|#include)\b|[{};]\s*$", re.MULTILINE)
+_MATH_PATTERN = re.compile(r"\d+\s*[-+*/^=]\s*\d+|\b(integral|derivative|equation|calculate|probability)\b", re.IGNORECASE)
+
+CLASSIFIER_INSTRUCTIONS = (
+    "You decide which model should answer a chat message. Reply with exactly one word: "
+    "SIMPLE for greetings, short factual questions, small rewrites or lookups; "
+    "COMPLEX for multi-step reasoning, analysis, code, math or long-form writing."
+)
+
+
+# --- Classification ---
+def heuristic_score(prompt: str) -> Tuple[float, List[str]]:
+    """Scores a prompt's complexity in [0, 1] with cheap local checks, plus the reasons."""
+    text = prompt or ""
+    lowered = text.casefold()
+    reasons: List[str] = []
+    score = 0.0
+
+    # Rough token count that also works for CJK text without spaces
+    tokens = max(len(text.split()), len(text) // 4)
+    if tokens > 80:
+        score += 0.35
+        reasons.append("long")
+    elif tokens > 30:
+        score += 0.15
+        reasons.append("medium length")
+
+    if _CODE_PATTERN.search(text):
+        score += 0.5
+        reasons.append("code")
+    elif _CODING_WORDS.search(text):
+        score += 0.3
+        reasons.append("programming")
+
+    keywords = [k for k in _COMPLEX_KEYWORDS if k in lowered]
+    if keywords:
+        score += min(0.35 * len(keywords), 0.6)
+        reasons.append("keywords: " + ", ".join(keywords[:3]))
+
+    if _MATH_PATTERN.search(text):
+        score += 0.35
+        reasons.append("math")
+
+    if text.count("?") + text.count("？") > 1 or len(re.findall(r"(^|\s)\d+[.)]\s", text)) > 1:
+        score += 0.25
+        reasons.append("multi-part")
+
+    if _SIMPLE_PATTERN.search(text):
+        score -= 0.3
+        reasons.append("simple pattern")
+
+    return max(0.0, min(score, 1.0)), reasons
+
+
+class ModelClassifier:
+    """Asks a small model whether a prompt is SIMPLE or COMPLEX."""
+
+    def __init__(self, model: Any):
+        self.model = model
+
+    def classify(self, prompt: str) -> str:
+        from agno.models.message import Message
+
+        response = self.model.response(messages=[
+            Message(role="system", content=CLASSIFIER_INSTRUCTIONS),
+            Message(role="user", content=prompt[:2000]),
+        ])
+        answer = (getattr(response, "content", None) or "").strip().upper()
+        return TIER_LARGE if answer.startswith("COMPLEX") else TIER_SMALL
+
+
+# --- Stats ---
+class RouterStats:
+    """Process-wide routing counters and per-tier turn latencies."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self._lock = threading.Lock()
+        self.turns = {TIER_SMALL: 0, TIER_LARGE: 0}
+        self.errors = {TIER_SMALL: 0, TIER_LARGE: 0}
+        self.latencies = {TIER_SMALL: deque(maxlen=window), TIER_LARGE: deque(maxlen=window)}
+        self.model_classifications = 0
+        self.classifier_agreements = 0  # Model classifier agreed with the heuristic's guess
+        self.classifier_failures = 0
+        self.classifier_time = 0.0
+
+    def record_turn(self, tier: str, latency: float, error: bool = False) -> None:
+        with self._lock:
+            self.turns[tier] += 1
+            self.latencies[tier].append(latency)
+            if error:
+                self.errors[tier] += 1
+
+    def record_classification(self, agreed: Optional[bool], elapsed: float) -> None:
+        with self._lock:
+            self.classifier_time += elapsed
+            if agreed is None:
+                self.classifier_failures += 1
+            else:
+                self.model_classifications += 1
+                self.classifier_agreements += int(agreed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self.turns.values())
+            stats: Dict[str, Any] = {
+                "turns": total,
+                "small_share": self.turns[TIER_SMALL] / total if total else 0.0,
+                "model_classifications": self.model_classifications,
+                "classifier_agreement": self.classifier_agreements / self.model_classifications if self.model_classifications else None,
+                "classifier_failures": self.classifier_failures,
+                "classifier_time": self.classifier_time,
+            }
+            for tier in (TIER_SMALL, TIER_LARGE):
+                latencies = list(self.latencies[tier])
+                stats[tier] = {
+                    "turns": self.turns[tier],
+                    "errors": self.errors[tier],
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                }
+            return stats
+
+
+_shared_stats = RouterStats()
+
+
+# --- Router ---
+class ModelRouter:
+    """Picks the small- or large-tier agent for each prompt.
+
+    The heuristic decides clear cases for free; with a classifier, prompts whose score
+    falls in `ambiguous_band` cost one short call to the small model instead.
+    """
+
+    def __init__(
+        self,
+        large_agent: Any,
+        small_agent: Any,
+        classifier: Optional[ModelClassifier] = None,
+        threshold: float = COMPLEXITY_THRESHOLD,
+        ambiguous_band: Tuple[float, float] = AMBIGUOUS_BAND,
+        stats: Optional[RouterStats] = None,
+    ):
+        self.agents = {TIER_LARGE: large_agent, TIER_SMALL: small_agent}
+        self.classifier = classifier
+        self.threshold = threshold
+        self.ambiguous_band = ambiguous_band
+        self.stats = stats or _shared_stats
+
+    def route(self, prompt: str) -> Dict[str, Any]:
+        """Returns the routing decision: tier, score, method and reasons."""
+        score, reasons = heuristic_score(prompt)
+        tier = TIER_LARGE if score >= self.threshold else TIER_SMALL
+        decision = {"tier": tier, "score": score, "method": "heuristic", "reasons": reasons}
+
+        low, high = self.ambiguous_band
+        if self.classifier is not None and low <= score < high:
+            start = time.perf_counter()
+            try:
+                model_tier = self.classifier.classify(prompt)
+            except Exception as e:
+                # Keep the heuristic's answer; a failed classifier call must not fail the turn
+                self.stats.record_classification(None, time.perf_counter() - start)
+                decision["reasons"] = reasons + [f"classifier failed: {e}"]
+                return decision
+            self.stats.record_classification(model_tier == tier, time.perf_counter() - start)
+            decision.update({"tier": model_tier, "method": "model"})
+        return decision
+
+    def select(self, prompt: str) -> Tuple[Any, Dict[str, Any]]:
+        decision = self.route(prompt)
+        return self.agents[decision["tier"]], decision
+
+
+def attach_router(agent: Any, router: ModelRouter) -> Any:
+    """Attaches `router` to the large agent; the chat UI routes turns through it."""
+    agent.model_router = router
+    return agent
+
+
+def get_model_router(agent: Any) -> Optional[ModelRouter]:
+    """Returns the router attached to the agent, if model routing is enabled."""
+    return getattr(agent, "model_router", None)
+
+
+def get_router_stats() -> Dict[str, Any]:
+    return _shared_stats.snapshot()
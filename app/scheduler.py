@@ -0,0 +1,234 @@
+# app/scheduler.py
+# Process-wide admission control for agent turns.
+#
+# Every turn asks the TurnScheduler for a slot before it calls the model. A turn is
+# admitted when the process is below `max_in_flight`, its user is below
+# `max_per_user`, and the token bucket of its provider/API key has a token (one token
+# per turn, so `rate` is turns per second against that key). Otherwise it waits in
+# the queue; turns whose key is out of tokens are passed over, like turns of users at
+# their limit, so one throttled provider doesn't hold up turns bound for another.
+#
+# Waiting turns are ordered by fair share rather than arrival: a user's k-th waiting
+# turn ranks as if that user already had k more turns in flight. So someone firing
+# Sequential Prompts quickly gets one slot in turn with everyone else instead of all
+# free slots, and a light user's p99 stays close to its p50. Waiters see their
+# current position through `on_wait`; a turn that waits longer than `max_wait`, or
+# arrives to a full queue, gets AdmissionError.
+
+import hashlib
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from .utils import TokenBucket, percentile
+
+# --- Constants ---
+DEFAULT_MAX_IN_FLIGHT = 16       # Turns running at once in this process
+DEFAULT_MAX_PER_USER = 2         # Turns running at once per user (several tabs)
+DEFAULT_MAX_QUEUE = 200          # Waiting turns before new ones are rejected
+DEFAULT_MAX_WAIT = 120.0         # Seconds a turn may wait for a slot
+POLL_INTERVAL = 0.25             # Seconds between position updates while waiting
+WAIT_SAMPLES = 1000              # Recent wait times kept for the percentiles
+
+
+class AdmissionError(Exception):
+    """A turn was not admitted: the queue is full or it waited too long."""
+
+
+class Ticket:
+    """One turn's place in the scheduler, from enqueue to release."""
+
+    def __init__(self, seq: int, user_id: str, rate_key: str):
+        self.seq = seq
+        self.user_id = user_id
+        self.rate_key = rate_key
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.throttled = False   # Waited on the provider's rate limit at some point
+        self.retry_in = POLL_INTERVAL
+
+    @property
+    def waited(self) -> float:
+        return (self.admitted_at or time.monotonic()) - self.enqueued_at
+
+
+def rate_key(provider: str, api_key: Optional[str] = None) -> str:
+    """Rate limit bucket for a provider and API key (the key itself is never kept)."""
+    if not api_key:
+        return provider or "default"
+    return f"{provider}:{hashlib.sha256(api_key.encode()).hexdigest()[:8]}"
+
+
+class TurnScheduler:
+    """Fair-share turn admission with global, per-user and per-provider-key limits."""
+
+    def __init__(
+        self,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_per_user: int = DEFAULT_MAX_PER_USER,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        rate: float = 0.0,
+        burst: Optional[float] = None,
+        provider_rates: Optional[Dict[str, float]] = None,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.rate = rate                                 # Turns/second per provider key; 0 = unlimited
+        self.burst = burst
+        self.provider_rates = provider_rates or {}       # Overrides of `rate` by provider name
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: List[Ticket] = []
+        self._in_flight: Dict[str, int] = {}             # user_id -> running turns
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waits: "deque[float]" = deque(maxlen=WAIT_SAMPLES)
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "throttled": 0, "peak_queue": 0}
+
+    # --- Ordering ---
+    def _ordered(self) -> List[Ticket]:
+        """Waiting tickets in admission order (caller holds the lock)."""
+        seen: Dict[str, int] = {}
+        ranked = []
+        for ticket in self._waiting:  # Already in arrival order
+            k = seen.get(ticket.user_id, 0)
+            seen[ticket.user_id] = k + 1
+            ranked.append((self._in_flight.get(ticket.user_id, 0) + k, ticket.seq, ticket))
+        return [ticket for _, _, ticket in sorted(ranked, key=lambda r: r[:2])]
+
+    def _bucket(self, key: str) -> Optional[TokenBucket]:
+        rate = self.provider_rates.get(key.split(":", 1)[0], self.rate)
+        if rate <= 0:
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, self.burst)
+        return bucket
+
+    def _try_admit(self, ticket: Ticket) -> Optional[int]:
+        """Admits `ticket` if it is next and limits allow. Returns None if admitted, else its
+        position (1-based), or 0 when the provider's rate limit holds it back."""
+        total = sum(self._in_flight.values())
+        position = 0
+        for candidate in self._ordered():
+            if self._in_flight.get(candidate.user_id, 0) >= self.max_per_user:
+                continue  # Skipped, not blocking: others' turns can still go first
+            bucket = self._bucket(candidate.rate_key)
+            retry_in = bucket.wait_time() if bucket is not None else 0.0
+            if retry_in > 0:
+                if candidate is ticket:
+                    ticket.retry_in = min(retry_in, POLL_INTERVAL)
+                    if not ticket.throttled:
+                        ticket.throttled = True
+                        self.stats["throttled"] += 1
+                    return 0
+                continue  # Skipped as well: a throttled key doesn't hold up other providers
+            position += 1
+            if candidate is not ticket:
+                continue
+            if position > 1 or total >= self.max_in_flight:
+                return position
+            if bucket is not None:
+                bucket.try_acquire()  # Available: buckets are only used under the lock
+            self._waiting.remove(ticket)
+            self._in_flight[ticket.user_id] = self._in_flight.get(ticket.user_id, 0) + 1
+            ticket.admitted_at = time.monotonic()
+            return None
+        # Held back by its own user's limit: behind every waiting turn that can go
+        return len(self._waiting)
+
+    # --- Admission ---
+    def acquire(
+        self,
+        user_id: Optional[str],
+        rate_key: str = "default",
+        on_wait: Optional[Callable[[int, float], None]] = None,
+        timeout: Optional[float] = None,
+    ) -> Ticket:
+        """Blocks until the turn may run and returns its ticket; pair with release().
+
+        `on_wait(position, seconds_waited)` is called from this thread while queued
+        (position 0 means held back by its provider's rate limit).
+        """
+        timeout = self.max_wait if timeout is None else timeout
+        with self._cond:
+            if len(self._waiting) >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise AdmissionError(f"{len(self._waiting)} turns already waiting")
+            ticket = Ticket(next(self._seq), user_id or "", rate_key)
+            self._waiting.append(ticket)
+            self.stats["peak_queue"] = max(self.stats["peak_queue"], len(self._waiting))
+            queued = False
+            try:
+                while True:
+                    position = self._try_admit(ticket)
+                    if position is None:
+                        break
+                    if not queued:
+                        queued = True
+                        self.stats["queued"] += 1
+                    if ticket.waited >= timeout:
+                        self.stats["timed_out"] += 1
+                        raise AdmissionError(f"no slot within {timeout:g}s")
+                    if on_wait:
+                        self._cond.release()  # Don't hold the lock while the UI renders
+                        try:
+                            on_wait(position, ticket.waited)
+                        finally:
+                            self._cond.acquire()
+                    self._cond.wait(ticket.retry_in)  # Woken early by release() and admissions
+                    ticket.retry_in = POLL_INTERVAL
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()  # Turns behind it may move up
+                raise
+            self.stats["admitted"] += 1
+            self._waits.append(ticket.waited)
+            self._cond.notify_all()  # The next turn may fit in a remaining slot
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        with self._cond:
+            count = self._in_flight.get(ticket.user_id, 0) - 1
+            if count > 0:
+                self._in_flight[ticket.user_id] = count
+            else:
+                self._in_flight.pop(ticket.user_id, None)
+            self._cond.notify_all()
+
+    # --- Metrics ---
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            waits = list(self._waits)
+            return {
+                **self.stats,
+                "queue_depth": len(self._waiting),
+                "in_flight": sum(self._in_flight.values()),
+                "users_in_flight": len(self._in_flight),
+                "wait_p50": percentile(waits, 50) if waits else 0.0,
+                "wait_p95": percentile(waits, 95) if waits else 0.0,
+                "wait_p99": percentile(waits, 99) if waits else 0.0,
+                "oldest_wait": max((t.waited for t in self._waiting), default=0.0),
+            }
+
+
+_scheduler_lock = threading.Lock()
+_scheduler: Optional[TurnScheduler] = None
+
+
+def get_turn_scheduler() -> Optional[TurnScheduler]:
+    """Process-wide scheduler shared by every Streamlit session, or None if disabled (AGNO_SCHEDULER=0)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from .config import get_scheduler_config
+            config = get_scheduler_config()
+            if not config.pop("enabled"):
+                return None
+            _scheduler = TurnScheduler(**config)
+    return _scheduler
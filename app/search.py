@@ -0,0 +1,176 @@
+# app/search.py
+# Cached, deduplicated and rate-limited web search tool for the agent.
+
+import json
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+from agno.tools import Toolkit
+
+from .utils import SingleFlight, TTLCache, TokenBucket
+
+# --- Constants ---
+SEARCH_CACHE_SIZE = 512          # Max cached (query, kind, max_results) entries per process
+SEARCH_CACHE_TTL = 15 * 60       # Seconds before a cached result is considered stale
+SEARCH_RATE_PER_SECOND = 1.0     # Backend calls allowed per second (per process)
+SEARCH_RATE_BURST = 5            # Short bursts allowed above the steady rate
+SEARCH_RATE_TIMEOUT = 30.0       # Max seconds a call waits for the rate limiter
+
+_TRAILING_PUNCTUATION = "?!.,;:'\"`"
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a search query so trivially different phrasings share a cache entry."""
+    query = unicodedata.normalize("NFKC", query or "").casefold()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.strip(_TRAILING_PUNCTUATION).strip()
+
+
+# --- Backends ---
+class DuckDuckGoBackend:
+    """Live backend delegating to agno's DuckDuckGoTools (created on first use)."""
+
+    def __init__(self, **ddg_kwargs: Any):
+        self._ddg_kwargs = ddg_kwargs
+        self._ddg = None
+        self._lock = threading.Lock()
+
+    def _get_ddg(self):
+        if self._ddg is None:
+            with self._lock:
+                if self._ddg is None:
+                    from agno.tools.duckduckgo import DuckDuckGoTools
+                    self._ddg = DuckDuckGoTools(**self._ddg_kwargs)
+        return self._ddg
+
+    def search(self, query: str, max_results: int) -> str:
+        return self._get_ddg().duckduckgo_search(query=query, max_results=max_results)
+
+    def news(self, query: str, max_results: int) -> str:
+        return self._get_ddg().duckduckgo_news(query=query, max_results=max_results)
+
+
+class StubSearchBackend:
+    """Offline backend returning deterministic fake results after an optional delay.
+
+    Used to measure cache hit rate and latency without network access.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _results(self, kind: str, query: str, max_results: int) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return json.dumps([
+            {
+                "title": f"{kind.title()} result {i + 1} for {query}",
+                "href": f"https://example.com/{kind}/{i + 1}?q={query.replace(' ', '+')}",
+                "body": f"Stub {kind} snippet {i + 1} about {query}.",
+            }
+            for i in range(max_results)
+        ])
+
+    def search(self, query: str, max_results: int) -> str:
+        return self._results("search", query, max_results)
+
+    def news(self, query: str, max_results: int) -> str:
+        return self._results("news", query, max_results)
+
+
+# --- Process-wide shared state ---
+# Shared by every agent in this process so identical searches across users hit the same cache.
+_shared_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+_shared_flight = SingleFlight()
+_shared_limiter = TokenBucket(rate=SEARCH_RATE_PER_SECOND, capacity=SEARCH_RATE_BURST)
+
+
+class CachedSearchTools(Toolkit):
+    """Drop-in replacement for DuckDuckGoTools with caching, request coalescing and rate limiting.
+
+    Exposes the same `duckduckgo_search` / `duckduckgo_news` tool names so the model
+    and the UI tool badges see no difference.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[Any] = None,
+        cache: Optional[TTLCache] = None,
+        flight: Optional[SingleFlight] = None,
+        limiter: Optional[TokenBucket] = None,
+        fixed_max_results: Optional[int] = None,
+    ):
+        super().__init__(name="duckduckgo")
+        self.backend = backend if backend is not None else DuckDuckGoBackend()
+        self.cache = cache if cache is not None else _shared_cache
+        self.flight = flight if flight is not None else _shared_flight
+        self.limiter = limiter if limiter is not None else _shared_limiter
+        self.fixed_max_results = fixed_max_results
+        self.backend_calls = 0
+        self.rate_limited_wait = 0.0  # Total seconds spent waiting on the limiter
+        self._stats_lock = threading.Lock()  # Tool calls of one turn may run on several threads
+        self.register(self.duckduckgo_search)
+        self.register(self.duckduckgo_news)
+
+    def _cached_call(self, kind: str, query: str, max_results: int) -> str:
+        max_results = self.fixed_max_results or max_results
+        key = (kind, normalize_query(query), max_results)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        def fetch() -> str:
+            # Re-check: another caller may have filled the cache while we queued
+            cached_inner = self.cache.get(key)
+            if cached_inner is not None:
+                return cached_inner
+            wait_start = time.perf_counter()
+            if not self.limiter.acquire(timeout=SEARCH_RATE_TIMEOUT):
+                raise RuntimeError("Search rate limit exceeded, try again shortly.")
+            with self._stats_lock:
+                self.rate_limited_wait += time.perf_counter() - wait_start
+                self.backend_calls += 1
+            result = getattr(self.backend, kind)(query, max_results)
+            self.cache.set(key, result)  # Only successful results are cached
+            return result
+
+        return self.flight.do(key, fetch)
+
+    def duckduckgo_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search DuckDuckGo for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The result from DuckDuckGo.
+        """
+        return self._cached_call("search", query, max_results)
+
+    def duckduckgo_news(self, query: str, max_results: int = 5) -> str:
+        """Use this function to get the latest news from DuckDuckGo.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The latest news from DuckDuckGo.
+        """
+        return self._cached_call("news", query, max_results)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        with self._stats_lock:
+            stats.update({"backend_calls": self.backend_calls, "rate_limited_wait": self.rate_limited_wait})
+        stats["coalesced"] = self.flight.coalesced
+        return stats
@@ -0,0 +1,152 @@
+# app/storage.py
+# Pluggable storage backends (local files or a shared server) and cross-process cache invalidation.
+
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from .config import get_embedder_config, get_storage_config
+from .utils import require_optional
+
+# --- Constants ---
+CACHE_VERSION_TABLE_NAME = "app_cache_versions"
+CACHE_VERSION_POLL_INTERVAL = 2.0  # Seconds between checks of the shared version table
+
+
+# --- Factories ---
+def create_memory_db(table_name: str):
+    """Memory DB for user memories and session summaries."""
+    config = get_storage_config()
+    if config["storage_backend"] == "postgres":
+        PostgresMemoryDb = require_optional("agno.memory.v2.db.postgres", "PostgresMemoryDb", "psycopg[binary]")
+        return PostgresMemoryDb(table_name=table_name, db_url=config["db_url"], schema=config["db_schema"])
+    from agno.memory.v2.db.sqlite import SqliteMemoryDb
+    os.makedirs(os.path.dirname(config["sqlite_file"]) or ".", exist_ok=True)
+    return SqliteMemoryDb(table_name=table_name, db_file=config["sqlite_file"])
+
+
+def create_storage(table_name: str):
+    """Agent session storage for chat history."""
+    config = get_storage_config()
+    if config["storage_backend"] == "postgres":
+        PostgresStorage = require_optional("agno.storage.postgres", "PostgresStorage", "psycopg[binary]")
+        return PostgresStorage(table_name=table_name, db_url=config["db_url"], schema=config["db_schema"])
+    from agno.storage.sqlite import SqliteStorage
+    os.makedirs(os.path.dirname(config["sqlite_file"]) or ".", exist_ok=True)
+    return SqliteStorage(table_name=table_name, db_file=config["sqlite_file"])
+
+
+def create_vector_db(table_name: str, **kwargs: Any):
+    """Vector DB for a knowledge table (LanceDB files or a shared pgvector table).
+
+    Without an explicit `embedder`, AGNO_EMBEDDER=local embeds on this machine (see app/embedders.py).
+    """
+    config = get_storage_config()
+    if "embedder" not in kwargs and get_embedder_config()["embedder"] == "local":
+        from .embedders import create_embedder  # numpy/onnxruntime only load when selected
+        kwargs["embedder"] = create_embedder()
+    if config["vector_backend"] == "pgvector":
+        PgVector = require_optional("agno.vectordb.pgvector", "PgVector", "psycopg[binary] pgvector")
+        return PgVector(table_name=table_name, db_url=config["db_url"], schema=config["db_schema"], **kwargs)
+    from agno.vectordb.lancedb import LanceDb
+    return LanceDb(table_name=table_name, uri=config["lancedb_uri"], **kwargs)
+
+
+@lru_cache(maxsize=4)
+def _engine_for(db_url: str) -> Engine:
+    return create_engine(db_url, pool_pre_ping=True)
+
+
+def get_shared_engine() -> Engine:
+    """SQLAlchemy engine for the database every worker process shares."""
+    config = get_storage_config()
+    if config["storage_backend"] == "postgres":
+        return _engine_for(config["db_url"])
+    os.makedirs(os.path.dirname(config["sqlite_file"]) or ".", exist_ok=True)
+    return _engine_for(f"sqlite:///{config['sqlite_file']}")
+
+
+# --- Cross-process cache invalidation ---
+class CacheVersions:
+    """Version counters in the shared database, one per named cache.
+
+    A process that changes shared state (e.g. reloads a knowledge table) bumps the
+    version; every worker polls the table and clears its local caches when a version
+    it has seen changes. st.cache_resource is per process, so this is what keeps
+    workers behind a load balancer consistent.
+    """
+
+    def __init__(self, engine: Engine, poll_interval: float = CACHE_VERSION_POLL_INTERVAL):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.table = Table(
+            CACHE_VERSION_TABLE_NAME,
+            MetaData(),
+            Column("name", String, primary_key=True),
+            Column("version", Integer, nullable=False, default=0),
+        )
+        self.table.create(self.engine, checkfirst=True)
+        self._seen: Dict[str, int] = {}
+        self._handlers: Dict[str, Callable[[], None]] = {}
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+
+    def read_all(self) -> Dict[str, int]:
+        with self.engine.connect() as conn:
+            return {row.name: row.version for row in conn.execute(select(self.table))}
+
+    def bump(self, name: str) -> None:
+        """Marks every process's cache `name` as stale."""
+        with self.engine.begin() as conn:
+            result = conn.execute(update(self.table).where(self.table.c.name == name).values(version=self.table.c.version + 1))
+            if result.rowcount == 0:
+                try:
+                    with conn.begin_nested():  # Savepoint, so a lost insert race doesn't abort the transaction
+                        conn.execute(self.table.insert().values(name=name, version=1))
+                except IntegrityError:
+                    # Another process inserted concurrently; increment theirs instead
+                    conn.execute(update(self.table).where(self.table.c.name == name).values(version=self.table.c.version + 1))
+
+    def on_change(self, name: str, handler: Callable[[], None]) -> None:
+        """Registers the local cache-clearing callback for `name`."""
+        with self._lock:
+            self._handlers[name] = handler
+
+    def sync(self, force: bool = False) -> bool:
+        """Polls the shared versions (throttled) and runs handlers for changed caches."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_poll < self.poll_interval:
+                return False
+            self._last_poll = now
+        versions = self.read_all()
+        changed = False
+        with self._lock:
+            for name, handler in self._handlers.items():
+                version = versions.get(name, 0)
+                seen = self._seen.setdefault(name, version)  # First sight is a baseline, not a change
+                if version != seen:
+                    self._seen[name] = version
+                    handler()
+                    changed = True
+        return changed
+
+
+_versions_lock = threading.Lock()
+_versions: Optional[CacheVersions] = None
+
+
+def get_cache_versions() -> CacheVersions:
+    """Process-wide CacheVersions bound to the shared database."""
+    global _versions
+    if _versions is None:
+        with _versions_lock:
+            if _versions is None:
+                _versions = CacheVersions(get_shared_engine())
+    return _versions
@@ -0,0 +1,155 @@
+# app/streaming.py
+# Event-driven consumer for agno's streamed run responses.
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# agno run event names (RunEvent values). Both the older "RunResponse" and the newer
+# "RunResponseContent" spellings carry content deltas.
+CONTENT_EVENTS = ("RunResponse", "RunResponseContent")
+TOOL_STARTED_EVENTS = ("ToolCallStarted",)
+TOOL_COMPLETED_EVENTS = ("ToolCallCompleted",)
+COMPLETED_EVENTS = ("RunCompleted",)
+ERROR_EVENTS = ("RunError", "RunCancelled")
+
+
+def _field(obj: Any, name: str, default: Any = None) -> Any:
+    """Reads a field from an agno object or its dict form."""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _event_tools(chunk: Any) -> List[Any]:
+    """Returns the tool executions attached to a tool event (list `tools` or single `tool`)."""
+    tools = getattr(chunk, "tools", None)
+    if tools:
+        return list(tools)
+    tool = getattr(chunk, "tool", None)
+    return [tool] if tool is not None else []
+
+
+class StreamConsumer:
+    """Consumes an agent run stream, dispatching each chunk on its event type in O(1).
+
+    Collects the response text, the tool calls (name + duration, taken from tool
+    events rather than by probing every chunk) and any error or final response.
+    `on_content` receives the accumulated text at most once per `render_interval`
+    seconds, so rendering cost doesn't grow with the number of tokens.
+    """
+
+    def __init__(self, on_content: Optional[Callable[[str], None]] = None, render_interval: float = 0.05):
+        self.on_content = on_content
+        self.render_interval = render_interval
+        self._parts: List[str] = []
+        self._last_render = 0.0
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.final_response: Any = None
+        self.num_chunks = 0
+        self._tool_starts: Dict[str, float] = {}
+        self._completed_tool_ids = set()
+
+        self._event_handlers: Dict[str, Callable[[Any], None]] = {}
+        for event in CONTENT_EVENTS:
+            self._event_handlers[event] = self._on_content_chunk
+        for event in TOOL_STARTED_EVENTS:
+            self._event_handlers[event] = self._on_tool_started
+        for event in TOOL_COMPLETED_EVENTS:
+            self._event_handlers[event] = self._on_tool_completed
+        for event in COMPLETED_EVENTS:
+            self._event_handlers[event] = self._on_completed
+        for event in ERROR_EVENTS:
+            self._event_handlers[event] = self._on_error_event
+
+        # Fallbacks for chunks without an event (plain text, error dicts, older run responses)
+        self._type_handlers: Dict[type, Callable[[Any], None]] = {
+            str: self._append,
+            dict: self._on_dict,
+        }
+
+    @property
+    def content(self) -> str:
+        if len(self._parts) > 1:
+            self._parts[:] = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    # --- Dispatch ---
+    def feed(self, chunk: Any) -> None:
+        if chunk is None:
+            return
+        self.num_chunks += 1
+        event = getattr(chunk, "event", None)
+        if event is not None:
+            # Events without a handler (RunStarted, UpdatingMemory, Reasoning*, ...) carry
+            # status text, not answer text, so they never reach the response
+            handler = self._event_handlers.get(event)
+            if handler is not None:
+                handler(chunk)
+            return
+        self._type_handlers.get(type(chunk), self._on_unknown)(chunk)
+
+    def consume(self, stream) -> "StreamConsumer":
+        """Feeds every chunk of `stream`, stopping early on an in-stream error."""
+        for chunk in stream:
+            self.feed(chunk)
+            if self.error:
+                break
+        return self
+
+    # --- Handlers ---
+    def _append(self, text: str) -> None:
+        if text:
+            self._parts.append(text)
+            if self.on_content:
+                now = time.monotonic()
+                if now - self._last_render >= self.render_interval:
+                    self._last_render = now
+                    self.on_content(self.content)
+
+    def _on_content_chunk(self, chunk: Any) -> None:
+        content = chunk.content
+        if isinstance(content, str):
+            self._append(content)
+
+    def _on_tool_started(self, chunk: Any) -> None:
+        now = time.perf_counter()
+        for tool in _event_tools(chunk):
+            self._tool_starts[_field(tool, "tool_call_id") or _field(tool, "tool_name")] = now
+
+    def _on_tool_completed(self, chunk: Any) -> None:
+        now = time.perf_counter()
+        for tool in _event_tools(chunk):
+            call_id = _field(tool, "tool_call_id") or _field(tool, "tool_name")
+            if call_id in self._completed_tool_ids:
+                continue  # Same tool reported again (e.g. in a later summary event)
+            self._completed_tool_ids.add(call_id)
+
+            # Prefer the duration agno measured; fall back to started -> completed time
+            duration = _field(_field(tool, "metrics"), "time")
+            started = self._tool_starts.pop(call_id, None)
+            if duration is None and started is not None:
+                duration = now - started
+            self.tool_calls.append({
+                "name": _field(tool, "tool_name") or "Unknown",
+                "duration": duration,
+            })
+
+    def _on_completed(self, chunk: Any) -> None:
+        self.final_response = chunk
+
+    def _on_error_event(self, chunk: Any) -> None:
+        self.error = str(getattr(chunk, "content", None) or "Run ended with an error")
+
+    def _on_dict(self, chunk: Dict[str, Any]) -> None:
+        # The specific error structure agno yields within the stream
+        if isinstance(chunk.get("ERROR"), dict):
+            self.error = chunk["ERROR"].get("message", "Unknown internal error")
+        elif isinstance(chunk.get("content"), str):
+            self._append(chunk["content"])
+
+    def _on_unknown(self, chunk: Any) -> None:
+        # Run responses without an event (older agno versions) still carry content
+        content = getattr(chunk, "content", None)
+        if isinstance(content, str):
+            self._append(content)
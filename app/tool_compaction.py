@@ -0,0 +1,165 @@
+# app/tool_compaction.py
+# Compaction of large tool results before they are stored in the run and replayed.
+#
+# ToolResultCompactor is an agno tool hook: it runs the tool, and when the result is
+# above `max_tokens` it replaces it with a smaller version before agno appends it to
+# the run. That version is what the model sees, what storage persists and what
+# add_history_to_messages / read_tool_call_history send again in later turns.
+#
+# Modes:
+#   "fields"   - JSON results (web search hits, knowledge documents) keep only key fields,
+#                each clipped, and only the first `max_items` entries
+#   "summary"  - local extractive summary: the sentences sharing most words with the
+#                tool arguments, in their original order (no model call)
+#   "truncate" - head and tail of the text around an omission marker
+#   "auto"     - "fields" for JSON, "summary" otherwise; any mode ends with "truncate"
+#                if the result is still over budget
+
+import json
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .memory_index import estimate_tokens
+
+# --- Constants ---
+COMPACTION_MODES = ("auto", "fields", "summary", "truncate")
+DEFAULT_MAX_TOKENS = 800         # Results at or below this size are left alone
+DEFAULT_FIELD_CHARS = 300        # Characters kept per field in "fields" mode
+DEFAULT_MAX_ITEMS = 5            # List entries kept in "fields" mode
+# Fields worth keeping from search hits and knowledge documents, in output order
+KEY_FIELDS = ("title", "name", "href", "url", "source", "date", "body", "snippet", "content", "text")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s+|\n+")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Per-turn stats; a dict shared by the worker threads a turn's tools run on (see tool_executor)
+_turn_stats: ContextVar = ContextVar("tool_compaction_stats", default=None)
+
+
+def _clip(text: str, chars: int) -> str:
+    return text if len(text) <= chars else text[:chars].rstrip() + "…"
+
+
+class ToolResultCompactor:
+    """agno tool hook that shrinks tool results above a token budget."""
+
+    def __init__(
+        self,
+        mode: str = "auto",
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        field_chars: int = DEFAULT_FIELD_CHARS,
+        max_items: int = DEFAULT_MAX_ITEMS,
+        key_fields: Iterable[str] = KEY_FIELDS,
+        skip_tools: Iterable[str] = (),
+    ):
+        if mode not in COMPACTION_MODES:
+            raise ValueError(f"mode must be one of {COMPACTION_MODES}, got {mode!r}")
+        self.mode = mode
+        self.max_tokens = max_tokens
+        self.field_chars = field_chars
+        self.max_items = max_items
+        self.key_fields = tuple(key_fields)
+        self.skip_tools = frozenset(skip_tools)
+        self._lock = threading.Lock()
+
+    # --- Per-turn accounting ---
+    def start_turn(self) -> None:
+        _turn_stats.set({"results": 0, "compacted": 0, "tokens_before": 0, "tokens_after": 0, "seconds": 0.0})
+
+    def end_turn(self) -> Dict[str, Any]:
+        """Returns the finished turn's stats (empty if no turn was started)."""
+        stats = _turn_stats.get() or {}
+        _turn_stats.set(None)
+        return stats
+
+    def _record(self, before: int, after: int, seconds: float) -> None:
+        stats = _turn_stats.get()
+        if stats is None:
+            return
+        with self._lock:
+            stats["results"] += 1
+            stats["compacted"] += after < before
+            stats["tokens_before"] += before
+            stats["tokens_after"] += after
+            stats["seconds"] += seconds
+
+    # --- Tool hook ---
+    def __call__(self, function_name: str, function_call: Callable, arguments: Dict[str, Any]) -> Any:
+        result = function_call(**arguments)
+        if not isinstance(result, str) or function_name in self.skip_tools:
+            return result
+        start = time.perf_counter()
+        compacted = self.compact(result, query=" ".join(str(v) for v in (arguments or {}).values()))
+        self._record(estimate_tokens(result), estimate_tokens(compacted), time.perf_counter() - start)
+        return compacted
+
+    # --- Compaction ---
+    def compact(self, text: str, query: str = "") -> str:
+        """`text` if it is within budget, otherwise its compacted form."""
+        if estimate_tokens(text) <= self.max_tokens:
+            return text
+        result = text
+        if self.mode in ("auto", "fields"):
+            result = self._fields(text)
+        if (self.mode == "summary" or (self.mode == "auto" and result is text)) and estimate_tokens(result) > self.max_tokens:
+            result = self._summary(text, query)
+        if result is None or estimate_tokens(result) > self.max_tokens:
+            result = self._truncate(result or text)
+        return result
+
+    def _fields(self, text: str) -> Optional[str]:
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return text if self.mode == "auto" else None
+        items = data if isinstance(data, list) else [data]
+        kept = []
+        for item in items[:self.max_items]:
+            if isinstance(item, dict):
+                item = {key: _clip(str(item[key]), self.field_chars) for key in self.key_fields if item.get(key) not in (None, "")}
+            elif isinstance(item, str):
+                item = _clip(item, self.field_chars)
+            kept.append(item)
+        if len(items) > self.max_items:
+            kept.append(f"[{len(items) - self.max_items} more results omitted]")
+        return json.dumps(kept if isinstance(data, list) else kept[0], ensure_ascii=False)
+
+    def _summary(self, text: str, query: str) -> str:
+        sentences = [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+        query_words = set(_WORD_RE.findall(query.lower()))
+        scored = []
+        for i, sentence in enumerate(sentences):
+            words = _WORD_RE.findall(sentence.lower())
+            overlap = len(query_words.intersection(words)) / (1 + len(query_words))
+            scored.append((overlap + 1.0 / (1 + i), i))  # Ties go to earlier sentences
+        budget, chosen = self.max_tokens, []
+        for _, i in sorted(scored, reverse=True):
+            cost = estimate_tokens(sentences[i])
+            if cost <= budget:
+                chosen.append(i)
+                budget -= cost
+        if not chosen:  # Not even one sentence fits
+            return self._truncate(text)
+        summary = " ".join(sentences[i] for i in sorted(chosen))
+        return f"[summary of {len(sentences)} sentences] {summary}"
+
+    def _truncate(self, text: str) -> str:
+        chars = self.max_tokens * 4
+        if len(text) <= chars:
+            return text
+        head, tail = text[:chars * 3 // 4], text[-(chars // 4):]
+        return f"{head}\n[… {estimate_tokens(text) - self.max_tokens} tokens omitted …]\n{tail}"
+
+
+def attach_tool_compactor(agent: Any, compactor: ToolResultCompactor) -> Any:
+    """Installs `compactor` as a tool hook on the agent (after any existing hooks)."""
+    agent.tool_hooks = [*(getattr(agent, "tool_hooks", None) or []), compactor]
+    agent.tool_compactor = compactor
+    return agent
+
+
+def get_tool_compactor(agent: Any) -> Optional[ToolResultCompactor]:
+    """Returns the compactor attached to the agent, if tool result compaction is enabled."""
+    return getattr(agent, "tool_compactor", None)
@@ -0,0 +1,159 @@
+# app/tool_executor.py
+# Opt-in concurrent execution of the independent tool calls a model emits in one turn.
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Iterable, List, Optional
+
+# --- Constants ---
+DEFAULT_MAX_WORKERS = 4          # Upper bound on tool calls running at once (per agent)
+DEFAULT_TOOL_TIMEOUT = 30.0      # Seconds before a single tool call is abandoned
+# Tools that mutate shared agent state keep agno's normal one-by-one execution
+DEFAULT_SEQUENTIAL_TOOLS = frozenset({"update_user_memory"})
+
+
+def _tool_name(function_call: Any) -> Optional[str]:
+    return getattr(getattr(function_call, "function", None), "name", None)
+
+
+def _timeout_result(message: str) -> Any:
+    """Builds the failed-execution value agno expects back from FunctionCall.execute()."""
+    try:
+        # Newer agno releases return a result object instead of a bool
+        from agno.tools.function import FunctionExecutionResult
+        return FunctionExecutionResult(status="failure", error=message)
+    except ImportError:
+        return False
+
+
+def _shadow_execute(function_call: Any, execute) -> None:
+    # FunctionCall is a pydantic model; bypass its validation to shadow the bound method
+    object.__setattr__(function_call, "execute", execute)
+
+
+class ParallelToolExecutor:
+    """Runs a turn's tool calls concurrently on a bounded pool, keeping agno's result order.
+
+    agno still walks the calls in their original order (emitting its usual tool events
+    and appending results to the history); every call has already been started in the
+    background, so the walk only waits as long as the slowest call.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        default_timeout: float = DEFAULT_TOOL_TIMEOUT,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        sequential_tools: Iterable[str] = DEFAULT_SEQUENTIAL_TOOLS,
+    ):
+        self.default_timeout = default_timeout
+        self.tool_timeouts = dict(tool_timeouts or {})
+        self.sequential_tools = frozenset(sequential_tools)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-tool")
+        # Agents are shared between sessions, so per-turn accounting lives on the calling thread
+        self._turn = threading.local()
+
+    # --- Per-turn accounting ---
+    def start_turn(self) -> None:
+        self._turn.stats = {"tool_calls": 0, "parallel_batches": 0, "tool_time": 0.0, "wall_time": 0.0, "timeouts": 0}
+
+    def end_turn(self) -> Dict[str, Any]:
+        """Returns this thread's stats for the finished turn, including wall-clock time saved."""
+        stats = getattr(self._turn, "stats", None) or {}
+        self._turn.stats = None
+        if stats:
+            stats["time_saved"] = max(0.0, stats["tool_time"] - stats["wall_time"])
+        return stats
+
+    def _record(self, **increments: float) -> None:
+        stats = getattr(self._turn, "stats", None)
+        if stats is not None:
+            for key, value in increments.items():
+                stats[key] += value
+
+    # --- Execution ---
+    def timeout_for(self, function_call: Any) -> float:
+        return self.tool_timeouts.get(_tool_name(function_call), self.default_timeout)
+
+    def prefetch(self, function_calls: List[Any]) -> Optional[List[float]]:
+        """Starts the batch's parallel-safe calls and shadows each call's `execute` to await its result.
+
+        Returns the list that per-call durations are collected into, or None when the
+        batch has nothing to overlap and agno's normal execution is left untouched.
+        """
+        parallel = [fc for fc in function_calls if _tool_name(fc) not in self.sequential_tools]
+        if len(parallel) < 2:
+            return None
+
+        parallel_ids = {id(fc) for fc in parallel}
+        durations: List[float] = []
+
+        def timed(original_execute):
+            start = time.perf_counter()
+            try:
+                return original_execute()
+            finally:
+                durations.append(time.perf_counter() - start)
+
+        def awaiting(fc, future):
+            def execute():
+                try:
+                    return future.result(timeout=self.timeout_for(fc))
+                except FutureTimeoutError:
+                    # The worker can't be killed; it finishes in the background and is ignored
+                    message = f"Tool call '{_tool_name(fc)}' timed out after {self.timeout_for(fc):g}s"
+                    fc.error = message
+                    fc.result = message
+                    self._record(timeouts=1)
+                    return _timeout_result(message)
+            return execute
+
+        def sequential(original_execute):
+            # Still timed so the turn's "sequential cost" covers the whole batch
+            return lambda: timed(original_execute)
+
+        for fc in function_calls:
+            original_execute = fc.execute
+            if id(fc) in parallel_ids:
+                # Run in a copy of the caller's context so tools see per-turn context variables
+                future = self._pool.submit(contextvars.copy_context().run, timed, original_execute)
+                _shadow_execute(fc, awaiting(fc, future))
+            else:
+                _shadow_execute(fc, sequential(original_execute))
+
+        self._record(tool_calls=len(function_calls), parallel_batches=1)
+        return durations
+
+    def release(self, function_calls: List[Any]) -> None:
+        """Removes the shadowing `execute` methods once agno has consumed the batch."""
+        for fc in function_calls:
+            getattr(fc, "__dict__", {}).pop("execute", None)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+def enable_parallel_tool_calls(model: Any, executor: ParallelToolExecutor) -> Any:
+    """Wraps `model.run_function_calls` so multi-tool turns run through `executor`."""
+    original_run_function_calls = model.run_function_calls
+
+    def run_function_calls(function_calls, *args, **kwargs):
+        batch_start = time.perf_counter()
+        durations = executor.prefetch(function_calls)
+        try:
+            yield from original_run_function_calls(function_calls, *args, **kwargs)
+        finally:
+            executor.release(function_calls)
+            if durations is not None:
+                executor._record(tool_time=sum(durations), wall_time=time.perf_counter() - batch_start)
+
+    model.run_function_calls = run_function_calls
+    model.parallel_tool_executor = executor
+    return model
+
+
+def get_parallel_tool_executor(agent: Any) -> Optional[ParallelToolExecutor]:
+    """Returns the executor attached to the agent's model, if parallel tool calls are enabled."""
+    return getattr(getattr(agent, "model", None), "parallel_tool_executor", None)
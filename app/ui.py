@@ -1,16 +1,42 @@
 import streamlit as st
 from agno.agent import Agent, RunResponse, Message
 from .prompts import SEQUENTIAL_PROMPTS, EXAMPLE_DESCRIPTIONS, EXAMPLE_INSTRUCTIONS
+from .prompt_cache import cache_usage, reset_turn_context, set_turn_context
+from .tool_executor import get_parallel_tool_executor
+from .streaming import StreamConsumer
+from .router import get_model_router, get_router_stats
+from .resilience import ModelCallError, get_resilient_caller
+from .knowledge import compact_table, get_vector_db, reset_knowledge_user, set_knowledge_user
+from .jobs import JOB_COMPACT, JOB_INGEST, JOB_SUMMARY, Job, get_job_queue
+from .scheduler import AdmissionError, get_turn_scheduler, rate_key
+from .memory_index import get_memory_index
+from .tool_compaction import get_tool_compactor
+from .context_packing import get_context_packer
+from .memory_query import SORT_ORDERS, get_memory_query
+from .memory import (
+    TranscriptStore,
+    get_transcript_store,
+    load_earlier_messages,
+    transcript_memory_stats,
+    trim_transcript,
+)
+from typing import Optional
 import json # For pretty printing debug info
 from agno.memory.v2.memory import Memory # Import Memory for type hint
 from agno.storage.sqlite import SqliteStorage # Import Storage
-from agno.vectordb.lancedb import LanceDb # Import LanceDb for type hint
 import re # Import regex module
 import os # Import os module
-import lancedb # Import base lancedb library
 import traceback # For error reporting
+import time # For per-turn latency
+import shutil # For removing uploaded files after ingestion
+import uuid # For upload directory names
+import hashlib # For keying ingest jobs on the uploaded files
+import logging
+
+logger = logging.getLogger(__name__)
 
 # --- Constants ---
+JOB_POLL_SECONDS = 1.0 # How often a job status fragment refreshes while its job runs
 # The list is now defined in app/prompts.py
 # SEQUENTIAL_PROMPTS = [
 #     "Step 1: Tell me a short story about a brave knight.",
@@ -18,14 +44,64 @@ import traceback # For error reporting
 #     "Step 3: Finally, how did the story end?"
 # ]
 
-def display_chat_history():
+def _get_transcript_store(agent: Agent) -> Optional[TranscriptStore]:
+    """Returns the spill store sharing the agent storage's database, if it has an engine."""
+    engine = getattr(getattr(agent, "storage", None), "db_engine", None)
+    if engine is None:
+        return None
+    try:
+        return get_transcript_store(engine)
+    except Exception as e:
+        st.warning(f"Transcript spill storage unavailable, older messages will be dropped: {e}")
+        return None
+
+def _render_job(job: Job):
+    """One status line for a background job."""
+    if job.state == "queued":
+        st.info(f"{job.label}: queued…", icon="⏳")
+    elif job.state == "running":
+        text = f"{job.label}: {job.message or 'running'} ({job.seconds:.0f}s)"
+        st.progress(job.progress or 0.0, text=text)
+    elif job.state == "done":
+        st.success(f"{job.label}: finished in {job.seconds:.1f}s" + (f" — {job.message}" if job.message else ""))
+    else:
+        st.error(f"{job.label} failed after {job.seconds:.1f}s: {job.error}")
+
+def display_job_status(kind: str, user_id: Optional[str] = None, session_id: Optional[str] = None, resource: Optional[str] = None) -> Optional[Job]:
+    """Shows the latest job for the key; while it is queued or running, a fragment polls it
+    without blocking the script, and reruns the whole page once when it finishes."""
+    queue = get_job_queue()
+    job = queue.get(kind, user_id, session_id, resource)
+    if job is None:
+        return None
+    was_active = job.active
+
+    @st.fragment(run_every=JOB_POLL_SECONDS if was_active else None)
+    def job_status():
+        current = queue.get(kind, user_id, session_id, resource) or job
+        _render_job(current)
+        if was_active and not current.active:
+            st.rerun() # Refresh what the job changed (summary, table list)
+
+    job_status()
+    return job
+
+def display_chat_history(store: Optional[TranscriptStore] = None):
     """Displays the chat messages from session state, including metadata tags as badges."""
     if "messages" not in st.session_state:
         st.session_state.messages = []
+
+    # Older messages live in the spill table; reload them a page at a time on request
+    spilled_count = st.session_state.get("spilled_count", 0)
+    earlier_messages = st.session_state.get("earlier_messages", [])
+    if spilled_count > len(earlier_messages) and store is not None:
+        if st.button(f"⬆️ Load earlier messages ({spilled_count - len(earlier_messages)} hidden)", key="load_earlier_messages"):
+            load_earlier_messages(store)
+            st.rerun()
     
     # Add badge styles
     
-    for message in st.session_state.messages:
+    for message in earlier_messages + st.session_state.messages:
         with st.chat_message(message["role"]):
             content = message["content"]
             if message["role"] == "assistant":
@@ -67,11 +143,60 @@ def display_chat_history():
 
                 # Tool Badges
                 if "tool_calls" in metadata and metadata["tool_calls"]:
-                    tool_names = [tool.get('function', {}).get('name', 'Unknown') for tool in metadata["tool_calls"]]
+                    tool_names = [tool.get('name', 'Unknown') for tool in metadata["tool_calls"]]
                     if tool_names:
-                         # Deduplicate tool names before displaying them
-                         unique_tool_names = list(set(tool_names))
+                         # Deduplicate tool names (keeping call order) before displaying them
+                         unique_tool_names = list(dict.fromkeys(tool_names))
                          badge_md_parts.append(f":red-badge[{', '.join(unique_tool_names)}]") # Changed color for tools
+                    tool_time = sum(tool.get('duration') or 0.0 for tool in metadata["tool_calls"])
+                    if tool_time:
+                        badge_md_parts.append(f":gray-badge[Tools: {tool_time:.1f}s]")
+
+                # Model routing badge
+                routing = metadata.get("routing")
+                if routing:
+                    badge_md_parts.append(f":orange-badge[Routed: {routing['tier']} ({routing['method']})]")
+
+                # Prompt cache badge
+                prompt_cache = metadata.get("prompt_cache")
+                if prompt_cache:
+                    badge_md_parts.append(f":blue-badge[Cached: {prompt_cache['cached_tokens']:,}/{prompt_cache['input_tokens']:,} input tokens]")
+
+                # Top-k memory retrieval badge
+                retrieval = metadata.get("memory_retrieval")
+                if retrieval and retrieval.get("memories"):
+                    badge_md_parts.append(f":violet-badge[Memories: {retrieval['included']}/{retrieval['memories']}, -{retrieval['tokens_saved']:,} tokens]")
+                if retrieval and retrieval.get("merged"):
+                    badge_md_parts.append(f":gray-badge[Merged duplicates: {retrieval['merged']}]")
+
+                # Tool result compaction badge
+                compaction = metadata.get("tool_compaction")
+                if compaction:
+                    badge_md_parts.append(f":gray-badge[Tool results: -{compaction['tokens_before'] - compaction['tokens_after']:,} tokens]")
+
+                # Knowledge context packing badge
+                packing = metadata.get("context_packing")
+                if packing:
+                    badge_md_parts.append(f":blue-badge[Context: {packing['tokens_after']:,}/{packing['tokens_before']:,} tokens, {packing['chunks']} chunks]")
+
+                # Admission queue badge
+                queue_wait = metadata.get("queue_wait")
+                if queue_wait:
+                    badge_md_parts.append(f":orange-badge[Queued: {queue_wait:.1f}s]")
+
+                # Resilient model call badges
+                resilience = metadata.get("resilience")
+                if resilience:
+                    if resilience.get("failover"):
+                        badge_md_parts.append(f":orange-badge[Failover: {resilience['failover']}]")
+                    if resilience.get("hedge_wins"):
+                        badge_md_parts.append(":green-badge[Hedged]")
+                    if resilience.get("retries"):
+                        badge_md_parts.append(f":gray-badge[Retries: {resilience['retries']}]")
+
+                # Parallel tool execution badge
+                if metadata.get("tool_time_saved"):
+                    badge_md_parts.append(f":green-badge[Parallel tools: -{metadata['tool_time_saved']:.1f}s]")
 
                 if badge_md_parts:
                     st.markdown(" " + " ".join(badge_md_parts)) # Join with spaces
@@ -85,6 +210,12 @@ def handle_agent_response(agent: Agent, prompt: str, user_id: str, session_id: s
     # This ensures we use the most current values even if they were changed
     current_user_id = st.session_state.get("user_id", user_id)
     current_session_id = st.session_state.get("session_id", session_id)
+
+    # With model routing on, pick the small- or large-tier agent for this prompt
+    router = get_model_router(agent)
+    routing = None
+    if router:
+        agent, routing = router.select(prompt)
     
     metadata = { 
         "model_id": getattr(agent.model, 'id', 'N/A'),
@@ -93,17 +224,57 @@ def handle_agent_response(agent: Agent, prompt: str, user_id: str, session_id: s
         "load_history": getattr(agent, 'add_history_to_messages', False),
         "tool_calls": [], # Will be populated with tool call data if tools are used
     }
+    if routing:
+        metadata["routing"] = {key: routing[key] for key in ("tier", "score", "method")}
+    tool_executor = get_parallel_tool_executor(agent)
+    if tool_executor:
+        tool_executor.start_turn()
+    resilient_caller = get_resilient_caller(agent)
+    if resilient_caller:
+        resilient_caller.start_turn()
+    memory_index = get_memory_index(agent)
+    if memory_index:
+        memory_index.start_turn()
+    tool_compactor = get_tool_compactor(agent)
+    if tool_compactor:
+        tool_compactor.start_turn()
+    context_packer = get_context_packer(agent)
+    if context_packer:
+        context_packer.start_turn()
+    # Knowledge searches this turn see public documents plus this user's private ones
+    knowledge_user_token = set_knowledge_user(current_user_id)
+    scheduler = get_turn_scheduler()
+    ticket = None
+    turn_context_token = None
 
     # --- Stream Processing --- 
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
         message_placeholder.markdown("Thinking... ▌")
+        turn_start = time.perf_counter()
         try:
+            if scheduler:
+                # Wait for a slot (fair share across users, provider rate limits), showing our place in line
+                ticket = scheduler.acquire(
+                    current_user_id,
+                    rate_key(getattr(agent.model, "provider", "") or "", getattr(agent.model, "api_key", None)),
+                    on_wait=lambda position, waited: message_placeholder.markdown(
+                        f"Queued ({'rate limited' if position == 0 else f'position {position}'}, {waited:.0f}s) ▌"
+                    ),
+                )
+                if ticket.waited >= 0.1:
+                    metadata["queue_wait"] = ticket.waited
+                message_placeholder.markdown("Thinking... ▌")
+                turn_start = time.perf_counter()  # Routing stats time the model, not the queue
+            # With the stable prompt layout, memories/summary ride along with the prompt sent
+            # to the provider; the stored user message stays the raw prompt
+            turn_context_token = set_turn_context(agent, prompt, current_user_id, current_session_id)
             response_stream = agent.run(
                 prompt,
                 user_id=current_user_id if current_user_id else None,
                 session_id=current_session_id if current_session_id else None,
-                stream=True
+                stream=True,
+                stream_intermediate_steps=True # Emit typed tool-call events
             )
 
             # --- Add check for None stream ---
@@ -114,117 +285,44 @@ def handle_agent_response(agent: Agent, prompt: str, user_id: str, session_id: s
                 metadata["error"] = True
                 full_response_content = internal_error_message
             else:
-                # --- Original stream processing loop ---
-                has_captured_all_tool_calls = False  # Flag to track if we've already captured all tools
-                
-                # Storage for saving complete response (will be used to extract tools at the end)
-                complete_response = None
-                
-                for chunk in response_stream:
-                    # Save the complete response once available (last chunk should have everything)
-                    if hasattr(chunk, '__dict__') and 'content' in chunk.__dict__:
-                        complete_response = chunk
-
-                    # Handle different types of chunks
-                    if chunk is None:
-                        # Skip None chunks
-                        continue
-                    # Check for the specific error structure within the stream
-                    elif isinstance(chunk, dict) and "ERROR" in chunk and isinstance(chunk["ERROR"], dict):
-                        internal_error_message = chunk["ERROR"].get("message", "Unknown internal error")
-                        st.error(f"Internal Agno Error: {internal_error_message}")
-                        message_placeholder.error(f"Error during stream: {internal_error_message}")
-                        metadata["error"] = True
-                        full_response_content = f"Internal Error: {internal_error_message}"
-                        break
-                    elif hasattr(chunk, 'content') and chunk.content:
-                        # Handle RunResponse objects or any object with a content attribute
-                        full_response_content += chunk.content
-                        message_placeholder.markdown(full_response_content + " ▌")
-
-                        # --- Capture tool calls --- 
-                        # Check if nested in messages
-                        if hasattr(chunk, 'messages') and chunk.messages is not None:
-                            for msg in chunk.messages:
-                                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                                    metadata["tool_calls"].extend(msg.tool_calls)
-                        # Check if directly on chunk object
-                        elif hasattr(chunk, 'tool_calls') and chunk.tool_calls:
-                            metadata["tool_calls"].extend(chunk.tool_calls)
-                        # Check if tools field exists (Agno's actual field name for tool calls)
-                        elif hasattr(chunk, 'tools') and chunk.tools:
-                            # Convert tools to the expected tool_calls format (function.name)
-                            for tool in chunk.tools:
-                                if isinstance(tool, dict) and 'tool_name' in tool:
-                                    metadata["tool_calls"].append({"function": {"name": tool['tool_name']}})
-                                elif hasattr(tool, 'tool_name'):
-                                    metadata["tool_calls"].append({"function": {"name": tool.tool_name}})
-                        # Try to access tool_calls through a run property if it exists
-                        elif hasattr(chunk, 'run') and hasattr(chunk.run, 'tool_calls') and chunk.run.tool_calls:
-                            metadata["tool_calls"].extend(chunk.run.tool_calls)
-
-                    elif isinstance(chunk, dict) and 'content' in chunk:
-                        # Handle dictionary chunks with content
-                        full_response_content += chunk['content']
-                        message_placeholder.markdown(full_response_content + " ▌")
-
-                        # --- Capture tool calls --- 
-                        # Check if nested in messages
-                        if 'messages' in chunk and chunk['messages'] is not None:
-                            for msg in chunk['messages']:
-                                if 'tool_calls' in msg and msg['tool_calls']:
-                                    metadata["tool_calls"].extend(msg['tool_calls'])
-                        # Check if directly in chunk dict
-                        elif 'tool_calls' in chunk and chunk['tool_calls']:
-                            metadata["tool_calls"].extend(chunk['tool_calls'])
-                        # Check if tools field exists (Agno's actual field name for tool calls)
-                        elif 'tools' in chunk and chunk['tools']:
-                            # Convert tools to the expected tool_calls format (function.name)
-                            for tool in chunk['tools']:
-                                if isinstance(tool, dict) and 'tool_name' in tool:
-                                    metadata["tool_calls"].append({"function": {"name": tool['tool_name']}})
-                        # Try run property if present
-                        elif 'run' in chunk and 'tool_calls' in chunk['run'] and chunk['run']['tool_calls']:
-                            metadata["tool_calls"].extend(chunk['run']['tool_calls'])
-
-                    elif isinstance(chunk, str):
-                        # Handle plain string chunks
-                        full_response_content += chunk
-                        message_placeholder.markdown(full_response_content + " ▌")
-
-                # Try to find tool calls from the complete response (which might have all tools)
-                if complete_response and not metadata["tool_calls"]:
-                    try:
-                        if hasattr(complete_response, 'run') and hasattr(complete_response.run, 'tool_calls') and complete_response.run.tool_calls:
-                            metadata["tool_calls"] = complete_response.run.tool_calls
-                        # Check for tools field in complete response
-                        elif hasattr(complete_response, 'tools') and complete_response.tools:
-                            for tool in complete_response.tools:
-                                if isinstance(tool, dict) and 'tool_name' in tool:
-                                    metadata["tool_calls"].append({"function": {"name": tool['tool_name']}})
-                                elif hasattr(tool, 'tool_name'):
-                                    metadata["tool_calls"].append({"function": {"name": tool.tool_name}})
-                    except Exception as e:
-                        pass
-                
-                # If still no tool calls found but we know Agno uses them, try parsing from full_response_content
-                if not metadata["tool_calls"] and "tool:" in full_response_content.lower():
-                    try:
-                        # This is a simple regex-based fallback to extract tool names
-                        import re
-                        # Find patterns like "Tool: tool_name" or similar in the response
-                        tool_matches = re.findall(r"tool:\s*(\w+)", full_response_content, re.IGNORECASE)
-                        if tool_matches:
-                            # Create simplified tool_call objects with just the function name
-                            for tool_name in tool_matches:
-                                metadata["tool_calls"].append({"function": {"name": tool_name}})
-                    except Exception:
-                        pass
+                # --- Event-driven stream processing ---
+                # Each chunk is dispatched on its agno event type; tool calls come from
+                # ToolCallStarted/ToolCallCompleted events instead of probing every chunk.
+                consumer = StreamConsumer(
+                    on_content=lambda content: message_placeholder.markdown(content + " ▌")
+                )
+                consumer.consume(response_stream)
+                full_response_content = consumer.content
+                metadata["tool_calls"] = consumer.tool_calls
 
-                if not internal_error_message:
+                if consumer.error:
+                    internal_error_message = consumer.error
+                    st.error(f"Internal Agno Error: {internal_error_message}")
+                    message_placeholder.error(f"Error during stream: {internal_error_message}")
+                    metadata["error"] = True
+                    full_response_content = f"Internal Error: {internal_error_message}"
+                else:
                     message_placeholder.markdown(full_response_content)
 
+                # Cached vs uncached input tokens, as reported by the provider
+                run_metrics = getattr(consumer.final_response, "metrics", None) or getattr(getattr(agent, "run_response", None), "metrics", None)
+                usage = cache_usage(run_metrics, getattr(agent.model, "provider", ""))
+                if usage.get("input_tokens"):
+                    metadata["prompt_cache"] = usage
+                    totals = st.session_state.setdefault("prompt_cache_totals", {"turns": 0, "input_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0})
+                    totals["turns"] += 1
+                    for key in ("input_tokens", "cached_tokens", "cache_write_tokens"):
+                        totals[key] += usage[key]
 
+        except AdmissionError as e:
+            full_response_content = f"The server is busy ({e}). Please try again in a moment."
+            message_placeholder.warning(full_response_content)
+            metadata["error"] = True
+        except ModelCallError as e:
+            # Retries and failover are already exhausted; the provider error is the useful part
+            full_response_content = f"The model provider failed: {e}"
+            message_placeholder.error(full_response_content)
+            metadata["error"] = True
         except Exception as e:
             # Log the full traceback for better debugging
             import traceback
@@ -234,6 +332,55 @@ def handle_agent_response(agent: Agent, prompt: str, user_id: str, session_id: s
             full_response_content = f"An error occurred: {e}" # Keep user-facing error simpler
             message_placeholder.error(full_response_content)
             metadata["error"] = True
+        finally:
+            if ticket:
+                scheduler.release(ticket)
+            if turn_context_token:
+                reset_turn_context(turn_context_token)
+            reset_knowledge_user(knowledge_user_token)
+            if tool_executor:
+                tool_stats = tool_executor.end_turn()
+                if tool_stats.get("parallel_batches"):
+                    metadata["tool_time_saved"] = tool_stats["time_saved"]
+                    metadata["tool_timeouts"] = tool_stats["timeouts"]
+            if resilient_caller:
+                call_stats = resilient_caller.end_turn()
+                if call_stats.get("retries") or call_stats.get("hedges") or call_stats.get("failover") or call_stats.get("timeouts"):
+                    metadata["resilience"] = call_stats
+            if memory_index:
+                if current_user_id and not metadata.get("error"):
+                    try:
+                        memory_index.sync(current_user_id)  # Index (and merge) memories written this turn
+                    except Exception as e:
+                        logger.warning("Post-turn memory index sync failed: %s", e)
+                retrieval = memory_index.end_turn()
+                if retrieval.get("memories") or retrieval.get("merged"):
+                    metadata["memory_retrieval"] = retrieval
+                    totals = st.session_state.setdefault("memory_retrieval_totals", {"turns": 0, "memories": 0, "included": 0, "tokens_saved": 0, "merged": 0})
+                    totals["turns"] += 1
+                    for key in ("memories", "included", "tokens_saved", "merged"):
+                        totals[key] += retrieval.get(key, 0)
+            if tool_compactor:
+                compaction = tool_compactor.end_turn()
+                if compaction.get("compacted"):
+                    metadata["tool_compaction"] = compaction
+                if compaction.get("results"):
+                    totals = st.session_state.setdefault("tool_compaction_totals", {"turns": 0, "results": 0, "compacted": 0, "tokens_before": 0, "tokens_after": 0, "seconds": 0.0})
+                    totals["turns"] += 1
+                    for key in ("results", "compacted", "tokens_before", "tokens_after", "seconds"):
+                        totals[key] += compaction[key]
+            if context_packer:
+                packing = context_packer.end_turn()
+                if packing.get("searches"):
+                    metadata["context_packing"] = packing
+                    totals = st.session_state.setdefault("context_packing_totals", {"turns": 0, "searches": 0, "chunks": 0, "merged": 0, "tokens_before": 0, "tokens_after": 0, "seconds": 0.0})
+                    totals["turns"] += 1
+                    for key in ("searches", "chunks", "merged", "tokens_before", "tokens_after", "seconds"):
+                        totals[key] += packing[key]
+            if metadata.get("user_memory") and getattr(agent, "memory", None) is not None:
+                get_memory_query(agent.memory).invalidate()  # The turn may have written memories
+            if routing:
+                router.stats.record_turn(routing["tier"], time.perf_counter() - turn_start, error=metadata.get("error", False))
             
     # --- Update Session State --- 
     # Only log minimal debugging info if needed
@@ -247,6 +394,9 @@ def handle_agent_response(agent: Agent, prompt: str, user_id: str, session_id: s
     else:
          st.session_state.messages.append({"role": "assistant", "content": full_response_content, "metadata": metadata})
 
+    # Keep only the most recent messages in server RAM; older ones go to the spill table
+    trim_transcript(_get_transcript_store(agent))
+
 def extract_run_data(run_info):
     """Helper function to extract data from various response object types."""
     data = {}
@@ -402,6 +552,133 @@ def display_debugging_info():
                 with st.expander("Agent Thinking", expanded=False):
                     st.markdown(run_data['thinking'])
 
+def display_transcript_memory(agent: Agent):
+    """Shows how much server memory this session's chat transcript holds."""
+    st.header("Transcript Memory")
+    store = _get_transcript_store(agent)
+    stats = transcript_memory_stats(store)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Hot messages", stats["hot_messages"])
+    col2.metric("Hot size", f"{stats['hot_bytes'] / 1024:.1f} KB")
+    col3.metric("Spilled messages", stats["spilled_messages"])
+    st.caption(
+        f"Metadata: {stats['metadata_bytes'] / 1024:.1f} KB · "
+        f"Earlier messages loaded: {stats['earlier_loaded']} ({stats['earlier_bytes'] / 1024:.1f} KB) · "
+        f"Whole session state: {stats['session_state_bytes'] / 1024:.1f} KB"
+    )
+    with st.expander("Raw Accounting", expanded=False):
+        st.json(stats)
+
+def display_router_stats():
+    """Shows process-wide model routing stats (tier split and per-tier latency)."""
+    st.header("Model Routing")
+    stats = get_router_stats()
+    if not stats["turns"]:
+        st.info("No routed turns yet. Enable Model Routing in the sidebar.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Routed turns", stats["turns"])
+    col2.metric("Sent to small tier", f"{stats['small_share']:.0%}")
+    agreement = stats["classifier_agreement"]
+    col3.metric("Classifier agrees with heuristic", f"{agreement:.0%}" if agreement is not None else "n/a")
+    for tier in ("small", "large"):
+        tier_stats = stats[tier]
+        st.caption(
+            f"**{tier}**: {tier_stats['turns']} turns · {tier_stats['errors']} errors · "
+            f"p50 {tier_stats['p50']:.1f}s · p95 {tier_stats['p95']:.1f}s"
+        )
+    with st.expander("Raw Routing Stats", expanded=False):
+        st.json(stats)
+
+def display_prompt_cache_stats():
+    """Shows this session's cached vs uncached input tokens."""
+    st.header("Prompt Cache")
+    totals = st.session_state.get("prompt_cache_totals")
+    if not totals or not totals["input_tokens"]:
+        st.info("No token usage reported yet. Providers only cache prompts above ~1024 tokens.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Input tokens", f"{totals['input_tokens']:,}")
+    col2.metric("Cached", f"{totals['cached_tokens']:,}")
+    col3.metric("Cache hit rate", f"{totals['cached_tokens'] / totals['input_tokens']:.0%}")
+    st.caption(f"{totals['turns']} turns · {totals['cache_write_tokens']:,} tokens written to cache (Claude)")
+    if not st.session_state.get("stable_prompt"):
+        st.caption("Turn on **Cache-friendly Prompt** in the sidebar to keep the system prompt stable between turns.")
+
+def display_memory_retrieval_stats():
+    """Shows this session's prompt tokens saved by top-k memory retrieval."""
+    st.header("Memory Retrieval")
+    totals = st.session_state.get("memory_retrieval_totals")
+    if not totals or not totals["turns"]:
+        st.info("Turn on **Top-k Memories** in the sidebar to send only the relevant user memories.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Memories per turn", f"{totals['memories'] / totals['turns']:.1f}")
+    col2.metric("Included per turn", f"{totals['included'] / totals['turns']:.1f}")
+    col3.metric("Tokens saved per turn", f"{totals['tokens_saved'] / totals['turns']:,.0f}")
+    st.caption(f"{totals['turns']} turns · {totals['tokens_saved']:,} prompt tokens saved · {totals['merged']} duplicate memories merged")
+
+def display_tool_compaction_stats():
+    """Shows this session's tool result tokens removed before storage and replay."""
+    st.header("Tool Result Compaction")
+    totals = st.session_state.get("tool_compaction_totals")
+    if not totals or not totals["results"]:
+        st.info("Turn on **Compact Tool Results** in the sidebar to shrink large tool outputs.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Results compacted", f"{totals['compacted']}/{totals['results']}")
+    col2.metric("Tokens kept", f"{totals['tokens_after']:,}/{totals['tokens_before']:,}")
+    col3.metric("Compaction time", f"{totals['seconds'] * 1000:.1f} ms")
+    st.caption(f"{totals['turns']} turns with tool calls · every later turn that replays history re-sends the smaller results")
+
+def display_scheduler_stats():
+    """Shows the process-wide turn queue: depth, in-flight turns and admission waits."""
+    st.header("Turn Scheduler")
+    scheduler = get_turn_scheduler()
+    if scheduler is None:
+        st.info("Admission control is off (AGNO_SCHEDULER=0).")
+        return
+    stats = scheduler.snapshot()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Queue depth", stats["queue_depth"], help=f"Peak {stats['peak_queue']}")
+    col2.metric("In flight", f"{stats['in_flight']}/{scheduler.max_in_flight}", help=f"{stats['users_in_flight']} users, at most {scheduler.max_per_user} turns each")
+    col3.metric("Wait p95", f"{stats['wait_p95']:.1f}s", help=f"p50 {stats['wait_p50']:.1f}s · p99 {stats['wait_p99']:.1f}s")
+    st.caption(
+        f"{stats['admitted']} turns admitted · {stats['queued']} waited · {stats['throttled']} rate limited · "
+        f"{stats['rejected']} rejected (queue full) · {stats['timed_out']} timed out"
+    )
+
+def display_job_stats():
+    """Lists this user's background jobs (and shared ones, such as table compaction)."""
+    st.header("Background Jobs")
+    queue = get_job_queue()
+    jobs = queue.jobs(user_id=st.session_state.get("user_id") or None)
+    stats = queue.stats
+    st.caption(
+        f"{stats['submitted']} started · {stats['deduplicated']} duplicate submissions joined a running job · "
+        f"{stats['succeeded']} succeeded · {stats['failed']} failed"
+    )
+    if not jobs:
+        st.info("No background jobs yet. Session summaries, file ingestion and table compaction run here.")
+        return
+    for job in jobs[:20]:
+        _render_job(job)
+
+def display_context_packing_stats():
+    """Shows this session's knowledge context tokens before and after MMR packing."""
+    st.header("Knowledge Context Packing")
+    totals = st.session_state.get("context_packing_totals")
+    if not totals or not totals["searches"]:
+        st.info("Turn on **Pack Knowledge Context** in the sidebar to budget and diversify knowledge results.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Context tokens per turn", f"{totals['tokens_after'] / totals['turns']:,.0f}", delta=f"{(totals['tokens_after'] - totals['tokens_before']) / totals['turns']:,.0f}", delta_color="inverse")
+    col2.metric("Chunks per search", f"{totals['chunks'] / totals['searches']:.1f}")
+    col3.metric("Packing time", f"{totals['seconds'] * 1000 / totals['searches']:.1f} ms/search")
+    st.caption(f"{totals['turns']} turns · {totals['searches']} knowledge searches · {totals['merged']} adjacent chunks merged")
+
 def display_chunk_info():
     """Displays summary information about response chunks."""
     st.header("Chunk Information")
@@ -425,7 +702,7 @@ def display_chunk_info():
             st.markdown(f"**Last Chunk Type:** {chunk_info.get('last_chunk_type', 'Unknown')}")
 
 def display_user_memories(memory: Memory):
-    """Fetches and displays user memories from the Memory object."""
+    """Shows the user's memories one page at a time, searched and sorted in the database."""
     st.header("User Memories")
     user_id = st.session_state.get("user_id", None)
 
@@ -433,52 +710,67 @@ def display_user_memories(memory: Memory):
         st.info("Please enter a User ID in the sidebar to view memories.",)
         return
 
+    memory_query = get_memory_query(memory)
+
     # Add user ID display with refresh button only (clear removed temporarily)
     col1, col2 = st.columns([4, 1])
     with col1:
         st.write(f"Showing memories for User ID: `{user_id}`")
     with col2:
         if st.button("🔄 Refresh", key="refresh_user_memories"):
+            memory_query.invalidate()  # Counts and topics are cached; pick up new/deleted memories
             st.rerun()
-    
+
     try:
+        search_col, topic_col, sort_col, size_col = st.columns([3, 2, 2, 1])
+        search = search_col.text_input("Search", key="memory_search", placeholder="Text in memory...").strip()
+        topics = memory_query.topics(user_id)
+        topic = topic_col.selectbox("Topic", options=["All"] + topics, key="memory_topic")
+        sort = sort_col.selectbox("Sort", options=SORT_ORDERS, key="memory_sort")
+        page_size = size_col.selectbox("Per page", options=[10, 20, 50, 100], index=1, key="memory_page_size")
+
+        # Back to the first page whenever the result set changes
+        filter_key = (user_id, search, topic, sort, page_size)
+        if st.session_state.get("memory_filter_key") != filter_key:
+            st.session_state.memory_filter_key = filter_key
+            st.session_state.memory_page = 0
+
         with st.spinner("Fetching memories..."):
-            user_memories = memory.get_user_memories(user_id=user_id)
-        
-        if user_memories:
-            # Display memories in a more user-friendly format if possible
-            for i, mem in enumerate(user_memories):
-                with st.expander(f"Memory {i+1}", expanded=False):
-                    # Handle string representation of UserMemory objects
-                    if isinstance(mem, str) and "UserMemory" in mem:
-                        # Extract just the memory content from the string representation
-                        try:
-                            memory_content = mem.split('memory="', 1)[1].split('",', 1)[0]
-                            st.markdown(f"**Content:** {memory_content}")
-                        except (IndexError, AttributeError):
-                            st.text(mem)  # Fall back to displaying the raw string
-                    # Handle dictionary format
-                    elif isinstance(mem, dict):
-                        if "ERROR" in mem:
-                            st.error(f"Error retrieving memory: {mem['ERROR'].get('message', 'Unknown error')}")
-                        else:
-                            content = mem.get('content', mem.get('memory', 'N/A'))
-                            score = mem.get('score', 'N/A')
-                            created_at = mem.get('created_at', 'N/A')
-                            
-                            st.markdown(f"**Content:** {content}")
-                            st.markdown(f"**Score:** {score}")
-                            st.markdown(f"**Created:** {created_at}")
-                    else:
-                        # Try to extract memory content for any object
-                        memory_content = getattr(mem, 'memory', str(mem))
-                        st.markdown(f"**Content:** {memory_content}")
-            
-            # Also show as raw format for debugging
-            with st.expander("Raw Memory Data", expanded=False):
-                st.text(str(user_memories))
-        else:
-            st.info("No memories found for this User ID. Chat with the agent with User Memory enabled to create memories.")
+            page = memory_query.page(
+                user_id,
+                page=st.session_state.get("memory_page", 0),
+                page_size=page_size,
+                search=search or None,
+                topic=None if topic == "All" else topic,
+                sort=sort,
+            )
+        st.session_state.memory_page = page.page
+
+        if not page.total:
+            if search or topic != "All":
+                st.info("No memories match the search.")
+            else:
+                st.info("No memories found for this User ID. Chat with the agent with User Memory enabled to create memories.")
+            return
+
+        for offset, record in enumerate(page.records):
+            with st.expander(f"Memory {page.first_index + offset}: {record.memory[:80]}", expanded=False):
+                st.markdown(f"**Content:** {record.memory}")
+                if record.topics:
+                    st.markdown(f"**Topics:** {', '.join(record.topics)}")
+                if record.updated_at:
+                    st.caption(f"Updated {record.updated_at:%Y-%m-%d %H:%M} · ID `{record.memory_id}`")
+
+        prev_col, info_col, next_col = st.columns([1, 3, 1])
+        if prev_col.button("⬅️ Previous", key="memory_prev_page", disabled=page.page == 0):
+            st.session_state.memory_page = page.page - 1
+            st.rerun()
+        info_col.caption(
+            f"{page.first_index}–{page.first_index + len(page.records) - 1} of {page.total} · page {page.page + 1}/{page.pages}"
+        )
+        if next_col.button("Next ➡️", key="memory_next_page", disabled=page.page + 1 >= page.pages):
+            st.session_state.memory_page = page.page + 1
+            st.rerun()
     except Exception as e:
         st.error(f"Could not retrieve memories: {e}")
 
@@ -577,17 +869,18 @@ def display_session_summary(agent: Agent, memory: Memory):
         st.info("Session summary capability is disabled. Enable it in the sidebar under 'Session & Memory Features'.", icon="ℹ️")
         return
 
-    # Button to trigger summary creation/update
-    if st.button("Generate/Update Session Summary", type="primary"):
-        try:
-            with st.spinner("Generating summary..."):
-                # Create session summary using memory
-                memory.create_session_summary(user_id=user_id, session_id=session_id)
-            st.success("Summary generation triggered.")
-            # Rerun to refresh the display below
-            st.rerun()
-        except Exception as e:
-            st.error(f"Could not generate summary: {e}")
+    # Button to trigger summary creation/update; runs as a background job, one per session
+    queue = get_job_queue()
+    running = queue.get(JOB_SUMMARY, user_id, session_id)
+    if st.button("Generate/Update Session Summary", type="primary", disabled=bool(running and running.active)):
+        queue.submit(
+            JOB_SUMMARY,
+            lambda job: memory.create_session_summary(user_id=user_id, session_id=session_id),
+            user_id=user_id,
+            session_id=session_id,
+            label="Session summary",
+        )
+    display_job_status(JOB_SUMMARY, user_id, session_id)
 
     # Display existing summary (if any)
     try:
@@ -645,7 +938,7 @@ def handle_chat_interaction(agent: Agent):
     session_id = st.session_state.get("session_id", "")
 
     # Display chat history first
-    display_chat_history()
+    display_chat_history(_get_transcript_store(agent))
 
     # --- Agent Response Trigger --- 
     # Check if the last message is from the user and trigger response
@@ -865,6 +1158,67 @@ def handle_memories_section(agent: Agent, memory: Memory):
     with memories_tab4:
         display_available_sessions(agent)
 
+def _uploads_digest(uploads) -> str:
+    """Hash of the uploaded files' names and contents; identical uploads share one ingest job."""
+    digest = hashlib.sha256()
+    for upload in sorted(uploads, key=lambda u: u.name):
+        digest.update(upload.name.encode() + b"\0")
+        digest.update(hashlib.sha256(upload.getbuffer()).digest())
+    return digest.hexdigest()[:16]
+
+def display_file_ingestion(lancedb_uri: str):
+    """Uploads PDF/text files and ingests them into a knowledge table as a background job."""
+    user_id = st.session_state.get("user_id", None)
+    with st.expander("Ingest Files", expanded=False):
+        uploads = st.file_uploader("PDF or text files", type=["pdf", "txt", "md"], accept_multiple_files=True, key="ingest_uploads")
+        table_name = st.text_input("Table", value="recipes", key="ingest_table").strip()
+        private = st.checkbox("Private to my User ID", value=False, disabled=not user_id, key="ingest_private")
+        owner = user_id if private else None
+        # Keyed on the files too: only the same upload joins a running job, other uploads get their own
+        resource = f"{table_name}:{_uploads_digest(uploads)}" if uploads and table_name else None
+        running = get_job_queue().get(JOB_INGEST, owner, None, resource) if resource else None
+        if st.button("Ingest", disabled=not resource or bool(running and running.active)):
+            upload_dir = os.path.join(os.path.dirname(os.path.abspath(lancedb_uri)), "uploads", uuid.uuid4().hex)
+            os.makedirs(upload_dir, exist_ok=True)
+            for upload in uploads:
+                with open(os.path.join(upload_dir, os.path.basename(upload.name)), "wb") as f:
+                    f.write(upload.getbuffer())
+
+            def ingest(job: Job):
+                from .ingest import ingest_files # Imported here so the app's cold start doesn't pay for it
+
+                def progress(stats):
+                    job.update(stats["files"] / max(stats["total_files"], 1), f"{stats['chunks']} chunks written")
+
+                try:
+                    stats = ingest_files([upload_dir], table=table_name, user_id=owner, on_progress=progress)
+                finally:
+                    shutil.rmtree(upload_dir, ignore_errors=True)
+                job.update(message=f"{stats['files']} file(s), {stats['chunks']} chunks, {len(stats['errors'])} failed batches")
+                return stats
+
+            job = get_job_queue().submit(JOB_INGEST, ingest, user_id=owner, resource=resource, label=f"Ingest into {table_name}")
+            if job.fn is not ingest: # Another tab is already ingesting these same files
+                shutil.rmtree(upload_dir, ignore_errors=True)
+            st.session_state.ingest_job_key = (owner, resource)
+        # The last job started here stays visible after the uploader is cleared
+        job_key = (owner, resource) if running else st.session_state.get("ingest_job_key")
+        if job_key:
+            display_job_status(JOB_INGEST, job_key[0], None, job_key[1])
+
+def display_table_compaction(table_name: str):
+    """Button that merges a table's small fragments in the background (one job per table)."""
+    running = get_job_queue().get(JOB_COMPACT, resource=table_name)
+    if st.button("Compact Table", key=f"compact_{table_name}", disabled=bool(running and running.active)):
+
+        def compact(job: Job):
+            stats = compact_table(get_vector_db(table_name))
+            job.update(message=f"{stats['fragments_before']} → {stats['fragments_after']} fragments")
+            return stats
+
+        get_job_queue().submit(JOB_COMPACT, compact, resource=table_name, label=f"Compact {table_name}")
+    display_job_status(JOB_COMPACT, resource=table_name)
+
 def display_knowledge_base(lancedb_uri: str):
     """Connects to LanceDB URI, lists all tables, and displays their content."""
     st.header("Knowledge Base Content (LanceDB)")
@@ -873,12 +1227,15 @@ def display_knowledge_base(lancedb_uri: str):
         st.error("LanceDB URI not provided.")
         return
 
+    display_file_ingestion(lancedb_uri)
+
     if not os.path.exists(lancedb_uri):
         st.warning(f"LanceDB directory not found at: `{lancedb_uri}`")
         st.info("Please ensure the directory exists. Run `load_knowledge.py` if needed.")
         return
 
     try:
+        import lancedb # Imported here so the app's cold start doesn't pay for it
         db = lancedb.connect(lancedb_uri)
         table_names = db.table_names()
 
@@ -890,6 +1247,7 @@ def display_knowledge_base(lancedb_uri: str):
 
         for table_name in table_names:
             with st.expander(f"Table: `{table_name}`", expanded=True):
+                display_table_compaction(table_name)
                 try:
                     with st.spinner(f"Fetching data from table: {table_name}..."):
                         table = db.open_table(table_name)
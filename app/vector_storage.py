@@ -0,0 +1,175 @@
+# app/vector_storage.py
+# Compact vector columns for LanceDB knowledge tables.
+#
+# A table can keep its search vectors as float16 (half the bytes of float32) or as int8
+# codes with a per-row scale (a quarter), optionally truncated to their first `dims`
+# dimensions (Matryoshka-style embedders such as text-embedding-3-* are trained so that
+# a prefix of the vector still ranks well). Searches scan only that compact column; the
+# best `limit * RESCORE_FACTOR` candidates are then re-ranked against a float32 copy in
+# `vector_full`, which is read for those rows only (Lance stores columns separately, so
+# the copy costs disk, not scan bandwidth or memory).
+#
+# The layout is recorded in the table schema itself, so readers need no configuration.
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# --- Constants ---
+VECTOR_DTYPES = ("float32", "float16", "int8")
+FULL_VECTOR_COLUMN = "vector_full"   # float32, full dimensions; only read for rescoring
+SCALE_COLUMN = "vector_scale"        # Per-row scale of the int8 codes
+RESCORE_FACTOR = 4                   # Candidates re-ranked at full precision per requested hit
+SCAN_BATCH_ROWS = 32768              # Rows per batch when scanning int8 codes
+
+
+@dataclass(frozen=True)
+class VectorLayout:
+    dtype: str = "float32"
+    dims: Optional[int] = None       # Stored dimensions; None keeps the embedder's
+    keep_full: bool = True           # Keep a float32 copy for rescoring
+
+    def __post_init__(self):
+        if self.dtype not in VECTOR_DTYPES:
+            raise ValueError(f"dtype must be one of {VECTOR_DTYPES}, got {self.dtype!r}")
+
+    @property
+    def compact(self) -> bool:
+        return self.dtype != "float32" or self.dims is not None
+
+
+def _arrow_type(dtype: str):
+    import pyarrow as pa
+    return {"float32": pa.float32(), "float16": pa.float16(), "int8": pa.int8()}[dtype]
+
+
+def vector_fields(full_dims: int, layout: VectorLayout) -> List[Any]:
+    """Arrow fields holding the vectors of a table with this layout."""
+    import pyarrow as pa
+    fields = [pa.field("vector", pa.list_(_arrow_type(layout.dtype), min(layout.dims or full_dims, full_dims)))]
+    if layout.dtype == "int8":
+        fields.append(pa.field(SCALE_COLUMN, pa.float32()))
+    if layout.compact and layout.keep_full:
+        fields.append(pa.field(FULL_VECTOR_COLUMN, pa.list_(pa.float32(), full_dims)))
+    return fields
+
+
+def table_layout(schema: Any) -> VectorLayout:
+    """Reads the layout back from a table schema (plain agno tables are float32)."""
+    import pyarrow as pa
+    vector_type = schema.field("vector").type
+    dtype = {pa.float16(): "float16", pa.int8(): "int8"}.get(vector_type.value_type, "float32")
+    keep_full = FULL_VECTOR_COLUMN in schema.names
+    dims = None
+    if keep_full and vector_type.list_size != schema.field(FULL_VECTOR_COLUMN).type.list_size:
+        dims = vector_type.list_size
+    # A truncated float32 column without a full copy reads as plain; queries are still cut to fit
+    return VectorLayout(dtype=dtype, dims=dims, keep_full=keep_full)
+
+
+def _truncate(vectors: np.ndarray, dims: Optional[int]) -> np.ndarray:
+    """First `dims` dimensions, re-normalised to the original row norms."""
+    if not dims or dims >= vectors.shape[1]:
+        return vectors
+    head = vectors[:, :dims]
+    head_norms = np.linalg.norm(head, axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(head * norms, head_norms, out=np.zeros_like(head), where=head_norms > 0)
+
+
+def encode_vectors(vectors: np.ndarray, layout: VectorLayout, stored_dims: Optional[int] = None) -> Dict[str, Any]:
+    """Arrow columns for `vectors` (n x full dims, float32) in the given layout."""
+    import pyarrow as pa
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    stored = _truncate(vectors, stored_dims or layout.dims)
+    columns: Dict[str, Any] = {}
+    if layout.dtype == "int8":
+        scales = np.abs(stored).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(stored / scales[:, None]), -127, 127).astype(np.int8)
+        columns["vector"] = pa.FixedSizeListArray.from_arrays(pa.array(codes.ravel()), stored.shape[1])
+        columns[SCALE_COLUMN] = pa.array(scales.astype(np.float32))
+    else:
+        values = stored.astype(np.float16 if layout.dtype == "float16" else np.float32)
+        columns["vector"] = pa.FixedSizeListArray.from_arrays(pa.array(values.ravel()), stored.shape[1])
+    if layout.compact and layout.keep_full:
+        columns[FULL_VECTOR_COLUMN] = pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), vectors.shape[1])
+    return columns
+
+
+# --- Search ---
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _scan_int8(table: Any, query: np.ndarray, k: int, where: Optional[str]) -> Dict[str, float]:
+    """Top `k` ids by squared L2 distance to the dequantized int8 vectors, in one streaming pass."""
+    builder = table.search().select(["id", "vector", SCALE_COLUMN]).limit(None)
+    if where:
+        builder = builder.where(where)
+    query_norm = float(query @ query)
+    best_ids: List[str] = []
+    best = np.empty(0, dtype=np.float32)
+    for batch in builder.to_batches(SCAN_BATCH_ROWS):
+        if not batch.num_rows:
+            continue
+        codes = batch.column("vector").flatten().to_numpy().reshape(batch.num_rows, -1).astype(np.float32)
+        scales = batch.column(SCALE_COLUMN).to_numpy(zero_copy_only=False)
+        distances = query_norm + np.einsum("ij,ij->i", codes, codes) * scales * scales - 2.0 * (codes @ query) * scales
+        top = np.argpartition(distances, k - 1)[:k] if len(distances) > k else np.arange(len(distances))
+        ids = batch.column("id").take(top).to_pylist()  # Only the candidates become Python objects
+        best_ids += ids
+        best = np.concatenate([best, distances[top]])
+        if len(best) > k:
+            keep = np.argpartition(best, k - 1)[:k]
+            best_ids, best = [best_ids[i] for i in keep], best[keep]
+    return dict(zip(best_ids, best.tolist()))
+
+
+def search_rows(
+    table: Any,
+    query_embedding: List[float],
+    limit: int,
+    where: Optional[str] = None,
+    nprobes: Optional[int] = None,
+    rescore_factor: int = RESCORE_FACTOR,
+) -> List[Dict[str, Any]]:
+    """Nearest rows (with `payload` and `_distance`, squared L2) for any vector layout."""
+    layout = table_layout(table.schema)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    stored_query = _truncate(query[None, :], table.schema.field("vector").type.list_size)[0]
+    if not layout.compact:
+        builder = table.search(stored_query.tolist(), vector_column_name="vector").limit(limit)
+        if where:
+            builder = builder.where(where, prefilter=True)
+        if nprobes:
+            builder = builder.nprobes(nprobes)
+        return builder.to_list()
+
+    candidates = limit * rescore_factor if layout.keep_full else limit
+    columns = ["id", "payload"] + ([FULL_VECTOR_COLUMN] if layout.keep_full else [])
+    if layout.dtype == "int8":
+        distances = _scan_int8(table, stored_query, candidates, where)
+        if not distances:
+            return []
+        rows = (
+            table.search().where(f"id IN ({', '.join(_quote(i) for i in distances)})")
+            .select(columns).limit(len(distances)).to_list()
+        )
+        for row in rows:
+            row["_distance"] = distances[row["id"]]
+    else:
+        builder = table.search(stored_query.tolist(), vector_column_name="vector").select(columns).limit(candidates)
+        if where:
+            builder = builder.where(where, prefilter=True)
+        if nprobes:
+            builder = builder.nprobes(nprobes)
+        rows = builder.to_list()
+    if layout.keep_full and rows:
+        full = np.asarray([row[FULL_VECTOR_COLUMN] for row in rows], dtype=np.float32)
+        for row, distance in zip(rows, ((full - query) ** 2).sum(axis=1).tolist()):
+            row["_distance"] = distance
+    rows.sort(key=lambda row: row["_distance"])
+    return rows[:limit]
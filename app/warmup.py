@@ -0,0 +1,168 @@
+# app/warmup.py
+# Prewarm hook: builds shared resources before the first user connects.
+#
+# Usage at server start (warms imports, DB tables/files and the OS page cache):
+#   python -m app.warmup && streamlit run main.py
+# Inside the Streamlit server process, main.py also calls start_background_warmup()
+# so the st.cache_resource agents are built while the first user fills in the sidebar.
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .config import get_knowledge_config, get_optional_key_from_env, get_storage_config
+from .storage import create_memory_db, create_storage
+from .vector_storage import search_rows
+from .models import (
+    AVAILABLE_MODELS,
+    DB_FILE,
+    LANCEDB_URI,
+    MEMORY_TABLE_NAME,
+    PROVIDER_DISPLAY_NAMES,
+    STORAGE_TABLE_NAME,
+    get_model_class,
+    get_recipes_vector_db,
+    initialize_agent,
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+PAGE_CACHE_READ_LIMIT = 512 * 1024 * 1024  # Stop prefetching files after this many bytes
+_READ_CHUNK = 1024 * 1024
+
+
+def _touch_files(paths: List[str], limit: int = PAGE_CACHE_READ_LIMIT) -> int:
+    """Reads files sequentially so their pages are resident in the OS page cache."""
+    total = 0
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            while total < limit:
+                chunk = f.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                total += len(chunk)
+    return total
+
+
+def _lancedb_files() -> List[str]:
+    files = []
+    for root, _, names in os.walk(LANCEDB_URI):
+        files.extend(os.path.join(root, name) for name in names)
+    return files
+
+
+def warmup(build_agents: bool = True) -> Dict[str, float]:
+    """Builds shared resources for every provider with a key in the environment.
+
+    Returns the seconds spent per step plus the total under "ready".
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+
+    def step(name: str, fn):
+        step_start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            logger.warning("Warmup step %s failed: %s", name, e)
+        timings[name] = time.perf_counter() - step_start
+
+    config = get_storage_config()
+    providers = [key for key in AVAILABLE_MODELS if get_optional_key_from_env(key)]
+
+    # 1. Provider SDK imports (the slowest part of a cold agent build)
+    for provider_key in providers:
+        step(f"import:{provider_key}", lambda key=provider_key: get_model_class(key))
+
+    # 2. Memory/storage: create the tables (and on SQLite fault the DB file in)
+    def warm_storage():
+        create_memory_db(table_name=MEMORY_TABLE_NAME).create()
+        create_storage(table_name=STORAGE_TABLE_NAME).create()
+        if config["storage_backend"] == "sqlite":
+            _touch_files([DB_FILE])
+    step(config["storage_backend"], warm_storage)
+
+    # 3. Vector DB: open the table; for LanceDB also run one fake retrieval to fault pages in
+    def warm_vector_db():
+        vector_db = get_recipes_vector_db()
+        if config["vector_backend"] != "lancedb":
+            return
+        _touch_files(_lancedb_files())
+        table = getattr(vector_db, "table", None)
+        if table is not None:
+            dimensions = table.schema.field("vector").type.list_size
+            # A zero vector needs no embedder call, so this stays offline (any vector layout)
+            search_rows(table, [0.0] * dimensions, 1)
+    step(config["vector_backend"], warm_vector_db)
+
+    # 4. Agents with the settings a brand-new session starts with (fills st.cache_resource).
+    # st.cache_resource keys on the keyword arguments *as passed*, in order, so this
+    # call must mirror the initialize_agent(...) call in main.py.
+    if build_agents:
+        for provider_key in providers:
+            step(f"agent:{provider_key}", lambda key=provider_key: initialize_agent(
+                provider_name=PROVIDER_DISPLAY_NAMES[key],
+                model_id=AVAILABLE_MODELS[key][0],
+                api_key=get_optional_key_from_env(key),
+                load_chat_history=False,
+                use_user_memory=False,
+                use_session_summary=False,
+                description="",
+                instructions=[],
+                parallel_tool_calls=False,
+                model_routing="off",
+                resilient_calls=False,
+                stable_prompt=False,
+                knowledge_tables=tuple(get_knowledge_config()["tables"]),
+                memory_retrieval=False,
+                compact_tool_results=False,
+                pack_context=False,
+            ))
+
+    timings["ready"] = time.perf_counter() - start
+    return timings
+
+
+class WarmupStatus:
+    """Tracks a background warmup run so the UI can show readiness."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+
+
+_status_lock = threading.Lock()
+_status: Optional[WarmupStatus] = None
+
+
+def start_background_warmup() -> WarmupStatus:
+    """Starts warmup once per process on a daemon thread and returns its status."""
+    global _status
+    with _status_lock:
+        if _status is None:
+            _status = WarmupStatus()
+
+            def run(status: WarmupStatus):
+                try:
+                    status.timings = warmup()
+                except Exception as e:
+                    status.error = str(e)
+                finally:
+                    status.done.set()
+
+            threading.Thread(target=run, args=(_status,), name="app-warmup", daemon=True).start()
+    return _status
+
+
+if __name__ == "__main__":
+    # Agents built here live in this process only; from the CLI the value is in
+    # imports/.pyc caches, created tables and the OS page cache.
+    results = warmup(build_agents=False)
+    for name, seconds in results.items():
+        print(f"{name:<20} {seconds * 1000:8.1f} ms")
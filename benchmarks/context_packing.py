@@ -0,0 +1,161 @@
+# benchmarks/context_packing.py
+# Offline eval of knowledge context packing (app/context_packing.py) against raw top-k.
+#
+# Builds a small recipe corpus (each recipe spans several overlapping chunks, and some
+# recipes appear again, lightly edited, in a second "book"), chunks it with
+# app/ingest.py and embeds it with a local hashed bag-of-words embedder, so no API key
+# is needed. Every eval question asks for one recipe; its reference answer is the
+# recipe's ingredient and method sentences. For each strategy it reports:
+#   - context tokens per turn (what is injected into the prompt)
+#   - answer overlap: share of the reference answer's words present in that context
+#   - packing time per search
+#
+# `--corpus` (PDF/text files or directories) and `--eval` (JSONL lines with "question"
+# and "answer") replace the synthetic corpus and questions.
+#
+# Run from the project root:
+#   python -m benchmarks.context_packing --recipes 60 --questions 100
+#   python -m benchmarks.context_packing --k 10 --chunk-size 1000 --overlap 200
+#   python -m benchmarks.context_packing --corpus docs/ --eval eval.jsonl
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.context_packing import MODEL_CONTEXT_BUDGETS, ContextPacker
+from app.ingest import chunk_pages, iter_pages
+from app.knowledge import TableHit, fuse_hits
+from app.memory_index import estimate_tokens
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_INGREDIENTS = (
+    "coconut milk, galangal, lemongrass, kaffir lime leaves, bird's eye chili, fish sauce, palm sugar, shallots, "
+    "garlic, tamarind paste, rice noodles, thai basil, coriander root, shrimp paste, chicken thighs, prawns, tofu, "
+    "bean sprouts, peanuts, cucumber, lime juice, jasmine rice, pork belly, eggplant, bamboo shoots"
+).split(", ")
+_DISHES = "green red yellow massaman panang jungle khao soi larb tom yum tom kha pad thai pad see ew satay".split()
+_METHODS = (
+    "Pound the {a} and {b} to a smooth paste.", "Fry the paste in the {a} until fragrant.",
+    "Add the {a} and simmer for {n} minutes.", "Season with {a} and {b} to taste.",
+    "Stir in the {a} just before serving.", "Toast the {a} in a dry pan for {n} minutes.",
+    "Marinate the {a} with {b} for {n} minutes.", "Serve with {a} and a wedge of lime.",
+)
+_FILLER = (
+    "This dish is popular across the region and every family has its own version. "
+    "Street vendors often prepare it in large batches early in the morning. "
+    "Leftovers keep well in the refrigerator for two days. "
+)
+
+
+def embed(texts: List[str], dims: int = 512) -> np.ndarray:
+    """Hashed unigrams + bigrams, L2-normalised: a deterministic stand-in for a real embedder."""
+    vectors = np.zeros((len(texts), dims), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _WORD_RE.findall(text.lower())
+        for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), "little")
+            vectors[row, digest % dims] += 1.0 if digest >> 63 else -1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def synthetic_corpus(recipes: int, seed: int) -> Tuple[List[Tuple[str, int, str]], List[Dict[str, str]]]:
+    """Pages of two recipe books (the second repeats a third of the first, edited) and one eval item per recipe."""
+    rng = random.Random(seed)
+    pages, items = [], []
+    for i in range(recipes):
+        dish = f"{rng.choice(_DISHES)} {rng.choice(['chicken', 'prawn', 'pork', 'tofu', 'beef', 'duck'])} {rng.choice(['curry', 'soup', 'salad', 'stir fry'])} no. {i}"
+        ingredients = rng.sample(_INGREDIENTS, 7)
+        steps = [rng.choice(_METHODS).format(a=rng.choice(ingredients), b=rng.choice(ingredients), n=rng.randint(2, 30)) for _ in range(6)]
+        answer = f"Ingredients for {dish}: {', '.join(ingredients)}. " + " ".join(steps)
+        text = f"{dish.title()}\n{_FILLER}{answer} {_FILLER}"
+        pages.append(("book_one.pdf", i + 1, text))
+        if i % 3 == 0:
+            pages.append(("book_two.pdf", i + 1, "From our kitchen: " + text.replace("to taste", "to your taste")))
+        items.append({"question": f"What are the ingredients and steps for {dish}?", "answer": answer})
+    pages.sort(key=lambda page: page[0])  # One book after the other, as files are read
+    return pages, items
+
+
+def load_eval(path: str) -> List[Dict[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def answer_overlap(context: str, answer: str) -> float:
+    answer_words = _WORD_RE.findall(answer.lower())
+    context_words = set(_WORD_RE.findall(context.lower()))
+    return sum(word in context_words for word in answer_words) / max(len(answer_words), 1)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Knowledge context packing offline eval")
+    parser.add_argument("--corpus", nargs="*", help="PDF/text files or directories (default: synthetic recipes)")
+    parser.add_argument("--eval", help="JSONL eval set with question/answer (required with --corpus)")
+    parser.add_argument("--recipes", type=int, default=60)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5, help="Documents per search (agno num_documents)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=100)
+    parser.add_argument("--mmr-lambda", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    if args.corpus:
+        if not args.eval:
+            parser.error("--corpus needs --eval")
+        pages, items = iter_pages(args.corpus), load_eval(args.eval)
+    else:
+        pages, items = synthetic_corpus(args.recipes, args.seed)
+    chunks = list(chunk_pages(pages, args.chunk_size, args.overlap))
+    vectors = embed([chunk["content"] for chunk in chunks])
+    items = random.Random(args.seed).sample(items, min(args.questions, len(items)))
+    print(f"{len(chunks)} chunks, {len(items)} questions, k={args.k}")
+
+    def search(query: str, limit: int) -> List[TableHit]:
+        distances = ((vectors - embed([query])[0]) ** 2).sum(axis=1)
+        top = np.argsort(distances)[:limit]
+        hits = [
+            TableHit("recipes", rank, float(distances[i]), chunks[i]["name"], chunks[i]["content"], chunks[i]["meta_data"], None, vectors[i])
+            for rank, i in enumerate(top)
+        ]
+        return fuse_hits([hits], limit)  # As MultiTableSearch returns them
+
+    budgets = sorted({budget for _, budget in MODEL_CONTEXT_BUDGETS} | {3000})
+    strategies = {"top-k (raw)": None}
+    for budget in budgets:
+        strategies[f"mmr {budget}"] = ContextPacker(budget_tokens=budget, mmr_lambda=args.mmr_lambda)
+    strategies["relevance only 1200"] = ContextPacker(budget_tokens=1200, mmr_lambda=1.0, merge=False)
+
+    print(f"{'strategy':<22} {'tokens/turn':>12} {'overlap':>8} {'chunks':>7} {'merged':>7} {'pack ms':>8}")
+    for label, packer in strategies.items():
+        tokens, overlaps, counts, merged, seconds = [], [], [], 0, 0.0
+        for item in items:
+            if packer is None:
+                picked = search(item["question"], args.k)
+            else:
+                candidates = search(item["question"], args.k * packer.candidate_factor)
+                start = time.perf_counter()
+                picked, stats = packer.pack(candidates, args.k)
+                seconds += time.perf_counter() - start
+                merged += stats["merged"]
+            context = "\n\n".join(hit.content for hit in picked)
+            tokens.append(sum(estimate_tokens(hit.content) for hit in picked))
+            overlaps.append(answer_overlap(context, item["answer"]))
+            counts.append(len(picked))
+        print(
+            f"{label:<22} {np.mean(tokens):>12.0f} {np.mean(overlaps):>8.1%} {np.mean(counts):>7.1f} "
+            f"{merged / len(items):>7.2f} {seconds * 1000 / len(items):>8.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# benchmarks/embedders.py
+# Query-embedding latency and ingestion throughput: local CPU embedder (app/embedders.py)
+# vs the remote embeddings API, played by MockLLMServer's /v1/embeddings.
+#
+# The remote embedder is agno's OpenAIEmbedder pointed at the mock, which charges
+# `--latency` seconds per request (network round trip + provider queue). Ingestion
+# embeds chunks the way app/knowledge.write_documents does: `--batch-size` chunks per
+# write, one batched call for the local embedder, one request per chunk otherwise.
+# Without `--model` a hashed numpy table is built in a temporary directory.
+#
+# Run from the project root:
+#   python -m benchmarks.embedders --queries 200 --chunks 2000 --latency 0.05
+#   python -m benchmarks.embedders --model models/minilm-onnx --workers 4
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from app.embedders import LocalEmbedder, build_hashed_model
+from app.fakes import MockLLMServer
+from app.knowledge import embed_documents
+from app.utils import percentile
+
+WORDS = (
+    "coconut milk galangal lemongrass lime leaves chili fish sauce palm sugar shallots garlic simmer stir "
+    "fry pound paste serve rice noodles basil coriander tamarind broth chicken prawns curry soup salad"
+).split()
+
+
+def sample_texts(count: int, words: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+def run(embedder: Any, queries: List[str], chunks: List[str], batch_size: int) -> Dict[str, float]:
+    from agno.document import Document
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embedder.get_embedding(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(chunks), batch_size):
+        embed_documents(embedder, [Document(content=text) for text in chunks[i:i + batch_size]])
+    seconds = time.perf_counter() - start
+    return {
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "chunks_per_second": len(chunks) / seconds if seconds else 0.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Local vs remote embedder benchmark")
+    parser.add_argument("--queries", type=int, default=200, help="Query embeddings timed one by one")
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks embedded for the throughput run")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per write (and per local inference call)")
+    parser.add_argument("--workers", type=int, default=2, help="Local inference threads")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock remote latency per request (s)")
+    parser.add_argument("--model", help="Local model: .npz file or ONNX directory (default: temporary hashed table)")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    from agno.embedder.openai import OpenAIEmbedder
+
+    queries = sample_texts(args.queries, 12, args.seed)
+    chunks = sample_texts(args.chunks, 90, args.seed + 1)  # ~500 characters, like app/ingest.py chunks
+
+    with tempfile.TemporaryDirectory() as tmp, MockLLMServer(first_token_latency=args.latency, token_latency=0.0) as server:
+        model_path = args.model or build_hashed_model(os.path.join(tmp, "embedder.npz"))
+        embedders = {
+            "remote (mock)": OpenAIEmbedder(id="text-embedding-3-small", api_key="mock", base_url=server.base_url),
+            "local": LocalEmbedder(model_path=model_path, batch_size=args.batch_size, workers=args.workers),
+        }
+        print(f"{args.queries} queries, {args.chunks} chunks, mock latency {args.latency * 1000:.0f} ms, local model {os.path.basename(model_path)}")
+        print(f"{'embedder':<14} {'query p50 ms':>13} {'query p99 ms':>13} {'ingest chunks/s':>16}")
+        for label, embedder in embedders.items():
+            result = run(embedder, queries, chunks, args.batch_size)
+            print(f"{label:<14} {result['p50'] * 1000:>13.2f} {result['p99'] * 1000:>13.2f} {result['chunks_per_second']:>16.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# benchmarks/http_pool.py
+# Connection reuse: per-model SDK clients vs the shared per-provider pool (app/http_pool.py).
+#
+# Each "turn" makes what an agent turn makes: one main-model request followed by one
+# memory-model request. The MockLLMServer charges `--connect-latency` for every new
+# connection, standing in for the TCP + TLS handshake to a real provider.
+#
+# Run from the project root:
+#   python -m benchmarks.http_pool --turns 50 --users 4 --connect-latency 0.05
+
+import argparse
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from app.fakes import MockLLMServer
+from app.utils import percentile
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+def run_turns(make_clients: Callable[[], Tuple], users: int, turns: int) -> List[float]:
+    """Runs `turns` turns for each of `users` threads; returns per-turn latencies."""
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def user() -> None:
+        local = []
+        for _ in range(turns):
+            start = time.perf_counter()
+            main_client, memory_client = make_clients()
+            main_client.chat.completions.create(model="gpt-4.1-mini", messages=MESSAGES)
+            memory_client.chat.completions.create(model="gpt-4.1-nano", messages=MESSAGES)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=user) for _ in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Provider HTTP connection pooling benchmark")
+    parser.add_argument("--turns", type=int, default=30, help="Turns per user")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent users")
+    parser.add_argument("--connect-latency", type=float, default=0.05, help="Simulated handshake cost (s)")
+    parser.add_argument("--first-token-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    from openai import OpenAI
+
+    from app.http_pool import close_http_clients, get_http_client
+
+    server = MockLLMServer(first_token_latency=args.first_token_latency, token_latency=0.0, connect_latency=args.connect_latency).start()
+
+    def sdk_client(**kwargs) -> "OpenAI":
+        return OpenAI(api_key="mock-key", base_url=server.base_url, max_retries=0, **kwargs)
+
+    # Each agent cache miss: fresh main + memory clients, nothing reused
+    def fresh_clients():
+        return sdk_client(), sdk_client()
+
+    # Cached agents, but main and memory models each own a pool (the old behaviour)
+    separate = threading.local()
+
+    def separate_clients():
+        if not hasattr(separate, "clients"):
+            separate.clients = (sdk_client(), sdk_client())
+        return separate.clients
+
+    # One pooled httpx client per provider, shared by every model instance
+    def shared_clients():
+        client = sdk_client(http_client=get_http_client("openai"))
+        return client, client
+
+    scenarios: Dict[str, Callable[[], Tuple]] = {
+        "fresh clients per turn": fresh_clients,
+        "per-model clients": separate_clients,
+        "shared provider pool": shared_clients,
+    }
+
+    print(f"{args.users} user(s) x {args.turns} turns, 2 requests per turn, {args.connect_latency * 1000:.0f} ms per new connection")
+    print(f"{'scenario':<24} {'connections':>11} {'p50 ms':>8} {'p95 ms':>8} {'total s':>8}")
+    for name, make_clients in scenarios.items():
+        connections_before = server.connections
+        start = time.perf_counter()
+        latencies = run_turns(make_clients, args.users, args.turns)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<24} {server.connections - connections_before:>11} "
+            f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} {elapsed:>8.2f}"
+        )
+
+    close_http_clients()
+    server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# benchmarks/import_time.py
+# Cold-start import benchmark based on `python -X importtime`.
+#
+# Run from the project root:
+#   python -m benchmarks.import_time                      # app.models and app.ui
+#   python -m benchmarks.import_time --budget-ms 1500     # exit 1 if any module exceeds the budget
+#   python -m benchmarks.import_time --json >> tmp/import_times.jsonl   # track over time
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+DEFAULT_MODULES = ["app.models", "app.ui"]
+# Modules the app should NOT pay for at import time (loaded lazily on first use)
+LAZY_MODULES = ["lancedb", "openai", "anthropic", "google.genai", "duckduckgo_search"]
+
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str, runs: int) -> Dict:
+    """Imports `module` in fresh interpreters and returns the best run's timings."""
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=os.getcwd(),
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+        entries: List[Tuple[str, int, int]] = []  # (name, self_us, cumulative_us)
+        for line in proc.stderr.splitlines():
+            match = _LINE_RE.match(line)
+            if match:
+                self_us, cumulative_us, _, name = match.groups()
+                entries.append((name, int(self_us), int(cumulative_us)))
+
+        total_us = next((cum for name, _, cum in entries if name == module), 0)
+        if best is None or total_us < best["total_us"]:
+            loaded = {name for name, _, _ in entries}
+            best = {
+                "module": module,
+                "total_us": total_us,
+                "top": sorted(entries, key=lambda e: e[2], reverse=True)[:15],
+                "eagerly_loaded": [m for m in LAZY_MODULES if m in loaded],
+            }
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cold-start import time benchmark")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module (best is kept)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if a module exceeds this")
+    parser.add_argument("--json", action="store_true", help="Emit one JSON line instead of a table")
+    args = parser.parse_args()
+
+    results = [measure(module, args.runs) for module in args.modules]
+
+    if args.json:
+        print(json.dumps({
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "results": [{k: v for k, v in r.items() if k != "top"} for r in results],
+        }))
+    else:
+        for result in results:
+            print(f"\n{result['module']}: {result['total_us'] / 1000:.1f} ms cumulative")
+            if result["eagerly_loaded"]:
+                print(f"  WARNING: loaded at import time: {', '.join(result['eagerly_loaded'])}")
+            print(f"  {'cumulative ms':>14}  {'self ms':>8}  module")
+            for name, self_us, cumulative_us in result["top"]:
+                print(f"  {cumulative_us / 1000:>14.1f}  {self_us / 1000:>8.1f}  {name}")
+
+    if args.budget_ms is not None:
+        over = [r for r in results if r["total_us"] / 1000 > args.budget_ms]
+        if over:
+            print(f"\nOver budget ({args.budget_ms} ms): {', '.join(r['module'] for r in over)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
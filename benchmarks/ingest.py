@@ -0,0 +1,87 @@
+# benchmarks/ingest.py
+# Peak memory of streaming ingestion (app/ingest.py) vs loading whole documents first.
+#
+# Generates local text-only PDFs (app.fakes.write_sample_pdf) for growing corpus sizes and
+# ingests each corpus in a fresh process, once with the streaming pipeline and once the
+# eager way (every page of every file read, then chunked, then written). The writer is a
+# NullWriter with a delay standing in for embedding + vector DB insert.
+#
+# Run from the project root (needs pypdf):
+#   python -m benchmarks.ingest --files 2 8 32 --pages 100
+
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict
+
+from app.fakes import write_sample_pdf
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def ingest_once(mode: str, corpus_dir: str, write_delay: float, results: "mp.Queue") -> None:
+    from app.ingest import BATCH_SIZE, IngestPipeline, NullWriter, batched, chunk_pages, iter_pages
+
+    import pypdf  # noqa: F401  (imported before the baseline so it isn't counted)
+
+    baseline = _peak_rss_mb()
+    writer = NullWriter(delay=write_delay)
+    start = time.perf_counter()
+    if mode == "streaming":
+        stats = IngestPipeline(writer).run([corpus_dir])
+        chunks = stats["chunks"]
+    else:
+        pages = list(iter_pages([corpus_dir]))        # Whole corpus in memory
+        chunk_list = list(chunk_pages(pages))
+        for batch in batched(chunk_list, BATCH_SIZE):
+            writer(batch)
+        chunks = len(chunk_list)
+    results.put({"seconds": time.perf_counter() - start, "chunks": chunks, "peak_delta_mb": _peak_rss_mb() - baseline})
+
+
+def run_isolated(mode: str, corpus_dir: str, write_delay: float) -> Dict[str, float]:
+    ctx = mp.get_context("spawn")  # Fresh process per run, so peak RSS isn't carried over
+    results = ctx.Queue()
+    proc = ctx.Process(target=ingest_once, args=(mode, corpus_dir, write_delay, results))
+    proc.start()
+    result = results.get()
+    proc.join()
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Streaming vs eager PDF ingestion memory benchmark")
+    parser.add_argument("--files", type=int, nargs="+", default=[2, 8, 32], help="Corpus sizes (number of PDFs)")
+    parser.add_argument("--pages", type=int, default=100, help="Pages per PDF")
+    parser.add_argument("--write-delay", type=float, default=0.002, help="Simulated embed+write time per batch (s)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="agno_ingest_")
+    try:
+        print(f"{args.pages} pages per PDF, write delay {args.write_delay * 1000:.0f} ms per batch")
+        print(f"{'files':>6} {'size MB':>8} {'mode':>10} {'chunks':>8} {'seconds':>8} {'peak +MB':>9}")
+        for num_files in args.files:
+            corpus_dir = os.path.join(workdir, f"corpus_{num_files}")
+            os.makedirs(corpus_dir)
+            for i in range(num_files):
+                write_sample_pdf(os.path.join(corpus_dir, f"doc_{i:04d}.pdf"), pages=args.pages, seed=i)
+            size_mb = sum(os.path.getsize(os.path.join(corpus_dir, name)) for name in os.listdir(corpus_dir)) / 1e6
+            for mode in ("streaming", "eager"):
+                result = run_isolated(mode, corpus_dir, args.write_delay)
+                print(f"{num_files:>6} {size_mb:>8.1f} {mode:>10} {result['chunks']:>8} {result['seconds']:>8.2f} {result['peak_delta_mb']:>9.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# benchmarks/knowledge_fanout.py
+# Latency of multi-table knowledge search (app/knowledge.py): concurrent fan-out vs querying tables in turn.
+#
+# Builds local LanceDB tables of synthetic documents in a temp directory, embedded with a
+# deterministic hashing embedder (no API key or network), then runs the same queries
+# through MultiTableSearch.search() and search_sequential() and checks both return the
+# same fused results.
+#
+# Run from the project root:
+#   python -m benchmarks.knowledge_fanout --tables 2 4 8 --rows 20000 --queries 200
+
+import argparse
+import hashlib
+import math
+import random
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import List
+
+from agno.document import Document
+from agno.embedder.base import Embedder
+from agno.vectordb.lancedb import LanceDb
+
+from app.knowledge import MultiTableSearch
+from app.utils import percentile
+
+WORDS = [
+    "basil", "chili", "coconut", "curry", "fish", "galangal", "garlic", "ginger", "jasmine", "lemongrass",
+    "lime", "mango", "noodle", "palm", "peanut", "pork", "rice", "shallot", "shrimp", "soup",
+    "soy", "sticky", "sugar", "tamarind", "tofu", "agent", "memory", "session", "vector", "table",
+    "stream", "token", "model", "prompt", "search", "tool", "cache", "index", "latency", "query",
+]
+
+
+@dataclass
+class HashEmbedder(Embedder):
+    """Bag of hashed words, L2-normalised; deterministic and free."""
+
+    dimensions: int = 256
+
+    def get_embedding(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def get_embedding_and_usage(self, text: str):
+        return self.get_embedding(text), None
+
+
+def build_table(uri: str, name: str, rows: int, rng: random.Random, embedder: Embedder) -> LanceDb:
+    vector_db = LanceDb(table_name=name, uri=uri, embedder=embedder)
+    vector_db.create()
+    batch = []
+    for i in range(rows):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))
+        batch.append(Document(name=f"{name}-{i}", content=f"{name} {i}: {text}"))
+        if len(batch) == 1000:
+            vector_db.insert(documents=batch)
+            batch = []
+    if batch:
+        vector_db.insert(documents=batch)
+    return vector_db
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Multi-table knowledge search fan-out benchmark")
+    parser.add_argument("--tables", type=int, nargs="+", default=[2, 4, 8], help="Table counts to compare")
+    parser.add_argument("--rows", type=int, default=20000, help="Documents per table")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5, help="Documents returned per search")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    embedder = HashEmbedder()
+    uri = tempfile.mkdtemp(prefix="agno_knowledge_")
+    try:
+        print(f"Building {max(args.tables)} tables x {args.rows} rows in {uri} ...")
+        start = time.perf_counter()
+        vector_dbs = {f"table_{i}": build_table(uri, f"table_{i}", args.rows, rng, embedder) for i in range(max(args.tables))}
+        print(f"Built in {time.perf_counter() - start:.1f}s")
+        queries = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))) for _ in range(args.queries)]
+
+        print(f"{'tables':>6} {'mode':>11} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+        for num_tables in args.tables:
+            search = MultiTableSearch({name: vector_dbs[name] for name in list(vector_dbs)[:num_tables]})
+            search.search(queries[0], args.limit)  # Open files / warm the pool before timing
+            timings = {"sequential": [], "concurrent": []}
+            mismatches = 0
+            for query in queries:
+                t0 = time.perf_counter()
+                sequential = search.search_sequential(query, args.limit)
+                t1 = time.perf_counter()
+                concurrent = search.search(query, args.limit)
+                t2 = time.perf_counter()
+                timings["sequential"].append(t1 - t0)
+                timings["concurrent"].append(t2 - t1)
+                mismatches += [hit.content for hit in sequential] != [hit.content for hit in concurrent]
+            for mode, values in timings.items():
+                print(
+                    f"{num_tables:>6} {mode:>11} {percentile(values, 50) * 1000:>8.1f} "
+                    f"{percentile(values, 95) * 1000:>8.1f} {sum(values) / len(values) * 1000:>8.1f}"
+                )
+            if mismatches:
+                print(f"       {mismatches} queries fused differently (ties in distance)")
+    finally:
+        shutil.rmtree(uri, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# benchmarks/knowledge_filters.py
+# Knowledge search latency with and without metadata filters (app/knowledge.py) on a large LanceDB table.
+#
+# Writes a synthetic table (random vectors, agno-style payload, and the source / user_id /
+# created_at metadata columns) to a temp directory, then times the same queries:
+#   - unfiltered vector search
+#   - filters pushed down as a `where` pre-filter, before and after building scalar indexes
+#   - the old approach: rank the whole table, then drop non-matching hits in Python
+#     (reports how many of the k requested hits survive)
+#
+# Run from the project root (needs lancedb, pyarrow, numpy):
+#   python -m benchmarks.knowledge_filters --rows 1000000 --queries 50
+#   python -m benchmarks.knowledge_filters --rows 1000000 --ann      # with an IVF_PQ vector index
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+
+from app.knowledge import _matches, create_metadata_indexes, search_table
+from app.utils import percentile
+
+DAY = 24 * 3600
+
+
+def build_table(uri: str, rows: int, dim: int, sources: int, users: int, batch: int, seed: int):
+    rng = np.random.default_rng(seed)
+    now = int(time.time())
+    db = lancedb.connect(uri)
+    table = None
+    for start in range(0, rows, batch):
+        n = min(batch, rows - start)
+        source_ids = rng.integers(0, sources, n)
+        # Half the chunks are public, the rest private to one of `users` users
+        user_ids = np.where(rng.random(n) < 0.5, -1, rng.integers(0, users, n))
+        created = now - rng.integers(0, 365 * DAY, n)
+        data = pa.table({
+            "id": [f"{start + i}" for i in range(n)],
+            "vector": pa.FixedSizeListArray.from_arrays(pa.array(rng.standard_normal(n * dim, dtype=np.float32)), dim),
+            "payload": [
+                json.dumps({"name": f"doc_{s}", "content": f"chunk {start + i}", "meta_data": {"source": f"doc_{s}.pdf"}, "usage": None})
+                for i, s in enumerate(source_ids)
+            ],
+            "source": [f"doc_{s}.pdf" for s in source_ids],
+            "user_id": [None if u < 0 else f"user_{u}" for u in user_ids],
+            "created_at": pa.array(created, pa.int64()),
+        })
+        if table is None:
+            table = db.create_table("chunks", data)
+        else:
+            table.add(data)
+    return table
+
+
+def time_queries(fn, queries):
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        timings.append(time.perf_counter() - start)
+    return timings, results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Knowledge search metadata filter pushdown benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--sources", type=int, default=1000, help="Distinct source documents")
+    parser.add_argument("--users", type=int, default=1000, help="Distinct owners of private chunks")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--ann", action="store_true", help="Build an IVF_PQ vector index first")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    uri = tempfile.mkdtemp(prefix="agno_filters_")
+    try:
+        start = time.perf_counter()
+        table = build_table(uri, args.rows, args.dim, args.sources, args.users, 100_000, args.seed)
+        print(f"Wrote {args.rows} rows in {time.perf_counter() - start:.1f}s")
+        if args.ann:
+            start = time.perf_counter()
+            table.create_index(metric="cosine", vector_column_name="vector")
+            print(f"IVF_PQ index built in {time.perf_counter() - start:.1f}s")
+
+        vector_db = SimpleNamespace(table=table)
+        rng = np.random.default_rng(args.seed + 1)
+        queries = [rng.standard_normal(args.dim, dtype=np.float32).tolist() for _ in range(args.queries)]
+        scenarios = {
+            "no filter": {},
+            "source (0.1%)": {"source": "doc_7.pdf"},
+            "visible_to user": {"visible_to": "user_7"},
+            "last 7 days": {"created_after": int(time.time()) - 7 * DAY},
+            "source + user": {"source": "doc_7.pdf", "visible_to": "user_7"},
+        }
+
+        def pushdown(filters):
+            return lambda q: search_table("chunks", vector_db, "", q, args.limit, filters)
+
+        def postfilter(filters):
+            # Rank without filters, then drop non-matching hits in Python (what agno's LanceDb does)
+            def run(q):
+                return [hit for hit in search_table("chunks", vector_db, "", q, args.limit) if _matches(hit.meta_data, filters)]
+            return run
+
+        print(f"{'scenario':<18} {'mode':<18} {'p50 ms':>8} {'p95 ms':>8} {'hits/k':>7}")
+
+        def report(name, mode, timings, results):
+            hits = sum(len(r) for r in results) / (len(results) * args.limit)
+            print(f"{name:<18} {mode:<18} {percentile(timings, 50) * 1000:>8.1f} {percentile(timings, 95) * 1000:>8.1f} {hits:>7.0%}")
+
+        for name, filters in scenarios.items():
+            if list(filters) == ["source"]:  # The payload only carries `source` for the Python filter
+                report(name, "post-filter", *time_queries(postfilter(filters), queries))
+            report(name, "pre-filter", *time_queries(pushdown(filters), queries))
+
+        start = time.perf_counter()
+        create_metadata_indexes(vector_db)
+        print(f"Scalar indexes built in {time.perf_counter() - start:.1f}s")
+        for name, filters in scenarios.items():
+            if filters:
+                report(name, "pre-filter+index", *time_queries(pushdown(filters), queries))
+    finally:
+        shutil.rmtree(uri, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
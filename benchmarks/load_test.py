@@ -0,0 +1,163 @@
+# benchmarks/load_test.py
+# Headless multi-user load generator for the Streamlit app.
+#
+# Each virtual user drives its own `streamlit.testing.v1.AppTest` session of main.py
+# with a distinct user_id/session_id, clicking through SEQUENTIAL_PROMPTS. All users
+# share this process (and so st.cache_resource, SQLite and LanceDB), like browser tabs
+# on one server. The model is the local MockLLMServer, so no API keys or network needed.
+#
+# Run from the project root:
+#   python -m benchmarks.load_test --users 20 --rounds 2 --first-token-latency 0.2
+
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from app.fakes import MockLLMServer
+from app.utils import percentile
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+# --- SQLite contention probes ---
+class SqliteProbe:
+    """Times every SQL statement via SQLAlchemy events and counts 'database is locked' errors."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.write_times: List[float] = []
+        self.read_times: List[float] = []
+        self.lock_errors = 0
+        self._starts = threading.local()
+
+    def install(self) -> None:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        @event.listens_for(Engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            self._starts.t = time.perf_counter()
+
+        @event.listens_for(Engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - getattr(self._starts, "t", time.perf_counter())
+            is_write = statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE", "REPLAC")
+            with self.lock:
+                (self.write_times if is_write else self.read_times).append(elapsed)
+
+        @event.listens_for(Engine, "handle_error")
+        def on_error(context):
+            if "database is locked" in str(context.original_exception):
+                with self.lock:
+                    self.lock_errors += 1
+
+
+def rss_mb() -> Dict[str, float]:
+    """Current and peak resident set size of this process in MB."""
+    current = 0.0
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return {"current": current, "peak": peak_mb}
+
+
+# --- Virtual users ---
+def virtual_user(index: int, rounds: int, prompts: List[str], timeout: float, latencies: List[float], errors: List[str], lock: threading.Lock) -> None:
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    try:
+        at.run()
+        at.text_input(key="user_id_input").set_value(f"vu_{index:03d}").run()
+        for round_num in range(rounds):
+            at.text_input(key="session_id_input").set_value(f"load_session_{index:03d}_{round_num}").run()
+            at.session_state["messages"] = []
+            at.session_state["completed_steps"] = []
+            for step in range(1, len(prompts) + 1):
+                start = time.perf_counter()
+                at.button(key=f"seq_prompt_{step}").click().run()
+                elapsed = time.perf_counter() - start
+                if at.exception:
+                    raise RuntimeError(at.exception[0].message)
+                with lock:
+                    latencies.append(elapsed)
+    except Exception as e:
+        with lock:
+            errors.append(f"vu_{index:03d}: {e}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Headless multi-user load generator")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--rounds", type=int, default=1, help="Conversations per user")
+    parser.add_argument("--first-token-latency", type=float, default=0.1)
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per script run timeout (s)")
+    parser.add_argument("--workdir", default=None, help="Where tmp/ DBs go (default: a fresh temp dir)")
+    args = parser.parse_args()
+
+    server = MockLLMServer(first_token_latency=args.first_token_latency, token_latency=args.token_latency).start()
+    # Must be set before the app reads its config; the OpenAI SDK honours OPENAI_BASE_URL
+    os.environ["OPENAI_API_KEY"] = "mock-key"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="agno_load_")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)  # DB paths (tmp/...) are relative to the working directory
+
+    probe = SqliteProbe()
+    probe.install()
+
+    from app.prompts import SEQUENTIAL_PROMPTS
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    rss_before = rss_mb()
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=virtual_user, args=(i, args.rounds, SEQUENTIAL_PROMPTS, args.timeout, latencies, errors, lock))
+        for i in range(args.users)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    rss_after = rss_mb()
+    server.stop()
+
+    turns = len(latencies)
+    print(f"Virtual users:      {args.users} x {args.rounds} conversation(s) of {len(SEQUENTIAL_PROMPTS)} turns")
+    print(f"Completed turns:    {turns} in {elapsed:.1f}s  ->  {turns / elapsed if elapsed else 0:.2f} turns/s")
+    print(f"Turn latency (s):   p50 {percentile(latencies, 50):.2f}  p90 {percentile(latencies, 90):.2f}  p99 {percentile(latencies, 99):.2f}  max {max(latencies, default=0):.2f}")
+    print(f"Model requests:     {server.requests} over {server.connections} connection(s)")
+    print(f"SQLite writes:      {len(probe.write_times)}  p50 {percentile(probe.write_times, 50) * 1000:.1f} ms  p99 {percentile(probe.write_times, 99) * 1000:.1f} ms  max {max(probe.write_times, default=0) * 1000:.1f} ms")
+    print(f"SQLite reads:       {len(probe.read_times)}  p99 {percentile(probe.read_times, 99) * 1000:.1f} ms")
+    print(f"SQLite lock errors: {probe.lock_errors}")
+    print(f"Process RSS (MB):   {rss_before['current']:.0f} -> {rss_after['current']:.0f}  (peak {rss_after['peak']:.0f})")
+    if errors:
+        print(f"\n{len(errors)} virtual user(s) failed:")
+        for error in errors[:10]:
+            print(f"  {error}")
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
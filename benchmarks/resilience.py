@@ -0,0 +1,149 @@
+# benchmarks/resilience.py
+# Tail latency and success rate of model calls with retries, hedging and failover (app/resilience.py).
+#
+# Two local MockLLMServers stand in for providers: the primary stalls on a fraction of
+# requests (`--slow-rate`) and fails others (`--error-rate`); the secondary is healthy.
+# Requests are streamed with a small stdlib SSE client, so no provider SDK is needed.
+#
+# Run from the project root:
+#   python -m benchmarks.resilience --requests 200 --slow-rate 0.1 --error-rate 0.1
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from app.fakes import MockLLMServer
+from app.resilience import ResilientCaller, failover_stream
+from app.utils import percentile
+
+
+class ProviderHTTPError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+
+def stream_completion(base_url: str, timeout: float = 30.0) -> Iterator[str]:
+    """Streams one chat completion from an OpenAI-compatible server, yielding content deltas."""
+    url = urlparse(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=timeout)
+    try:
+        body = json.dumps({"model": "mock", "stream": True, "messages": [{"role": "user", "content": "Hello"}]})
+        conn.request("POST", f"{url.path}/chat/completions", body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        if response.status != 200:
+            raise ProviderHTTPError(response.status, response.read().decode(errors="replace")[:200])
+        for line in response:
+            line = line.strip()
+            if not line.startswith(b"data: ") or line == b"data: [DONE]":
+                continue
+            for choice in json.loads(line[6:]).get("choices", []):
+                content = choice.get("delta", {}).get("content")
+                if content:
+                    yield content
+    finally:
+        conn.close()
+
+
+def run_scenario(call: Callable[[], Iterator[str]], requests: int, concurrency: int) -> Dict[str, Any]:
+    ttfts: List[float] = []
+    totals: List[float] = []
+    failures = 0
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def worker() -> None:
+        nonlocal failures
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            start = time.perf_counter()
+            ttft: Optional[float] = None
+            try:
+                for _ in call():
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                with lock:
+                    ttfts.append(ttft if ttft is not None else time.perf_counter() - start)
+                    totals.append(time.perf_counter() - start)
+            except Exception:
+                with lock:
+                    failures += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"ttfts": ttfts, "totals": totals, "failures": failures}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Model call resilience benchmark (retries, hedging, failover)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.08, help="Primary: fraction of requests that stall")
+    parser.add_argument("--slow-latency", type=float, default=2.0, help="Primary: extra delay of a stalled request (s)")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="Primary: fraction of requests that fail with 500")
+    parser.add_argument("--hedge-delay", type=float, default=0.25, help="Hedge delay until enough TTFT samples exist (s)")
+    args = parser.parse_args()
+
+    primary = MockLLMServer(
+        first_token_latency=args.first_token_latency, token_latency=0.0,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency, error_rate=args.error_rate, seed=1,
+    ).start()
+    secondary = MockLLMServer(first_token_latency=args.first_token_latency * 2, token_latency=0.0, seed=2).start()
+
+    def make_caller(**overrides: Any) -> ResilientCaller:
+        settings = {"max_retries": 0, "hedge": False, "hedge_delay": args.hedge_delay, "backoff_base": 0.05, "first_token_timeout": 10.0}
+        settings.update(overrides)
+        return ResilientCaller(**settings)
+
+    def resilient(caller: ResilientCaller, base_url: str) -> Callable[[], Iterator[str]]:
+        return lambda: caller.stream(stream_completion, base_url)
+
+    retry_caller = make_caller(max_retries=2)
+    hedge_caller = make_caller(max_retries=2, hedge=True)
+    primary_caller = make_caller(max_retries=1, hedge=True)
+    secondary_caller = make_caller(max_retries=1)
+
+    scenarios: Dict[str, Callable[[], Iterator[str]]] = {
+        "plain": lambda: stream_completion(primary.base_url),
+        "retries": resilient(retry_caller, primary.base_url),
+        "retries + hedging": resilient(hedge_caller, primary.base_url),
+        "hedging + failover": lambda: failover_stream(
+            resilient(primary_caller, primary.base_url),
+            resilient(secondary_caller, secondary.base_url),
+        ),
+    }
+
+    print(
+        f"{args.requests} requests, concurrency {args.concurrency}; primary: {args.slow_rate:.0%} stall "
+        f"+{args.slow_latency:g}s, {args.error_rate:.0%} errors; hedge delay {args.hedge_delay:g}s until p95 is known"
+    )
+    print(f"{'scenario':<20} {'ok':>6} {'ttft p50':>9} {'ttft p95':>9} {'ttft p99':>9} {'max':>7} {'primary reqs':>13} {'secondary':>10}")
+    for name, call in scenarios.items():
+        primary_before, secondary_before = primary.requests, secondary.requests
+        result = run_scenario(call, args.requests, args.concurrency)
+        ttfts = result["ttfts"]
+        ok = 1 - result["failures"] / args.requests
+        print(
+            f"{name:<20} {ok:>6.1%} {percentile(ttfts, 50) * 1000:>7.0f}ms {percentile(ttfts, 95) * 1000:>7.0f}ms "
+            f"{percentile(ttfts, 99) * 1000:>7.0f}ms {max(ttfts, default=0):>6.2f}s "
+            f"{primary.requests - primary_before:>13} {secondary.requests - secondary_before:>10}"
+        )
+
+    primary.stop()
+    secondary.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# benchmarks/router_eval.py
+# Offline evaluation of the model router (app/router.py) on a labelled prompt set.
+#
+# Reports accuracy, how many hard prompts would wrongly go to the small tier (the
+# costly mistake) and the share of turns the small tier would take, for a sweep of
+# thresholds. With --classifier the cheap OpenAI model also judges unclear prompts
+# (needs OPENAI_API_KEY; OPENAI_BASE_URL may point at a mock server).
+#
+# Run from the project root:
+#   python -m benchmarks.router_eval
+#   python -m benchmarks.router_eval --classifier --show-errors
+
+import argparse
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from app.router import AMBIGUOUS_BAND, COMPLEXITY_THRESHOLD, TIER_LARGE, TIER_SMALL, ModelClassifier, ModelRouter, RouterStats
+
+S, L = TIER_SMALL, TIER_LARGE
+
+LABELLED_PROMPTS: List[Tuple[str, str]] = [
+    ("Hi there!", S),
+    ("Thanks, that's helpful.", S),
+    ("What is the capital of France?", S),
+    ("Who is the author of Pride and Prejudice?", S),
+    ("Translate 'good morning' into Spanish.", S),
+    ("Define photosynthesis in one sentence.", S),
+    ("Give me a synonym for happy.", S),
+    ("What time zone is Tokyo in?", S),
+    ("Recommend a vegetarian pasta recipe.", S),
+    ("How many cups are in a quart?", S),
+    ("Tell me a short story about a brave knight.", S),
+    ("Now, describe the dragon the knight faced.", S),
+    ("Finally, how did the story end?", S),
+    ("Summarize this in one line: the meeting moved to Friday at 3pm.", S),
+    ("What's the weather usually like in Lisbon in May?", S),
+    ("Search the web for the latest news about the Mars rover.", S),
+    ("Fix the typo: 'recieve the pacakge'", S),
+    ("你好，今天怎么样？", S),
+    ("谢谢你的帮助", S),
+    ("List three fruits that are high in vitamin C.", S),
+    ("Compare PostgreSQL and MongoDB for a multi-tenant SaaS app and recommend one, explaining the trade-offs.", L),
+    ("Design the architecture for a real-time chat service that scales to a million users.", L),
+    ("Write a Python function that parses ISO-8601 durations, with tests.", L),
+    ("```python\ndef f(x):\n    return x[0] + f(x[1:])\n```\nWhy does this crash on an empty list and how do I fix it?", L),
+    ("Prove that the square root of 2 is irrational.", L),
+    ("Derive the gradient of the softmax cross-entropy loss step by step.", L),
+    ("Analyze the pros and cons of remote work for early-stage startups.", L),
+    ("Plan a two-week itinerary through Japan on a budget, with daily costs and transport between cities.", L),
+    ("Refactor this class to use dependency injection:\nclass A {\n  B b = new B();\n}", L),
+    ("Calculate the monthly payment on a 300000 loan at 6.5% over 30 years and explain the formula.", L),
+    ("Write a detailed essay on the causes of the French Revolution.", L),
+    ("Evaluate these three marketing strategies and tell me which has the best expected ROI: 1. paid ads 2. content 3. referrals", L),
+    ("My SQL query is slow: SELECT * FROM orders o JOIN users u ON o.user_id = u.id WHERE u.country = 'DE'; how should I optimize it?", L),
+    ("Explain why quicksort is O(n log n) on average but O(n^2) in the worst case.", L),
+    ("What are the differences between TCP and UDP? When would you use each? What about QUIC?", L),
+    ("Critique my business plan in depth: a subscription box for houseplants targeting urban millennials.", L),
+    ("请详细分析一下微服务架构和单体架构的优缺点。", L),
+    ("Implement an LRU cache in Go with O(1) get and put.", L),
+    ("What is the probability of getting at least two heads in five coin flips? Show your work.", L),
+    ("Debug this: my React component re-renders infinitely when I call setState inside useEffect.", L),
+]
+
+
+def evaluate(router: ModelRouter, prompts: List[Tuple[str, str]]) -> Dict[str, object]:
+    confusion = {(S, S): 0, (S, L): 0, (L, S): 0, (L, L): 0}  # (label, routed)
+    errors = []
+    for prompt, label in prompts:
+        decision = router.route(prompt)
+        confusion[(label, decision["tier"])] += 1
+        if decision["tier"] != label:
+            errors.append((label, decision, prompt))
+    total = len(prompts)
+    hard = confusion[(L, S)] + confusion[(L, L)]
+    return {
+        "accuracy": (confusion[(S, S)] + confusion[(L, L)]) / total,
+        "hard_to_small": confusion[(L, S)] / hard if hard else 0.0,
+        "easy_to_large": confusion[(S, L)] / (total - hard) if total - hard else 0.0,
+        "small_share": (confusion[(S, S)] + confusion[(L, S)]) / total,
+        "errors": errors,
+    }
+
+
+def make_classifier(model_id: str) -> Optional[ModelClassifier]:
+    from agno.models.openai import OpenAIChat
+
+    return ModelClassifier(OpenAIChat(id=model_id))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline model router evaluation")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.2, COMPLEXITY_THRESHOLD, 0.4, 0.5])
+    parser.add_argument("--classifier", action="store_true", help="Also ask the cheap model about ambiguous prompts")
+    parser.add_argument("--classifier-model", default="gpt-4.1-nano-2025-04-14")
+    parser.add_argument("--show-errors", action="store_true")
+    args = parser.parse_args()
+
+    classifier = make_classifier(args.classifier_model) if args.classifier else None
+    print(f"{len(LABELLED_PROMPTS)} labelled prompts, classifier: {args.classifier_model if classifier else 'off'} (band {AMBIGUOUS_BAND})")
+    print(f"{'threshold':>9} {'accuracy':>9} {'hard->small':>12} {'easy->large':>12} {'small share':>12}")
+    for threshold in args.thresholds:
+        router = ModelRouter(large_agent=None, small_agent=None, classifier=classifier, threshold=threshold, stats=RouterStats())
+        result = evaluate(router, LABELLED_PROMPTS)
+        print(
+            f"{threshold:>9.2f} {result['accuracy']:>9.0%} {result['hard_to_small']:>12.0%} "
+            f"{result['easy_to_large']:>12.0%} {result['small_share']:>12.0%}"
+        )
+        if args.show_errors:
+            for label, decision, prompt in result["errors"]:
+                print(f"    expected {label:<5} got {decision['tier']:<5} score {decision['score']:.2f} {decision['reasons']}  {prompt[:60]!r}")
+        if classifier:
+            print(f"          classifier agreement {router.stats.snapshot()['classifier_agreement']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
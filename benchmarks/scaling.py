@@ -0,0 +1,124 @@
+# benchmarks/scaling.py
+# Throughput vs number of worker processes sharing one storage backend.
+#
+# Each worker is a separate process (like one Streamlit server behind a load balancer)
+# running headless agent turns against the MockLLMServer started here. Storage goes
+# wherever AGNO_STORAGE_BACKEND points: the default SQLite file shows the single-file
+# write ceiling, the postgres backend (see docker-compose.yml) shows shared-server scaling.
+#
+# Run from the project root:
+#   python -m benchmarks.scaling --workers 1 2 4 --turns 20
+#   AGNO_STORAGE_BACKEND=postgres AGNO_DB_URL=postgresql+psycopg://ai:ai@localhost:5532/ai python -m benchmarks.scaling
+
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from app.fakes import MockLLMServer
+from app.utils import percentile
+
+
+def worker(index: int, turns: int, threads: int, results: "mp.Queue") -> None:
+    """Runs `turns` agent turns on each of `threads` sessions and reports their latencies."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    from app.models import STORAGE_TABLE_NAME
+    from app.storage import create_storage
+
+    storage = create_storage(table_name=STORAGE_TABLE_NAME)
+
+    def run_session(thread_index: int) -> List[float]:
+        agent = Agent(
+            model=OpenAIChat(id="gpt-4.1-mini"),
+            storage=storage,
+            user_id=f"scale_user_{index}_{thread_index}",
+            session_id=f"scale_session_{index}_{thread_index}",
+            add_history_to_messages=True,
+            num_history_runs=5,
+        )
+        latencies = []
+        for turn in range(turns):
+            start = time.perf_counter()
+            agent.run(f"Turn {turn}: say something short.")
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(run_session, i) for i in range(threads)]:
+            try:
+                latencies.extend(future.result())
+            except Exception as e:
+                errors.append(f"worker {index}: {e}")
+    results.put({"latencies": latencies, "errors": errors})
+
+
+def run_level(num_workers: int, turns: int, threads: int) -> Dict[str, float]:
+    ctx = mp.get_context("spawn")  # Fresh interpreters, like separate server processes
+    results = ctx.Queue()
+    start = time.perf_counter()
+    procs = [ctx.Process(target=worker, args=(i, turns, threads, results)) for i in range(num_workers)]
+    for p in procs:
+        p.start()
+    reports = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = [t for r in reports for t in r["latencies"]]
+    errors = [e for r in reports for e in r["errors"]]
+    for error in errors[:5]:
+        print(f"  {error}")
+    return {
+        "turns": len(latencies),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "errors": len(errors),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Agent turn throughput vs worker process count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker process counts to try")
+    parser.add_argument("--turns", type=int, default=10, help="Turns per session")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent sessions per worker")
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = MockLLMServer(first_token_latency=args.first_token_latency, token_latency=0.0).start()
+    # Inherited by the spawned workers
+    os.environ["OPENAI_API_KEY"] = "mock-key"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    workdir = None
+    if "AGNO_DATA_DIR" not in os.environ:
+        workdir = tempfile.mkdtemp(prefix="agno_scaling_")
+        os.environ["AGNO_DATA_DIR"] = workdir
+
+    print(f"Storage: {os.environ.get('AGNO_STORAGE_BACKEND', 'sqlite')}  |  {args.threads} session(s) x {args.turns} turns per worker")
+    print(f"{'workers':>8} {'turns':>7} {'turns/s':>9} {'speedup':>8} {'p50 s':>7} {'p99 s':>7} {'errors':>7}")
+    baseline = None
+    for num_workers in args.workers:
+        result = run_level(num_workers, args.turns, args.threads)
+        baseline = baseline or result["throughput"] or None
+        speedup = result["throughput"] / baseline if baseline else 0.0
+        print(f"{num_workers:>8} {result['turns']:>7} {result['throughput']:>9.1f} {speedup:>7.2f}x {result['p50']:>7.3f} {result['p99']:>7.3f} {result['errors']:>7}")
+
+    server.stop()
+    if workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# benchmarks/scheduler.py
+# Turn latency per user class with and without the admission scheduler (app/scheduler.py).
+#
+# The provider is modelled as `--capacity` concurrent requests of `--service` seconds
+# each (what a rate/concurrency limit looks like from the app). Heavy users fire turns
+# back to back from `--tabs` tabs each; light users send one turn, think, send the
+# next. Without the scheduler heavy users' turns pile up at the provider and everyone
+# waits behind them; with it, light users' turns go first by fair share.
+#
+# Run from the project root:
+#   python -m benchmarks.scheduler --heavy 3 --light 10 --seconds 10
+
+import argparse
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.scheduler import TurnScheduler
+from app.utils import percentile
+
+
+class Provider:
+    """At most `capacity` requests at once, served in no particular order, `service` seconds each (jittered)."""
+
+    def __init__(self, capacity: int, service: float, seed: int):
+        self._slots = threading.Semaphore(capacity)
+        self.service = service
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self) -> None:
+        with self._slots:
+            with self._lock:
+                duration = self.service * self._rng.uniform(0.5, 1.5)
+            time.sleep(duration)
+
+
+def run(args, scheduler: Optional[TurnScheduler]) -> Dict[str, List[float]]:
+    provider = Provider(args.capacity, args.service, args.seed)
+    latencies: Dict[str, List[float]] = {"heavy": [], "light": []}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def user(kind: str, user_id: str, think: float, seed: int) -> None:
+        rng = random.Random(seed)
+        time.sleep(rng.uniform(0, think or 0.05))
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            ticket = scheduler.acquire(user_id, "mock") if scheduler else None
+            try:
+                provider.call()
+            finally:
+                if ticket:
+                    scheduler.release(ticket)
+            with lock:
+                latencies[kind].append(time.perf_counter() - start)
+            if think:
+                time.sleep(rng.expovariate(1.0 / think))
+
+    threads = [
+        threading.Thread(target=user, args=("heavy", f"heavy{u}", 0.0, u * 100 + tab))
+        for u in range(args.heavy) for tab in range(args.tabs)
+    ] + [threading.Thread(target=user, args=("light", f"light{u}", args.think, 10_000 + u)) for u in range(args.light)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fair-share admission control benchmark")
+    parser.add_argument("--heavy", type=int, default=3, help="Users firing turns back to back")
+    parser.add_argument("--tabs", type=int, default=4, help="Concurrent turns per heavy user")
+    parser.add_argument("--light", type=int, default=10, help="Users with think time between turns")
+    parser.add_argument("--think", type=float, default=1.0, help="Mean think time of light users (s)")
+    parser.add_argument("--capacity", type=int, default=4, help="Concurrent requests the provider serves")
+    parser.add_argument("--service", type=float, default=0.2, help="Mean provider time per turn (s)")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{args.heavy} heavy users x {args.tabs} tabs, {args.light} light users, provider capacity {args.capacity}")
+    print(f"{'mode':<12} {'class':<6} {'turns':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    modes = {
+        "unscheduled": None,
+        "scheduled": TurnScheduler(max_in_flight=args.capacity, max_per_user=1, max_wait=args.seconds * 10),
+    }
+    for mode, scheduler in modes.items():
+        latencies = run(args, scheduler)
+        for kind in ("light", "heavy"):
+            values = latencies[kind]
+            print(f"{mode:<12} {kind:<6} {len(values):>6} {percentile(values, 50) * 1000:>8.0f} {percentile(values, 99) * 1000:>8.0f}")
+        if scheduler:
+            stats = scheduler.snapshot()
+            print(f"  queue: peak {stats['peak_queue']}, wait p50 {stats['wait_p50'] * 1000:.0f} ms, p95 {stats['wait_p95'] * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# benchmarks/search_cache.py
+# Offline hit-rate / latency benchmark for CachedSearchTools using the stub backend.
+#
+# Run from the project root:
+#   python -m benchmarks.search_cache --users 8 --queries 400 --latency 0.2
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.search import CachedSearchTools, StubSearchBackend
+from app.utils import SingleFlight, TTLCache, TokenBucket, percentile
+
+BASE_QUERIES = [
+    "tom kha gai recipe",
+    "green curry paste ingredients",
+    "how does lancedb store vectors",
+    "streamlit session state",
+    "weather in bangkok",
+    "pad thai without fish sauce",
+    "agno agent memory",
+    "duckduckgo search api limits",
+]
+
+
+def vary(query: str, rng: random.Random) -> str:
+    """Produces a near-identical variant of a query (case, spacing, punctuation)."""
+    variant = query.upper() if rng.random() < 0.3 else query
+    if rng.random() < 0.3:
+        variant = "  " + variant.replace(" ", "  ") + " "
+    if rng.random() < 0.3:
+        variant += rng.choice(["?", "!", "."])
+    return variant
+
+
+def run(users: int, queries: int, latency: float, seed: int) -> None:
+    rng = random.Random(seed)
+    # Zipf-like popularity: a few queries dominate, like real traffic
+    weights = [1.0 / (rank + 1) for rank in range(len(BASE_QUERIES))]
+    workload = [vary(rng.choices(BASE_QUERIES, weights)[0], rng) for _ in range(queries)]
+
+    backend = StubSearchBackend(latency=latency)
+    tools = CachedSearchTools(
+        backend=backend,
+        cache=TTLCache(maxsize=64, ttl=600),
+        flight=SingleFlight(),
+        limiter=TokenBucket(rate=1000, capacity=1000),  # Don't let the limiter dominate timings
+    )
+
+    latencies = []
+
+    def one(query: str) -> None:
+        start = time.perf_counter()
+        tools.duckduckgo_search(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(one, workload))
+    elapsed = time.perf_counter() - start
+
+    stats = tools.stats()
+    print(f"Queries:         {queries} from {users} concurrent users")
+    print(f"Backend calls:   {backend.calls} (uncached would be {queries})")
+    print(f"Cache hit rate:  {stats['hit_rate']:.1%}")
+    print(f"Coalesced calls: {stats['coalesced']}")
+    print(f"Latency p50/p95: {percentile(latencies, 50) * 1000:.1f} / {percentile(latencies, 95) * 1000:.1f} ms")
+    print(f"Wall time:       {elapsed:.2f}s (uncached serial would be ~{queries * latency:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search cache hit-rate benchmark")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub backend latency in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.users, args.queries, args.latency, args.seed)
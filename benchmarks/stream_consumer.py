@@ -0,0 +1,100 @@
+# benchmarks/stream_consumer.py
+# Micro-benchmark: event-dispatch StreamConsumer vs the previous per-chunk hasattr probing.
+#
+# Run from the project root:
+#   python -m benchmarks.stream_consumer --chunks 10000
+
+import argparse
+import re
+import time
+from types import SimpleNamespace
+
+from app.streaming import StreamConsumer
+
+
+def synthetic_stream(num_chunks: int, tool_every: int = 500):
+    """Builds a run stream shaped like agno's: content deltas with tool events interleaved."""
+    chunks = [SimpleNamespace(event="RunStarted", content=None)]
+    call = 0
+    for i in range(num_chunks):
+        if i and i % tool_every == 0:
+            tool = {"tool_call_id": f"call_{call}", "tool_name": "duckduckgo_search", "metrics": {"time": 0.25}}
+            call += 1
+            chunks.append(SimpleNamespace(event="ToolCallStarted", content=None, tools=[tool]))
+            chunks.append(SimpleNamespace(event="ToolCallCompleted", content=None, tools=[tool]))
+        # Content deltas also carry the run's accumulated `tools` list, as agno's do
+        chunks.append(SimpleNamespace(
+            event="RunResponse", content="tok ", messages=None,
+            tools=[{"tool_name": "duckduckgo_search"}] * min(call, 1),
+        ))
+    chunks.append(SimpleNamespace(event="RunCompleted", content="(final)", tools=[]))
+    # A response mentioning "tool:" in prose trips the old regex fallback
+    chunks.append(SimpleNamespace(event="RunResponse", content=" The tool: search helped.", messages=None, tools=None))
+    return chunks
+
+
+def legacy_consume(stream):
+    """The previous loop from handle_agent_response (object branch), without rendering."""
+    full_response_content = ""
+    tool_calls = []
+    complete_response = None
+    for chunk in stream:
+        if hasattr(chunk, '__dict__') and 'content' in chunk.__dict__:
+            complete_response = chunk
+        if chunk is None:
+            continue
+        elif isinstance(chunk, dict) and "ERROR" in chunk and isinstance(chunk["ERROR"], dict):
+            break
+        elif hasattr(chunk, 'content') and chunk.content:
+            full_response_content += chunk.content
+            if hasattr(chunk, 'messages') and chunk.messages is not None:
+                for msg in chunk.messages:
+                    if hasattr(msg, 'tool_calls') and msg.tool_calls:
+                        tool_calls.extend(msg.tool_calls)
+            elif hasattr(chunk, 'tool_calls') and chunk.tool_calls:
+                tool_calls.extend(chunk.tool_calls)
+            elif hasattr(chunk, 'tools') and chunk.tools:
+                for tool in chunk.tools:
+                    if isinstance(tool, dict) and 'tool_name' in tool:
+                        tool_calls.append({"function": {"name": tool['tool_name']}})
+            elif hasattr(chunk, 'run') and hasattr(chunk.run, 'tool_calls') and chunk.run.tool_calls:
+                tool_calls.extend(chunk.run.tool_calls)
+        elif isinstance(chunk, dict) and 'content' in chunk:
+            full_response_content += chunk['content']
+        elif isinstance(chunk, str):
+            full_response_content += chunk
+    if complete_response and not tool_calls and getattr(complete_response, 'tools', None):
+        tool_calls.extend({"function": {"name": t['tool_name']}} for t in complete_response.tools)
+    if not tool_calls and "tool:" in full_response_content.lower():
+        tool_calls.extend({"function": {"name": n}} for n in re.findall(r"tool:\s*(\w+)", full_response_content, re.IGNORECASE))
+    return full_response_content, tool_calls
+
+
+def bench(fn, stream, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(stream)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream consumer micro-benchmark")
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    stream = synthetic_stream(args.chunks)
+    expected_tools = sum(1 for c in stream if c.event == "ToolCallCompleted")
+
+    legacy_time = bench(legacy_consume, stream, args.repeats)
+    event_time = bench(lambda s: StreamConsumer().consume(s), stream, args.repeats)
+
+    _, legacy_tools = legacy_consume(stream)
+    consumer = StreamConsumer().consume(stream)
+
+    print(f"Chunks: {len(stream)}  (tool calls actually made: {expected_tools})")
+    print(f"Legacy probing: {legacy_time * 1000:8.2f} ms  ({legacy_time / len(stream) * 1e6:.2f} us/chunk), tools counted: {len(legacy_tools)}")
+    print(f"Event dispatch: {event_time * 1000:8.2f} ms  ({event_time / len(stream) * 1e6:.2f} us/chunk), tools counted: {len(consumer.tool_calls)}")
+    print(f"Speedup: {legacy_time / event_time:.2f}x")
@@ -0,0 +1,170 @@
+# benchmarks/tool_compaction.py
+# Prompt size and turn latency with and without tool result compaction (app/tool_compaction.py).
+#
+# Replays a tool-heavy session turn by turn the way agno builds prompts with
+# add_history_to_messages: system prompt, the messages of the last `--history-runs`
+# runs (tool results included), then the new turn's question and tool results. Each
+# prompt is sent to a local MockLLMServer whose prefill cost grows with prompt tokens
+# (`--prompt-token-latency`), once with raw tool results and once per compaction mode.
+#
+# The session is synthetic by default (web search hits, knowledge documents and long
+# fetched pages); `--session` replays a recorded one instead: a JSON file holding the
+# `memory` column of agent_sessions_v2 ({"runs": [{"messages": [...]}, ...]}).
+#
+# Run from the project root:
+#   python -m benchmarks.tool_compaction --turns 20 --max-tokens 800
+#   python -m benchmarks.tool_compaction --session session.json
+
+import argparse
+import json
+import random
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+from app.fakes import MockLLMServer
+from app.memory_index import estimate_tokens
+from app.tool_compaction import ToolResultCompactor
+from app.utils import percentile
+
+SYSTEM_PROMPT = "You are a helpful Thai cooking assistant. Use your tools to look up recipes and sources."
+_WORDS = (
+    "coconut milk galangal lemongrass lime leaves chili fish sauce palm sugar shallots garlic "
+    "simmer stir fry pound paste serve rice noodles basil coriander tamarind broth chicken prawns "
+    "the a with and until then for about minutes over heat add taste season"
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(_sentence(rng, rng.randint(8, 20)) for _ in range(sentences))
+
+
+def synthetic_session(turns: int, seed: int) -> List[Dict[str, Any]]:
+    """Runs of a tool-heavy session: every turn searches the web, the knowledge base, or reads a page."""
+    rng = random.Random(seed)
+    runs = []
+    for turn in range(turns):
+        dish = f"{rng.choice(_WORDS)} {rng.choice(_WORDS)} curry"
+        question = f"How do I make {dish} for {rng.randint(2, 8)} people?"
+        kind = turn % 3
+        if kind == 0:
+            name, arguments = "duckduckgo_search", {"query": dish, "max_results": 10}
+            result = json.dumps([
+                {"title": f"{dish.title()} recipe #{i}", "href": f"https://example.com/{turn}/{i}", "body": _paragraph(rng, 6),
+                 "raw": _paragraph(rng, 4)}
+                for i in range(10)
+            ])
+        elif kind == 1:
+            name, arguments = "search_knowledge_base", {"query": dish}
+            result = json.dumps([
+                {"name": "ThaiRecipes", "content": _paragraph(rng, 12), "meta_data": {"page": rng.randint(1, 60), "chunk": i},
+                 "usage": {"embedding_tokens": rng.randint(100, 400)}}
+                for i in range(5)
+            ])
+        else:
+            name, arguments = "read_url", {"url": f"https://example.com/{dish.replace(' ', '-')}"}
+            result = "\n".join(_paragraph(rng, 5) for _ in range(12))
+        call_id = f"call_{turn}"
+        runs.append({"messages": [
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": "", "tool_calls": [
+                {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}]},
+            {"role": "tool", "tool_call_id": call_id, "tool_name": name, "tool_args": arguments, "content": result},
+            {"role": "assistant", "content": _paragraph(rng, 4)},
+        ]})
+    return runs
+
+
+def load_session(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        memory = json.load(f)
+    if isinstance(memory, str):  # The column as stored, JSON inside JSON
+        memory = json.loads(memory)
+    return [run for run in memory.get("runs", []) if run.get("messages")]
+
+
+def _tool_query(message: Dict[str, Any]) -> str:
+    args = message.get("tool_args") or {}
+    return " ".join(str(v) for v in args.values()) if isinstance(args, dict) else str(args)
+
+
+def compact_runs(runs: List[Dict[str, Any]], compactor: Optional[ToolResultCompactor]) -> List[List[Dict[str, str]]]:
+    """Per-run chat messages as the model would see them, tool results compacted when a compactor is given."""
+    compacted = []
+    for run in runs:
+        messages = []
+        for message in run["messages"]:
+            if message.get("role") == "system":
+                continue
+            content = message.get("content") or ""
+            if not isinstance(content, str):
+                content = json.dumps(content)
+            if compactor and message.get("role") == "tool":
+                content = compactor.compact(content, query=_tool_query(message))
+            # Tool results go over the wire as plain messages: MockLLMServer only counts content
+            messages.append({"role": "user" if message.get("role") == "tool" else message["role"], "content": content})
+        compacted.append(messages)
+    return compacted
+
+
+def replay(base_url: str, runs: List[List[Dict[str, str]]], history_runs: int) -> Dict[str, List[float]]:
+    """Sends each turn's prompt (history + current run, minus the final answer); returns tokens and latencies."""
+    tokens, latencies = [], []
+    for i, run in enumerate(runs):
+        history = [m for past in runs[max(0, i - history_runs):i] for m in past]
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}] + history + run[:-1]
+        tokens.append(sum(estimate_tokens(m["content"]) for m in messages))
+        request = urllib.request.Request(
+            f"{base_url}/chat/completions",
+            data=json.dumps({"model": "mock", "messages": messages}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+    return {"tokens": tokens, "latencies": latencies}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Tool result compaction benchmark")
+    parser.add_argument("--session", help="Recorded session memory JSON (default: synthetic session)")
+    parser.add_argument("--turns", type=int, default=20, help="Turns of the synthetic session")
+    parser.add_argument("--history-runs", type=int, default=5, help="Past runs replayed per prompt (agno num_history_runs)")
+    parser.add_argument("--max-tokens", type=int, default=800, help="Compaction budget per tool result")
+    parser.add_argument("--first-token-latency", type=float, default=0.02)
+    parser.add_argument("--prompt-token-latency", type=float, default=0.00002, help="Simulated prefill cost per prompt token (s)")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = load_session(args.session) if args.session else synthetic_session(args.turns, args.seed)
+    results = sum(1 for run in runs for m in run["messages"] if m.get("role") == "tool")
+    server = MockLLMServer(
+        first_token_latency=args.first_token_latency, token_latency=0.0, prompt_token_latency=args.prompt_token_latency
+    ).start()
+    try:
+        print(f"{len(runs)} turns, {results} tool results, {args.history_runs} history runs per prompt")
+        print(f"{'mode':<10} {'tokens/turn':>12} {'max tokens':>11} {'p50 ms':>8} {'p95 ms':>8} {'compact ms':>11}")
+        for mode in ("raw", "auto", "fields", "summary", "truncate"):
+            compactor = None if mode == "raw" else ToolResultCompactor(mode=mode, max_tokens=args.max_tokens)
+            start = time.perf_counter()
+            messages = compact_runs(runs, compactor)
+            compact_ms = (time.perf_counter() - start) * 1000 / max(results, 1)
+            stats = replay(server.base_url, messages, args.history_runs)
+            print(
+                f"{mode:<10} {sum(stats['tokens']) / len(stats['tokens']):>12.0f} {max(stats['tokens']):>11} "
+                f"{percentile(stats['latencies'], 50) * 1000:>8.1f} {percentile(stats['latencies'], 95) * 1000:>8.1f} "
+                f"{compact_ms if compactor else 0.0:>11.2f}"
+            )
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
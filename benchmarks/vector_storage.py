@@ -0,0 +1,140 @@
+# benchmarks/vector_storage.py
+# Compact vector storage (app/vector_storage.py) vs the float32 baseline on a synthetic LanceDB table.
+#
+# Writes the same clustered, L2-normalised vectors once per layout (float32, float16,
+# int8, truncated, with and without float32 rescoring) and reports, per layout:
+#   - on-disk table size and the size of the column a search actually scans
+#   - peak RSS of the process running the queries (each layout in a fresh process)
+#   - p50/p95 search latency through search_rows()
+#   - recall@k against exact float32 brute force
+#
+# Random clustered vectors are not Matryoshka embeddings, so the truncated layouts
+# understate what a prefix of a real text-embedding-3 vector retains.
+#
+# Run from the project root (needs lancedb, pyarrow, numpy):
+#   python -m benchmarks.vector_storage --rows 200000 --dim 768 --dims 256
+
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.utils import percentile
+from app.vector_storage import VectorLayout, encode_vectors, search_rows, vector_fields
+
+BYTES = {"float32": 4, "float16": 2, "int8": 1}
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_vectors(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.6 * rng.standard_normal((rows, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_table(uri: str, name: str, vectors: np.ndarray, layout: VectorLayout, batch: int = 50_000) -> None:
+    import lancedb
+    import pyarrow as pa
+
+    schema = pa.schema([pa.field("id", pa.string())] + vector_fields(vectors.shape[1], layout) + [pa.field("payload", pa.string())])
+    table = lancedb.connect(uri).create_table(name, schema=schema)
+    for start in range(0, len(vectors), batch):
+        chunk = vectors[start:start + batch]
+        columns = {
+            "id": [str(start + i) for i in range(len(chunk))],
+            "payload": ['{"content": "%d"}' % (start + i) for i in range(len(chunk))],
+            **encode_vectors(chunk, layout),
+        }
+        table.add(pa.Table.from_pydict({field.name: columns[field.name] for field in schema}, schema=schema))
+
+
+def search_once(uri: str, name: str, queries: np.ndarray, limit: int, results: "mp.Queue") -> None:
+    import lancedb
+
+    table = lancedb.connect(uri).open_table(name)
+    search_rows(table, queries[0].tolist(), limit)  # Warm-up; counted in peak RSS, not in latency
+    timings, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows = search_rows(table, query.tolist(), limit)
+        timings.append(time.perf_counter() - start)
+        found.append([int(row["id"]) for row in rows])
+    results.put({"timings": timings, "found": found, "peak_mb": _peak_rss_mb()})
+
+
+def run_isolated(uri: str, name: str, queries: np.ndarray, limit: int) -> Dict:
+    ctx = mp.get_context("spawn")  # Fresh process per layout, so peak RSS isn't carried over
+    results = ctx.Queue()
+    proc = ctx.Process(target=search_once, args=(uri, name, queries, limit, results))
+    proc.start()
+    result = results.get()
+    proc.join()
+    return result
+
+
+def dir_size_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 1e6
+
+
+def recall(found: List[List[int]], exact: np.ndarray) -> float:
+    return sum(len(set(f) & set(e.tolist())) for f, e in zip(found, exact)) / exact.size
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Quantized / truncated vector storage benchmark")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768, help="Full embedding dimensions")
+    parser.add_argument("--dims", type=int, default=256, help="Truncated dimensions for the reduced layouts")
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10, help="k for latency and recall@k")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    layouts = {
+        "float32": VectorLayout(),
+        "float16": VectorLayout("float16"),
+        "int8": VectorLayout("int8"),
+        "int8 no-rescore": VectorLayout("int8", keep_full=False),
+        f"float16/{args.dims}": VectorLayout("float16", dims=args.dims),
+        f"int8/{args.dims}": VectorLayout("int8", dims=args.dims),
+    }
+    vectors = make_vectors(args.rows, args.dim, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.integers(0, args.rows, args.queries)] + 0.1 * rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    exact = np.stack([np.argsort(((vectors - q) ** 2).sum(axis=1))[:args.limit] for q in queries])
+
+    uri = tempfile.mkdtemp(prefix="agno_vectors_")
+    try:
+        print(f"{args.rows} rows x {args.dim} dims, {args.queries} queries, k={args.limit}")
+        print(f"{'layout':<18} {'disk MB':>8} {'scan MB':>8} {'peak MB':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+        for label, layout in layouts.items():
+            name = label.replace(" ", "_").replace("/", "_")
+            build_table(uri, name, vectors, layout)
+            scan_mb = args.rows * (layout.dims or args.dim) * BYTES[layout.dtype] / 1e6
+            result = run_isolated(uri, name, queries, args.limit)
+            print(
+                f"{label:<18} {dir_size_mb(os.path.join(uri, name + '.lance')):>8.1f} {scan_mb:>8.1f} "
+                f"{result['peak_mb']:>9.1f} {percentile(result['timings'], 50) * 1000:>8.1f} "
+                f"{percentile(result['timings'], 95) * 1000:>8.1f} {recall(result['found'], exact):>7.1%}"
+            )
+    finally:
+        shutil.rmtree(uri, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,16 @@
 import os
 from agno.agent import AgentKnowledge
-from agno.vectordb.lancedb import LanceDb
 from dotenv import load_dotenv
 
-load_dotenv() # Load OPENAI_API_KEY etc. for the default embedder
+load_dotenv() # Load OPENAI_API_KEY etc. for the default embedder (or AGNO_EMBEDDER=local)
+
+from app.config import get_dedup_config, get_storage_config
+from app.dedup import NearDuplicateFilter
+from app.models import KNOWLEDGE_CACHE
+from app.storage import create_vector_db, get_cache_versions
 
 # --- Configuration (Match app/models.py) ---
-LANCEDB_URI = "tmp/lancedb"
+LANCEDB_URI = get_storage_config()["lancedb_uri"]
 LANCEDB_TABLE_NAME = "agent_knowledge_v1"
 
 # Ensure the LanceDB directory exists
@@ -17,9 +21,10 @@ print(f"Using table: {LANCEDB_TABLE_NAME}")
 
 # Initialize LanceDB Vector DB directly
 # It will likely use the default OpenAIEmbedder which needs OPENAI_API_KEY
-lancedb_vector_db = LanceDb(
+# (AGNO_EMBEDDER=local embeds offline with the model at AGNO_EMBEDDER_MODEL, see app/embedders.py)
+# (or the shared pgvector table when AGNO_VECTOR_BACKEND=pgvector)
+lancedb_vector_db = create_vector_db(
     table_name=LANCEDB_TABLE_NAME,
-    uri=LANCEDB_URI,
 )
 
 # Initialize the base Knowledge Base
@@ -37,6 +42,13 @@ knowledge_texts = [
 ]
 print(f"Prepared {len(knowledge_texts)} text snippets to load.")
 
+# Drop near-duplicate snippets before they are embedded (AGNO_INGEST_DEDUP_THRESHOLD=0 keeps all)
+dedup_config = get_dedup_config()
+if dedup_config["threshold"] > 0:
+    dedup = NearDuplicateFilter(dedup_config["threshold"], dedup_config["num_perm"], dedup_config["shingle_words"])
+    knowledge_texts = [text for text in knowledge_texts if not dedup.is_duplicate(text)]
+    print(dedup.summary())
+
 # --- Load data via AgentKnowledge.load_text --- 
 print("Attempting to load data via AgentKnowledge.load_text...")
 try:
@@ -68,6 +80,9 @@ try:
 
     print("\nKnowledge text loading process completed.")
 
+    # Tell running app workers to drop their cached knowledge handles
+    get_cache_versions().bump(KNOWLEDGE_CACHE)
+
 except Exception as e:
     import traceback
     print(f"\nError during knowledge loading:")
@@ -75,4 +90,4 @@ except Exception as e:
     print(f"  Args: {e.args}")
     print(f"  Traceback:")
     traceback.print_exc()
-    print("\nPlease ensure LanceDB is installed, accessible, and any required embedder keys (e.g., OPENAI_API_KEY) are set.") 
\ No newline at end of file
+    print("\nPlease ensure LanceDB is installed, accessible, and any required embedder keys (e.g., OPENAI_API_KEY) are set, or AGNO_EMBEDDER=local with a model file.") 
\ No newline at end of file
@@ -1,6 +1,7 @@
 import streamlit as st
 import streamlit.components.v1 as components
-from app.models import initialize_agent, AVAILABLE_MODELS, get_provider_key
+from app.models import initialize_agent, sync_shared_caches, AVAILABLE_MODELS, PROVIDER_DISPLAY_NAMES, get_provider_key
+from app.warmup import start_background_warmup
 from app.ui import (
     handle_chat_interaction, 
     display_user_memories, 
@@ -9,10 +10,21 @@ from app.ui import (
     handle_prompts_section,
     display_available_sessions,
     display_knowledge_base,
-    display_todo_list
+    display_todo_list,
+    display_transcript_memory,
+    display_router_stats,
+    display_prompt_cache_stats,
+    display_memory_retrieval_stats,
+    display_tool_compaction_stats,
+    display_context_packing_stats,
+    display_job_stats,
+    display_scheduler_stats
 )
+from app.memory import reset_transcript
 # Import the optional key getter
-from app.config import get_optional_key_from_env
+from app.config import get_knowledge_config, get_optional_key_from_env, get_storage_config
+from app.knowledge import list_knowledge_tables
+from app.router import ROUTING_MODES
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -23,6 +35,20 @@ st.set_page_config(
 
 st.title("Agno Chat Agent")
 
+@st.cache_data(ttl=60, show_spinner=False)
+def knowledge_table_options() -> list:
+    """LanceDB tables the agent can search (refreshed every minute)."""
+    storage_config = get_storage_config()
+    if storage_config["vector_backend"] != "lancedb":
+        return []
+    try:
+        return list_knowledge_tables(storage_config["lancedb_uri"])
+    except Exception:
+        return []
+
+# Build shared agents/DB handles once per server process, in the background
+warmup_status = start_background_warmup()
+
 # --- Sidebar for Settings ---
 with st.sidebar:
     st.header("Agent Settings")
@@ -42,15 +68,19 @@ with st.sidebar:
     st.session_state.setdefault('use_user_memory', True)
     st.session_state.setdefault('use_session_summary', True)
     st.session_state.setdefault('load_chat_history', True)
+    st.session_state.setdefault('parallel_tool_calls', False)
+    st.session_state.setdefault('model_routing', "off")
+    st.session_state.setdefault('resilient_calls', False)
+    st.session_state.setdefault('stable_prompt', False)
+    st.session_state.setdefault('knowledge_tables', get_knowledge_config()["tables"])
+    st.session_state.setdefault('memory_retrieval', False)
+    st.session_state.setdefault('compact_tool_results', False)
+    st.session_state.setdefault('pack_context', False)
 
     st.subheader("Credentials & Model")
     
     # --- Provider Selection --- 
-    provider_display_names = {
-        "openai": "OpenAI",
-        "google": "Google/Gemini",
-        "anthropic": "Anthropic/Claude"
-    }
+    provider_display_names = PROVIDER_DISPLAY_NAMES
     selected_provider_display = st.selectbox(
         "Provider:",
         options=list(provider_display_names.values()),
@@ -156,6 +186,14 @@ with st.sidebar:
     )
     if user_memory_disabled:
         st.session_state.use_user_memory = False
+    st.session_state.memory_retrieval = st.toggle(
+        "Top-k Memories",
+        value=st.session_state.memory_retrieval,
+        key="toggle_memory_retrieval",
+        help="Send only the user memories most relevant to each prompt instead of all of them, "
+             "and merge near-duplicate memories.",
+        disabled=not st.session_state.use_user_memory
+    )
     
     # Session summary toggle - Only enable if both user_id and session_id are provided
     summary_disabled = not (bool(st.session_state.user_id) and bool(st.session_state.session_id))
@@ -178,8 +216,64 @@ with st.sidebar:
         - Session Summary requires both User ID and Session ID
         """)
         
+    # --- Performance Toggles ---
+    st.session_state.parallel_tool_calls = st.toggle(
+        "Parallel Tool Calls",
+        value=st.session_state.parallel_tool_calls,
+        key="toggle_parallel_tools",
+        help="Run independent tool calls from the same turn concurrently."
+    )
+    st.session_state.model_routing = st.selectbox(
+        "Model Routing",
+        options=ROUTING_MODES,
+        index=ROUTING_MODES.index(st.session_state.model_routing),
+        key="model_routing_selector",
+        help="Send simple prompts to the provider's cheap model. 'heuristic' uses local checks only; "
+             "'model' also asks the cheap model about unclear prompts."
+    )
+    st.session_state.resilient_calls = st.toggle(
+        "Resilient Model Calls",
+        value=st.session_state.resilient_calls,
+        key="toggle_resilient_calls",
+        help="Retry failed provider calls with jitter, hedge slow ones, and fail over to another "
+             "provider whose API key is in the environment."
+    )
+    st.session_state.stable_prompt = st.toggle(
+        "Cache-friendly Prompt",
+        value=st.session_state.stable_prompt,
+        key="toggle_stable_prompt",
+        help="Keep the system prompt stable (description, instructions, tools) and send memories and "
+             "summaries with each message, so provider prompt caching can reuse the prefix."
+    )
+    st.session_state.compact_tool_results = st.toggle(
+        "Compact Tool Results",
+        value=st.session_state.compact_tool_results,
+        key="toggle_compact_tool_results",
+        help="Shrink large tool results (key fields of search hits, local summaries, truncation) "
+             "before they are stored and re-sent with the chat history."
+    )
+    st.session_state.pack_context = st.toggle(
+        "Pack Knowledge Context",
+        value=st.session_state.pack_context,
+        key="toggle_pack_context",
+        help="Pick knowledge chunks by relevance and diversity (MMR), merge neighbouring chunks "
+             "and stop at a per-model token budget instead of sending the raw top results."
+    )
+    st.session_state.knowledge_tables = st.multiselect(
+        "Knowledge Tables",
+        options=list(dict.fromkeys(st.session_state.knowledge_tables + knowledge_table_options())),
+        default=st.session_state.knowledge_tables,
+        key="knowledge_tables_select",
+        help="Vector DB tables the agent searches. Several tables are queried concurrently and "
+             "their results merged by score; none selected uses AGNO_KNOWLEDGE_TABLES."
+    )
+
     st.divider()
     st.caption("Agent will re-initialize if settings change.")
+    if warmup_status.done.is_set():
+        st.caption(f"Prewarm ready in {warmup_status.timings.get('ready', 0.0):.1f}s" if not warmup_status.error else f"Prewarm failed: {warmup_status.error}")
+    else:
+        st.caption("Prewarming shared resources...")
     
     # Create better display for current selections
     st.markdown("### Current Configuration")
@@ -224,9 +318,8 @@ with st.sidebar:
     # Add a Clear Session button at the bottom
     st.divider()
     if st.button("🧹 Clear Session", key="clear_session", help="Clear all session data including chat history"):
-        # Reset conversation
-        if "messages" in st.session_state:
-            st.session_state.messages = []
+        # Reset conversation (spilled older messages are left to retention pruning)
+        reset_transcript(None)
         
         # Reset sequential prompts progress
         if "completed_steps" in st.session_state:
@@ -243,6 +336,9 @@ if not st.session_state.api_key:
     st.info("Enter your API Key in the sidebar to begin.")
     st.stop() # Halt execution until API key is provided
 
+# --- Pick up cache invalidations from other worker processes ---
+sync_shared_caches()
+
 # --- Initialize Agent, Memory, and Storage ---
 # Pass the API key and toggle states
 # Unpack the returned LANCEDB_URI as well
@@ -254,7 +350,15 @@ agent, memory, storage, lancedb_vector_db, lancedb_uri = initialize_agent(
     use_user_memory=st.session_state.use_user_memory,
     use_session_summary=st.session_state.use_session_summary,
     description=st.session_state.get("agent_description", ""),
-    instructions=st.session_state.get("agent_instructions", [])
+    instructions=st.session_state.get("agent_instructions", []),
+    parallel_tool_calls=st.session_state.parallel_tool_calls,
+    model_routing=st.session_state.model_routing,
+    resilient_calls=st.session_state.resilient_calls,
+    stable_prompt=st.session_state.stable_prompt,
+    knowledge_tables=tuple(st.session_state.knowledge_tables),
+    memory_retrieval=st.session_state.memory_retrieval,
+    compact_tool_results=st.session_state.compact_tool_results,
+    pack_context=st.session_state.pack_context
 )
 
 # --- Create Main Tabs ---
@@ -271,10 +375,11 @@ with tab_prompts:
 
 # --- Tab 3: Memories (with Sub-Tabs) ---
 with tab_memories:
-    sub_tab_user, sub_tab_storage, sub_tab_summary = st.tabs([
+    sub_tab_user, sub_tab_storage, sub_tab_summary, sub_tab_debug = st.tabs([
         "User Memories",
         "Session Storage",
-        "Session Summaries"
+        "Session Summaries",
+        "Debug"
     ])
 
     with sub_tab_user:
@@ -287,6 +392,17 @@ with tab_memories:
         # Pass both agent and memory for capability check and triggering
         display_session_summary(agent, memory)
 
+    with sub_tab_debug:
+        # Per-session memory accounting for the chat transcript
+        display_transcript_memory(agent)
+        display_router_stats()
+        display_prompt_cache_stats()
+        display_memory_retrieval_stats()
+        display_tool_compaction_stats()
+        display_context_packing_stats()
+        display_job_stats()
+        display_scheduler_stats()
+
 # --- Tab 4: Knowledge Base ---
 with tab_knowledge:
     # Pass the LanceDB URI instead of the specific table object
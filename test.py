@@ -1,14 +1,23 @@
 # install lancedb - `pip install lancedb`
+#   python test.py                 -> load the recipes PDF from its URL
+#   python test.py docs/ a.pdf     -> stream local PDF/text files instead (bounded memory)
 import asyncio
+import sys
 
 from agno.agent import Agent
 from agno.knowledge.pdf_url import PDFUrlKnowledgeBase
-from agno.vectordb.lancedb import LanceDb
 
-# Initialize LanceDB
-vector_db = LanceDb(
-    table_name="recipes",
-    uri="tmp/lancedb",  # You can change this path to store data elsewhere
+from app.ingest import IngestPipeline, VectorDbWriter
+from app.config import get_dedup_config, get_vector_storage_config
+from app.dedup import NearDuplicateFilter
+from app.knowledge import create_metadata_indexes, create_table
+from app.models import KNOWLEDGE_CACHE, RECIPES_TABLE_NAME
+from app.storage import create_vector_db, get_cache_versions
+from app.vector_storage import VectorLayout
+
+# Initialize LanceDB (location comes from AGNO_LANCEDB_URI / AGNO_DATA_DIR, default tmp/lancedb)
+vector_db = create_vector_db(
+    table_name=RECIPES_TABLE_NAME,
 )
 
 # Create knowledge base
@@ -19,8 +28,25 @@ knowledge_base = PDFUrlKnowledgeBase(
 agent = Agent(knowledge=knowledge_base, show_tool_calls=True, debug_mode=True)
 
 if __name__ == "__main__":
-    # Load knowledge base asynchronously
-    asyncio.run(knowledge_base.aload(recreate=False))  # Comment out after first run
+    # Repeated headers, footers and recipes are dropped before embedding (AGNO_INGEST_DEDUP_THRESHOLD=0 keeps all)
+    dedup_config = get_dedup_config()
+    dedup = NearDuplicateFilter(dedup_config["threshold"], dedup_config["num_perm"], dedup_config["shingle_words"]) if dedup_config["threshold"] > 0 else None
+    if len(sys.argv) > 1:
+        # Parse page by page and embed/write in batches instead of loading whole documents
+        create_table(vector_db, VectorLayout(**get_vector_storage_config()))  # AGNO_VECTOR_DTYPE / _DIMS
+        stats = IngestPipeline(VectorDbWriter(vector_db), dedup=dedup).run(sys.argv[1:])
+        create_metadata_indexes(vector_db)
+        print(f"Ingested {stats['files']} file(s), {stats['pages']} pages -> {stats['chunks']} chunks in {stats['seconds']:.1f}s")
+    elif dedup is not None:
+        # Same load as aload(recreate=False), with the chunks filtered before they are embedded
+        for documents in knowledge_base.document_lists:
+            knowledge_base.load_documents(dedup.filter_documents(documents), skip_existing=True)
+    else:
+        # Load knowledge base asynchronously
+        asyncio.run(knowledge_base.aload(recreate=False))  # Comment out after first run
+    if dedup is not None:
+        print(dedup.summary())
+    get_cache_versions().bump(KNOWLEDGE_CACHE)  # Running app workers reconnect to the table
 
     # Create and use the agent asynchronously
     asyncio.run(agent.aprint_response("How to make Tom Kha Gai", markdown=True))
\ No newline at end of file
@@ -0,0 +1,63 @@
+# tests/test_context_packing.py
+# MMR selection and adjacent-chunk merging of app/context_packing.py on hand-built hits.
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("agno")
+
+from app.context_packing import merge_adjacent, merge_text, mmr_select
+from app.knowledge import TableHit
+
+
+def hit(chunk, distance, content=None, source="curry.pdf", table="recipes", rank=None):
+    meta = {"source": source, "chunk": chunk, "page": chunk + 1} if chunk is not None else {}
+    return TableHit(table, chunk if rank is None else rank, distance, source, content or f"chunk {chunk}", meta, None)
+
+
+# --- mmr_select ---
+def test_mmr_skips_a_near_copy_of_a_picked_chunk():
+    relevance = np.array([0.9, 0.89, 0.5], dtype=np.float32)
+    similarity = np.array([[1.0, 0.99, 0.0], [0.99, 1.0, 0.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+    assert mmr_select(relevance, similarity, [1, 1, 1], budget=10, max_items=2, mmr_lambda=0.5) == [0, 2]
+    # Relevance only: the copy wins
+    assert mmr_select(relevance, similarity, [1, 1, 1], budget=10, max_items=2, mmr_lambda=1.0) == [0, 1]
+
+
+def test_mmr_stops_at_the_budget_but_takes_smaller_chunks_that_fit():
+    relevance = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    similarity = np.eye(3, dtype=np.float32)
+    assert mmr_select(relevance, similarity, [60, 50, 30], budget=100, max_items=3, mmr_lambda=0.7) == [0, 2]
+    assert mmr_select(relevance, similarity, [60, 50, 30], budget=100, max_items=1, mmr_lambda=0.7) == [0]
+    assert mmr_select(relevance, similarity, [200, 200, 200], budget=100, max_items=3, mmr_lambda=0.7) == []
+
+
+# --- merge_text ---
+def test_merge_text_drops_the_repeated_overlap():
+    first = "Toast the spices. Add the coconut milk and simmer for ten minutes until thick."
+    second = "coconut milk and simmer for ten minutes until thick. Season with fish sauce."
+    assert merge_text(first, second) == "Toast the spices. Add the " + second
+
+
+def test_merge_text_joins_chunks_without_overlap_on_a_new_line():
+    assert merge_text("Step one.", "Step two.") == "Step one.\nStep two."
+    assert merge_text("Step one.", "") == "Step one.\n"
+
+
+# --- merge_adjacent ---
+def test_merge_adjacent_keeps_the_mmr_order():
+    # MMR picked chunk 7 first, then an unrelated chunk, then 7's neighbours
+    hits = [hit(7, 0.4), hit(None, 0.1, content="no position"), hit(2, 0.2), hit(6, 0.3), hit(8, 0.5)]
+    merged, merges = merge_adjacent(hits)
+    assert merges == 2
+    assert [h.meta_data.get("chunks", h.meta_data.get("chunk")) for h in merged] == [[6, 7, 8], None, 2]
+    run = merged[0]
+    assert run.content == "chunk 6\nchunk 7\nchunk 8"
+    assert run.distance == 0.3 and run.rank == 6  # Best of the run
+    assert run.meta_data["page"] == 7 and run.meta_data["last_page"] == 9
+
+
+def test_merge_adjacent_leaves_other_documents_and_duplicates_alone():
+    hits = [hit(1, 0.1), hit(2, 0.2, source="pho.pdf"), hit(3, 0.3), hit(3, 0.35)]
+    merged, merges = merge_adjacent(hits)
+    assert merges == 0 and merged == hits
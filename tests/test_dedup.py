@@ -0,0 +1,77 @@
+# tests/test_dedup.py
+# MinHash/LSH near-duplicate filtering of app/dedup.py: exact and near copies, and the
+# similarity threshold at its edges.
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.dedup import NearDuplicateFilter, _lsh_params
+
+WORDS = ("curry paste coconut milk lemongrass galangal shallot garlic chili lime fish sauce palm sugar "
+         "basil chicken thigh eggplant bamboo shoot kaffir leaf simmer stir fry pound mortar toast seed").split()
+RECIPE = " ".join(WORDS[(i * 7) % len(WORDS)] + str(i % 13) for i in range(200))
+
+
+def edited(text, *positions):
+    words = text.split()
+    for i in positions:
+        words[i] = "changed"
+    return " ".join(words)
+
+
+def estimated_similarity(a, b, **kwargs):
+    dedup = NearDuplicateFilter(**kwargs)
+    return float(np.mean(dedup.signature(a) == dedup.signature(b)))
+
+
+def test_exact_and_near_copies_are_dropped():
+    dedup = NearDuplicateFilter()
+    chunks = [{"content": RECIPE}, {"content": RECIPE}, {"content": edited(RECIPE, 100)}, {"content": "Pho broth with star anise."}]
+    kept = list(dedup.filter(chunks))
+    assert kept == [chunks[0], chunks[3]]
+    assert dedup.stats == {"chunks": 4, "kept": 2, "duplicates": 2, "exact": 1, "chars_saved": len(RECIPE) + len(chunks[2]["content"])}
+    assert dedup.summary().startswith("Dedup: 2 of 4 chunks dropped as near-duplicates (1 exact)")
+
+
+def test_loosely_related_texts_are_kept():
+    dedup = NearDuplicateFilter()
+    rewritten = edited(RECIPE, *range(0, 200, 10))  # One word in ten changed
+    assert not dedup.is_duplicate(RECIPE)
+    assert not dedup.is_duplicate(rewritten)
+    assert estimated_similarity(RECIPE, rewritten) < 0.9
+
+
+def test_threshold_edges():
+    near = edited(RECIPE, 50, 150)
+    similarity = estimated_similarity(RECIPE, near)
+    assert 0.0 < similarity < 1.0
+    at = NearDuplicateFilter(threshold=similarity)
+    at.is_duplicate(RECIPE)
+    assert at.is_duplicate(near)  # Reaching the threshold is a duplicate
+    above = NearDuplicateFilter(threshold=min(similarity + 1.0 / 128, 1.0))
+    above.is_duplicate(RECIPE)
+    assert not above.is_duplicate(near)
+
+    exact_only = NearDuplicateFilter(threshold=1.0)
+    exact_only.is_duplicate(RECIPE)
+    assert exact_only.is_duplicate(RECIPE) and not exact_only.is_duplicate(near)
+    for threshold in (0.0, 1.5):
+        with pytest.raises(ValueError):
+            NearDuplicateFilter(threshold=threshold)
+
+
+def test_lsh_bands_err_below_the_threshold():
+    for threshold in (0.5, 0.8, 0.9, 0.99):
+        bands, rows = _lsh_params(threshold, 128)
+        assert bands * rows == 128
+        assert (1.0 / bands) ** (1.0 / rows) <= threshold
+
+
+def test_short_texts_and_documents():
+    class Doc:
+        def __init__(self, content):
+            self.content = content
+
+    docs = [Doc("Add salt."), Doc("add SALT"), Doc("Add pepper.")]
+    assert NearDuplicateFilter().filter_documents(docs) == [docs[0], docs[2]]
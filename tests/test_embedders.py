@@ -0,0 +1,49 @@
+# tests/test_embedders.py
+# Numpy inference of the local embedder in app/embedders.py on small generated tables.
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("agno")
+
+from app.embedders import LocalEmbedder, NumpyEmbeddingModel, build_hashed_model
+
+TEXTS = [
+    "Green curry with chicken thighs and Thai basil.",
+    "",
+    "Pho broth: charred onion, ginger, star anise.",
+    "!!! ---",  # No words
+    "Green curry with chicken thighs and Thai basil.",
+    "Simmer the coconut milk until the oil splits.",
+]
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    return build_hashed_model(str(tmp_path / "embedder.npz"), dims=32, buckets=512)
+
+
+def test_batched_encoding_equals_one_batch(model_path):
+    one_batch = LocalEmbedder(model_path=model_path, batch_size=64).embed_batch(TEXTS)
+    batched = LocalEmbedder(model_path=model_path, batch_size=2, workers=3).embed_batch(TEXTS)
+    assert batched.shape == (len(TEXTS), 32)
+    np.testing.assert_allclose(batched, one_batch, atol=1e-6)
+    singles = np.vstack([NumpyEmbeddingModel(model_path).encode([text]) for text in TEXTS])
+    np.testing.assert_allclose(singles, one_batch, atol=1e-6)
+
+
+def test_texts_without_words_get_a_zero_vector(model_path):
+    vectors = NumpyEmbeddingModel(model_path).encode(TEXTS)
+    assert not vectors[1].any() and not vectors[3].any()
+    norms = np.linalg.norm(vectors[[0, 2, 4, 5]], axis=1)
+    np.testing.assert_allclose(norms, 1.0, atol=1e-5)
+    np.testing.assert_array_equal(vectors[0], vectors[4])
+    assert NumpyEmbeddingModel(model_path).encode(["", ""]).shape == (2, 32)
+    assert LocalEmbedder(model_path=model_path).embed_batch([]).shape == (0, 32)
+
+
+def test_vocab_tables_look_words_up(tmp_path):
+    path = str(tmp_path / "vocab.npz")
+    np.savez(path, embeddings=np.eye(3, dtype=np.float32), vocab=np.array(["curry", "pho", "basil"]))
+    vectors = NumpyEmbeddingModel(path).encode(["Curry basil", "unknown words", "pho pho"])
+    np.testing.assert_allclose(vectors, [[2 ** -0.5, 0, 2 ** -0.5], [0, 0, 0], [0, 1, 0]], atol=1e-6)
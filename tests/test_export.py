@@ -0,0 +1,45 @@
+# tests/test_export.py
+# Decoding of stored sessions into the export datasets of app/export.py.
+
+from app.export import session_rows
+
+
+def message(role, content, from_history=False, **extra):
+    return {"role": role, "content": content, "from_history": from_history, "created_at": 1_700_000_000, **extra}
+
+
+def run(run_id, question, answer, history=()):
+    return {
+        "run_id": run_id,
+        "created_at": 1_700_000_000,
+        "content": answer,
+        "messages": [
+            message("system", "You are a cook."),
+            *history,
+            message("user", question),
+            message("assistant", answer, metrics={"input_tokens": 10, "output_tokens": 5}),
+        ],
+    }
+
+
+def rows_by_dataset(session):
+    rows = {}
+    for dataset, row in session_rows(session):
+        rows.setdefault(dataset, []).append(row)
+    return rows
+
+
+def test_history_copies_are_exported_once():
+    first = run("r1", "Curry?", "Green curry.")
+    replayed = [message("user", "Curry?", from_history=True), message("assistant", "Green curry.", from_history=True,
+                metrics={"input_tokens": 10, "output_tokens": 5}, tool_calls=[{"id": "t1", "function": {"name": "search"}}])]
+    second = run("r2", "Spicy?", "Add chili.", history=replayed)
+    rows = rows_by_dataset({"session_id": "s1", "user_id": "u1", "memory": {"runs": [first, second]}, "created_at": 1_700_000_000})
+
+    contents = [(r["run_id"], r["content"]) for r in rows["messages"]]
+    assert contents.count(("r2", "Curry?")) == 0
+    assert [r["messages"] for r in rows["runs"]] == [3, 3]
+    assert [r["message_index"] for r in rows["messages"] if r["run_id"] == "r2"] == [0, 1, 2]
+    assert sum(r["input_tokens"] or 0 for r in rows["messages"]) == 20
+    assert "tool_calls" not in rows  # The replayed call belongs to an earlier run
+    assert rows["sessions"][0]["messages"] == 6
@@ -0,0 +1,52 @@
+# tests/test_http_pool.py
+# Shared provider HTTP pools of app/http_pool.py: sync SDK clients use the pool, async
+# clients keep their own transport.
+
+import pytest
+
+pytest.importorskip("agno")
+httpx = pytest.importorskip("httpx")
+
+from app.http_pool import close_http_clients, get_http_client, use_http_pool
+
+
+@pytest.fixture(autouse=True)
+def fresh_pools():
+    close_http_clients()
+    yield
+    close_http_clients()
+
+
+def test_openai_models_share_the_pool_and_keep_async_working():
+    pytest.importorskip("openai")
+    from agno.models.openai import OpenAIChat
+
+    main = use_http_pool(OpenAIChat(id="gpt-4o", api_key="sk-test"), "openai")
+    memory = use_http_pool(OpenAIChat(id="gpt-4o-mini", api_key="sk-test"), "openai")
+    assert main.get_client() is main.get_client()
+    assert main.get_client()._client is memory.get_client()._client is get_http_client("openai")
+    assert main.http_client is None
+    assert isinstance(main.get_async_client()._client, httpx.AsyncClient)
+
+
+def test_claude_gets_a_pooled_sync_client():
+    pytest.importorskip("anthropic")
+    from agno.models.anthropic import Claude
+
+    model = use_http_pool(Claude(id="claude-3-5-haiku-latest", api_key="sk-test"), "anthropic")
+    assert model.get_client()._client is get_http_client("anthropic")
+    assert isinstance(model.get_async_client()._client, httpx.AsyncClient)
+
+
+def test_gemini_client_gets_the_pool_config(monkeypatch):
+    pytest.importorskip("google.genai")
+    from agno.models.google import Gemini
+
+    monkeypatch.setenv("AGNO_HTTP_TIMEOUT", "42")
+    monkeypatch.setenv("AGNO_HTTP_MAX_CONNECTIONS", "7")
+    model = use_http_pool(Gemini(id="gemini-2.0-flash", api_key="test-key"), "google")
+    other = use_http_pool(Gemini(id="gemini-2.0-flash-lite", api_key="test-key"), "google")
+    assert model.get_client() is other.get_client()
+    options = model.client._api_client._http_options
+    assert options.timeout == 42_000
+    assert options.client_args["limits"].max_connections == 7
@@ -0,0 +1,132 @@
+# tests/test_ingest.py
+# Streaming ingestion of app/ingest.py against generated PDFs (app.fakes.write_sample_pdf)
+# and text files, with writers that record, fail or stall.
+
+import threading
+
+import pytest
+
+pytest.importorskip("pypdf")
+
+from app.fakes import write_sample_pdf
+from app.ingest import IngestPipeline, NullWriter, batched, chunk_pages, iter_files, iter_pages, iter_pdf_pages
+
+
+class RecordingWriter:
+    """Keeps every batch it is handed; fails the batches listed in `fail`."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.batches = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, chunks):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if call in self.fail:
+            raise RuntimeError("vector DB unavailable")
+        with self._lock:
+            self.batches.append(chunks)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    write_sample_pdf(str(tmp_path / "a.pdf"), pages=5, seed=1)
+    write_sample_pdf(str(tmp_path / "b.pdf"), pages=3, seed=2)
+    (tmp_path / "notes.txt").write_text("Simmer the broth with lemongrass. " * 100)
+    (tmp_path / "ignored.csv").write_text("not,ingested\n")
+    return tmp_path
+
+
+# --- Page sources ---
+def test_pdf_pages_are_streamed_in_order(tmp_path):
+    path = write_sample_pdf(str(tmp_path / "doc.pdf"), pages=7)
+    pages = list(iter_pdf_pages(path, pages_per_reader=3))  # Reopens the file twice
+    assert [number for _, number, _ in pages] == list(range(1, 8))
+    assert all(text.startswith(f"Page {number}") for _, number, text in pages)
+
+
+def test_directories_expand_to_supported_files_sorted(corpus):
+    names = [path.rsplit("/", 1)[-1] for path in iter_files([str(corpus)])]
+    assert names == ["a.pdf", "b.pdf", "notes.txt"]
+
+
+# --- Chunking ---
+def test_chunks_stay_within_one_file(corpus):
+    chunks = list(chunk_pages(iter_pages([str(corpus)]), chunk_size=500, overlap=50))
+    by_source = {}
+    for chunk in chunks:
+        by_source.setdefault(chunk["meta_data"]["source"], []).append(chunk)
+    assert len(by_source) == 3
+    for source_chunks in by_source.values():
+        assert [c["meta_data"]["chunk"] for c in source_chunks] == list(range(1, len(source_chunks) + 1))
+        assert all(c["meta_data"]["page"] <= c["meta_data"]["last_page"] for c in source_chunks)
+    assert all(len(c["content"]) <= 500 for c in chunks)
+
+
+def test_batched_keeps_the_remainder():
+    assert [len(b) for b in batched(range(10), 4)] == [4, 4, 2]
+
+
+# --- Pipeline ---
+def test_pipeline_writes_every_chunk(corpus):
+    expected = len(list(chunk_pages(iter_pages([str(corpus)]))))
+    writer = RecordingWriter()
+    stats = IngestPipeline(writer, batch_size=4, writers=2).run([str(corpus)])
+    assert stats["files"] == 3 and stats["pages"] > 8
+    assert stats["chunks"] == expected == sum(len(b) for b in writer.batches)
+    assert stats["batches"] == len(writer.batches)
+    assert stats["failed_chunks"] == 0 and stats["errors"] == []
+
+
+def test_failed_batches_are_not_counted_as_written(corpus):
+    writer = RecordingWriter(fail={2})
+    stats = IngestPipeline(writer, batch_size=4).run([str(corpus)])
+    written = sum(len(b) for b in writer.batches)
+    assert stats["chunks"] == written
+    assert stats["failed_chunks"] == 4
+    assert stats["batches"] == len(writer.batches)
+    assert len(stats["errors"]) == 1 and "vector DB unavailable" in stats["errors"][0]
+
+
+def test_failing_progress_callback_does_not_stop_the_writers(corpus):
+    def on_progress(stats):
+        raise ValueError("progress bar closed")
+
+    writer = RecordingWriter()
+    stats = IngestPipeline(writer, batch_size=2, max_pending_batches=1, writers=2).run([str(corpus)], on_progress=on_progress)
+    assert stats["chunks"] == sum(len(b) for b in writer.batches) > 4
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_parser_stops_when_every_writer_died(tmp_path):
+    path = write_sample_pdf(str(tmp_path / "big.pdf"), pages=20)
+
+    def exit_writer(chunks):
+        raise SystemExit  # Not caught per batch: ends the writer thread
+
+    with pytest.raises(RuntimeError, match="writer thread stopped"):
+        IngestPipeline(exit_writer, batch_size=2, max_pending_batches=1).run([path])
+
+
+def test_slow_writer_bounds_pending_batches(tmp_path):
+    path = write_sample_pdf(str(tmp_path / "big.pdf"), pages=20)
+    writer = NullWriter(delay=0.01)
+    stats = IngestPipeline(writer, batch_size=2, max_pending_batches=1).run([path])
+    assert writer.chunks == stats["chunks"]
+    assert stats["blocked_time"] > 0  # The parser waited on the writer
+
+
+def test_duplicate_files_are_dropped_before_the_writer(tmp_path):
+    pytest.importorskip("numpy")
+    from app.dedup import NearDuplicateFilter
+
+    write_sample_pdf(str(tmp_path / "a.pdf"), pages=4, seed=5)
+    write_sample_pdf(str(tmp_path / "copy.pdf"), pages=4, seed=5)
+    writer = RecordingWriter()
+    stats = IngestPipeline(writer, dedup=NearDuplicateFilter(threshold=0.9)).run([str(tmp_path)])
+    sources = {c["meta_data"]["source"] for b in writer.batches for c in b}
+    assert sources == {str(tmp_path / "a.pdf")}
+    assert stats["duplicates"] == stats["chunks"]
@@ -0,0 +1,98 @@
+# tests/test_jobs.py
+# Single-flight background jobs of app/jobs.py: deduplication, state transitions and the
+# bounded history of finished jobs.
+
+import threading
+import time
+
+import pytest
+
+from app.jobs import JOB_COMPACT, JOB_INGEST, JobQueue
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(workers=2, history=2)
+    yield queue
+    queue.shutdown()
+
+
+def blocking_job():
+    """A job function that runs until `release` is set; `started` is set once it runs."""
+    started, release = threading.Event(), threading.Event()
+
+    def fn(job):
+        job.update(0.5, "halfway")
+        started.set()
+        assert release.wait(5.0)
+        return "result"
+
+    return fn, started, release
+
+
+def wait_finished(job):
+    deadline = time.monotonic() + 5.0
+    while job.active:
+        assert time.monotonic() < deadline, "job never finished"
+        time.sleep(0.01)
+    return job
+
+
+def test_same_key_joins_the_running_job(queue):
+    fn, started, release = blocking_job()
+    job = queue.submit(JOB_INGEST, fn, user_id="alice", resource="recipes:abc")
+    assert started.wait(2.0)
+    assert job.state == "running" and job.progress == 0.5 and job.message == "halfway"
+
+    joined = queue.submit(JOB_INGEST, lambda job: "other", user_id="alice", resource="recipes:abc")
+    assert joined is job and joined.fn is fn
+    assert queue.stats["deduplicated"] == 1
+
+    release.set()
+    wait_finished(job)
+    assert job.state == "done" and job.result == "result" and job.progress == 1.0
+    assert queue.get(JOB_INGEST, "alice", None, "recipes:abc") is job
+
+
+def test_other_keys_run_their_own_job(queue):
+    fn, started, release = blocking_job()
+    first = queue.submit(JOB_INGEST, fn, resource="recipes:abc")
+    second = queue.submit(JOB_INGEST, lambda job: "second", resource="recipes:def")
+    private = queue.submit(JOB_INGEST, lambda job: "private", user_id="alice", resource="recipes:abc")
+    assert len({first.id, second.id, private.id}) == 3
+    assert wait_finished(second).result == "second"
+    assert wait_finished(private).result == "private"
+    release.set()
+    wait_finished(first)
+    assert queue.stats["submitted"] == 3 and queue.stats["deduplicated"] == 0
+
+
+def test_failed_job_records_the_error_and_can_be_resubmitted(queue):
+    def fail(job):
+        raise RuntimeError("table is locked")
+
+    job = wait_finished(queue.submit(JOB_COMPACT, fail, resource="recipes"))
+    assert job.state == "failed" and job.error == "RuntimeError: table is locked"
+    assert job.progress is None and job.finished_at >= job.started_at
+    retry = wait_finished(queue.submit(JOB_COMPACT, lambda job: "ok", resource="recipes"))
+    assert retry is not job and retry.state == "done"
+    assert queue.stats["failed"] == 1 and queue.stats["succeeded"] == 1
+
+
+def test_history_keeps_the_latest_finished_jobs(queue):
+    jobs = [wait_finished(queue.submit(JOB_COMPACT, lambda job: None, resource=f"table{i}")) for i in range(3)]
+    assert queue.get(JOB_COMPACT, resource="table0") is None  # Trimmed
+    assert [queue.get(JOB_COMPACT, resource=f"table{i}") for i in (1, 2)] == jobs[1:]
+
+
+def test_jobs_lists_active_first_and_filters_by_user(queue):
+    fn, started, release = blocking_job()
+    done = wait_finished(queue.submit(JOB_INGEST, lambda job: None, user_id="bob", resource="a"))
+    shared = wait_finished(queue.submit(JOB_COMPACT, lambda job: None, resource="recipes"))
+    running = queue.submit(JOB_INGEST, fn, user_id="alice", resource="b")
+    assert started.wait(2.0)
+    assert queue.jobs()[0] is running
+    assert set(queue.jobs(user_id="alice")) == {running, shared}
+    assert done not in queue.jobs(user_id="alice")
+    release.set()
+    wait_finished(running)
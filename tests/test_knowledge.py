@@ -0,0 +1,85 @@
+# tests/test_knowledge.py
+# Writes of app/knowledge.py into a real LanceDB table, embedded by a hashed local model
+# (app/embedders.py) so no embeddings API is needed.
+
+import pytest
+
+pytest.importorskip("agno")
+pytest.importorskip("lancedb")
+
+from agno.document import Document
+from agno.vectordb.lancedb import LanceDb
+
+from app.embedders import LocalEmbedder, build_hashed_model
+from app.knowledge import create_table, write_documents
+from app.vector_storage import VectorLayout, search_rows, table_layout
+
+
+@pytest.fixture
+def embedder(tmp_path):
+    return LocalEmbedder(model_path=build_hashed_model(str(tmp_path / "embedder.npz")))
+
+
+@pytest.fixture
+def vector_db(tmp_path, embedder):
+    db = LanceDb(table_name="recipes", uri=str(tmp_path / "lancedb"), embedder=embedder)
+    db.create()
+    return db
+
+
+def rows(vector_db):
+    return sorted(vector_db.table.to_arrow().select(["id", "user_id"]).to_pylist(), key=lambda r: r["user_id"] or "")
+
+
+def test_private_copies_do_not_overwrite_public_rows(vector_db):
+    for user_id in (None, "alice", "bob"):
+        write_documents(vector_db, [Document(name="curry", content="Green curry paste")], user_id=user_id)
+    stored = rows(vector_db)
+    assert [r["user_id"] for r in stored] == [None, "alice", "bob"]
+    assert len({r["id"] for r in stored}) == 3
+
+
+def test_upsert_replaces_the_owners_own_row(vector_db):
+    for _ in range(2):
+        write_documents(vector_db, [Document(name="curry", content="Green curry paste")], user_id="alice")
+        write_documents(vector_db, [Document(name="curry", content="Green curry paste")])
+    assert [r["user_id"] for r in rows(vector_db)] == [None, "alice"]
+
+
+# --- Compact tables ---
+def test_compact_layout_replaces_agnos_empty_table(tmp_path, embedder, vector_db):
+    assert vector_db.exists()  # agno created a float32 table on construction
+    assert create_table(vector_db, VectorLayout(dtype="int8", dims=64)) is False
+    assert table_layout(vector_db.table.schema) == VectorLayout(dtype="int8", dims=64)
+
+    reopened = LanceDb(table_name="recipes", uri=str(tmp_path / "lancedb"), embedder=embedder)
+    assert (reopened._vector_col, reopened._id) == ("vector", "id")
+    write_documents(reopened, [Document(name="curry", content="Green curry paste"), Document(name="rice", content="Jasmine rice")])
+    write_documents(reopened, [Document(name="curry", content="Green curry paste")])  # Upsert matches on id
+    assert reopened.table.count_rows() == 2
+    hits = search_rows(reopened.table, embedder.get_embedding("Green curry paste"), limit=1)
+    assert "Green curry paste" in hits[0]["payload"]
+
+
+def test_table_with_rows_keeps_its_layout(vector_db):
+    write_documents(vector_db, [Document(name="curry", content="Green curry paste")])
+    assert create_table(vector_db, VectorLayout(dtype="float16")) is True
+    assert not table_layout(vector_db.table.schema).compact
+    assert vector_db.table.count_rows() == 1
+
+
+# --- Table jobs ---
+def test_compaction_waits_for_the_table_lock(vector_db):
+    import threading
+
+    from app.knowledge import compact_table, table_lock
+
+    write_documents(vector_db, [Document(name="curry", content="Green curry paste")])
+    result = {}
+    with table_lock("recipes"):  # As an ingestion into the table would hold it
+        thread = threading.Thread(target=lambda: result.update(compact_table(vector_db)))
+        thread.start()
+        thread.join(0.3)
+        assert thread.is_alive() and not result
+    thread.join(5.0)
+    assert result["fragments_after"] <= result["fragments_before"]
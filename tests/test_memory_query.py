@@ -0,0 +1,90 @@
+# tests/test_memory_query.py
+# SQL-side paging, search and topic filters of app/memory_query.py over memories written
+# by agno's own Memory.add_user_memory into a SQLite memory table.
+
+import pytest
+
+pytest.importorskip("agno")
+pytest.importorskip("sqlalchemy")
+
+from agno.memory.v2.db.sqlite import SqliteMemoryDb
+from agno.memory.v2.memory import Memory
+from agno.memory.v2.schema import UserMemory
+
+from app.memory_query import ListMemoryQuery, MemoryQuery
+
+MEMORIES = [
+    ("Likes green curry extra spicy", ["food", "spice"]),
+    ("Allergic to peanuts", ["health", "food"]),
+    ("Cooks for a family of four", ["household"]),
+    ("Prefers jasmine rice over sticky rice", ["food"]),
+    ("Owns a wok and a mortar", ["kitchen"]),
+]
+
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = Memory(db=SqliteMemoryDb(table_name="memories", db_file=str(tmp_path / "memory.db")))
+    for text, topics in MEMORIES:
+        memory.add_user_memory(UserMemory(memory=text, topics=topics), user_id="alice")
+    memory.add_user_memory(UserMemory(memory="Likes pad thai", topics=["food"]), user_id="bob")
+    return memory
+
+
+@pytest.fixture
+def query(memory):
+    return MemoryQuery(memory.db)
+
+
+def test_pages_read_sqlite_rows(query):
+    pages = [query.page("alice", page=n, page_size=2, sort="oldest") for n in range(3)]
+    assert pages[0].total == 5 and pages[0].pages == 3
+    assert [len(p.records) for p in pages] == [2, 2, 1]
+    records = {r.memory: r for p in pages for r in p.records}
+    assert {text: r.topics for text, r in records.items()} == dict(MEMORIES)
+    assert all(r.memory_id and r.updated_at is not None for r in records.values())
+
+
+def test_search_and_topic_filters(query):
+    assert [r.memory for r in query.page("alice", search="RICE").records] == [MEMORIES[3][0]]
+    assert query.count("alice", topic="food") == 3
+    assert query.count("alice", search="curry", topic="food") == 1
+    assert query.count("bob", topic="food") == 1
+
+
+def test_topics_are_distinct_and_per_user(query):
+    assert query.topics("alice") == ["food", "health", "household", "kitchen", "spice"]
+    assert query.topics("bob") == ["food"]
+
+
+def test_matches_the_list_fallback(memory, query):
+    fallback = ListMemoryQuery(memory)
+    for options in ({}, {"topic": "food"}, {"search": "a"}):
+        assert query.count("alice", **options) == fallback.count("alice", **options)
+    assert {r.memory for r in query.page("alice", sort="topic").records} == {r.memory for r in fallback.page("alice").records}
+
+
+def test_topics_are_cached_until_invalidated(memory, query):
+    from sqlalchemy import event
+
+    statements = []
+    event.listen(query.engine, "before_cursor_execute", lambda *args: statements.append(args[2]) if "json_each" in args[2] else None)
+    assert query.topics("alice") == query.topics("alice")
+    assert len(statements) == 1
+
+    memory.add_user_memory(UserMemory(memory="Grows Thai basil", topics=["garden"]), user_id="alice")
+    assert "garden" not in query.topics("alice")  # Still the cached list
+    query.invalidate()
+    assert "garden" in query.topics("alice")
+    assert len(statements) == 2
+
+
+def test_one_query_per_table_rebuilt_on_reconnect(memory, tmp_path):
+    from app.memory_query import get_memory_query
+
+    query = get_memory_query(memory)
+    assert get_memory_query(memory) is query
+    reconnected = Memory(db=SqliteMemoryDb(table_name="memories", db_file=str(tmp_path / "memory.db")))
+    fresh = get_memory_query(reconnected)
+    assert fresh is not query and fresh.engine is reconnected.db.db_engine
+    assert fresh.count("alice") == len(MEMORIES)
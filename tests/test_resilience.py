@@ -0,0 +1,204 @@
+# tests/test_resilience.py
+# Retries, hedging and failover of app/resilience.py against fake providers with
+# injected latency and errors.
+
+import threading
+import time
+
+import pytest
+
+from app.resilience import ModelCallError, ResilientCaller, enable_resilience, failover_stream
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeProvider:
+    """Serves scripted attempts: each is (latency, error status or None)."""
+
+    def __init__(self, *attempts, chunks=("Hel", "lo")):
+        self.attempts = list(attempts)
+        self.chunks = chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            return self.attempts.pop(0) if self.attempts else (0.0, None)
+
+    def invoke(self, prompt):
+        latency, status = self._next()
+        time.sleep(latency)
+        if status:
+            raise ProviderError(status)
+        return f"reply to {prompt}"
+
+    def invoke_stream(self, prompt):
+        latency, status = self._next()
+        time.sleep(latency)
+        if status:
+            raise ProviderError(status)
+        yield from self.chunks
+
+
+class FakeModel:
+    """Just enough of an agno Model for enable_resilience()."""
+
+    def __init__(self, provider: FakeProvider, name: str):
+        self.provider_calls = provider
+        self.provider = name
+        self.id = f"{name}-model"
+        self._tools = None
+
+    def invoke(self, prompt):
+        return self.provider_calls.invoke(prompt)
+
+    def invoke_stream(self, prompt):
+        return self.provider_calls.invoke_stream(prompt)
+
+    def response(self, prompt):
+        return self.invoke(prompt)
+
+    def response_stream(self, prompt):
+        yield from self.invoke_stream(prompt)
+
+
+def make_caller(**kwargs) -> ResilientCaller:
+    options = {"backoff_base": 0.0, "hedge": False, "timeout": 2.0, "first_token_timeout": 2.0}
+    caller = ResilientCaller(**{**options, **kwargs})
+    caller.start_turn()
+    return caller
+
+
+# --- Retries ---
+def test_call_retries_retryable_errors():
+    provider = FakeProvider((0.0, 503), (0.0, 429))
+    caller = make_caller(max_retries=2)
+    assert caller.call(provider.invoke, "hi") == "reply to hi"
+    stats = caller.end_turn()
+    assert provider.calls == 3
+    assert stats["retries"] == 2 and stats["attempts"] == 3
+
+
+def test_call_gives_up_after_max_retries():
+    provider = FakeProvider((0.0, 503), (0.0, 503), (0.0, 503))
+    caller = make_caller(max_retries=1)
+    with pytest.raises(ProviderError):
+        caller.call(provider.invoke, "hi")
+    assert provider.calls == 2
+
+
+def test_call_does_not_retry_bad_requests():
+    provider = FakeProvider((0.0, 400))
+    caller = make_caller(max_retries=3)
+    with pytest.raises(ProviderError):
+        caller.call(provider.invoke, "hi")
+    assert provider.calls == 1
+
+
+def test_stream_retries_before_first_chunk():
+    provider = FakeProvider((0.0, 502))
+    caller = make_caller(max_retries=1)
+    assert list(caller.stream(provider.invoke_stream, "hi")) == ["Hel", "lo"]
+    assert caller.end_turn()["retries"] == 1
+
+
+def test_stream_first_token_timeout():
+    provider = FakeProvider((1.0, None))
+    caller = make_caller(max_retries=0, first_token_timeout=0.1)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        list(caller.stream(provider.invoke_stream, "hi"))
+    assert time.monotonic() - start < 0.8
+    assert caller.end_turn()["timeouts"] == 1
+
+
+# --- Hedging ---
+def test_call_hedges_slow_attempt():
+    provider = FakeProvider((1.0, None), (0.0, None))
+    caller = make_caller(hedge=True, hedge_delay=0.05, hedge_call_delay=0.05)
+    start = time.monotonic()
+    assert caller.call(provider.invoke, "hi") == "reply to hi"
+    assert time.monotonic() - start < 0.8
+    stats = caller.end_turn()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_call_is_not_hedged_without_samples_or_call_delay():
+    provider = FakeProvider((0.2, None), (0.0, None))
+    caller = make_caller(hedge=True, hedge_delay=0.05)  # The stream delay does not apply to calls
+    assert caller.call(provider.invoke, "hi") == "reply to hi"
+    assert provider.calls == 1
+    assert caller.end_turn()["hedges"] == 0
+
+
+def test_stream_hedge_wins_and_slow_attempt_is_dropped():
+    provider = FakeProvider((1.0, None), (0.0, None))
+    caller = make_caller(hedge=True, hedge_delay=0.05)
+    start = time.monotonic()
+    assert list(caller.stream(provider.invoke_stream, "hi")) == ["Hel", "lo"]
+    assert time.monotonic() - start < 0.8
+    stats = caller.end_turn()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_no_hedge_when_first_attempt_is_fast():
+    provider = FakeProvider((0.0, None))
+    caller = make_caller(hedge=True, hedge_delay=0.5)
+    assert list(caller.stream(provider.invoke_stream, "hi")) == ["Hel", "lo"]
+    assert provider.calls == 1
+    assert caller.end_turn()["hedges"] == 0
+
+
+# --- Failover ---
+def test_failover_stream_switches_before_first_item():
+    def primary():
+        raise ProviderError(503)
+        yield
+
+    failures = []
+    items = list(failover_stream(primary, lambda: iter(["from", "fallback"]), failures.append))
+    assert items == ["from", "fallback"]
+    assert len(failures) == 1
+
+
+def test_failover_stream_does_not_switch_mid_stream():
+    def primary():
+        yield "partial"
+        raise ProviderError(503)
+
+    with pytest.raises(ProviderError):
+        list(failover_stream(primary, lambda: iter(["fallback"])))
+
+
+def test_model_fails_over_to_other_provider():
+    model = FakeModel(FakeProvider((0.0, 503), (0.0, 503), (0.0, 503)), "openai")
+    fallback = FakeModel(FakeProvider(), "anthropic")
+    model._tools = [{"name": "search"}]
+    caller = make_caller(max_retries=2)
+    enable_resilience(model, caller, fallback_model=fallback)
+
+    assert model.response("hi") == "reply to hi"
+    assert fallback._tools == [{"name": "search"}]  # The agent's call state moved over
+    assert caller.end_turn()["failover"] == "anthropic/anthropic-model"
+
+
+def test_streamed_failover_to_other_provider():
+    model = FakeModel(FakeProvider((0.0, 500)), "openai")
+    fallback = FakeModel(FakeProvider(chunks=("Hi", "!")), "anthropic")
+    caller = make_caller(max_retries=0)
+    enable_resilience(model, caller, fallback_model=fallback)
+    assert list(model.response_stream("hi")) == ["Hi", "!"]
+
+
+def test_no_failover_for_bad_requests():
+    model = FakeModel(FakeProvider((0.0, 400)), "openai")
+    fallback = FakeModel(FakeProvider(), "anthropic")
+    enable_resilience(model, make_caller(), fallback_model=fallback)
+    with pytest.raises(ModelCallError):
+        model.response("hi")
+    assert fallback.provider_calls.calls == 0
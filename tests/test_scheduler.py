@@ -0,0 +1,88 @@
+# tests/test_scheduler.py
+# Admission order and limits of app/scheduler.py with turns waiting on real threads.
+
+import threading
+import time
+
+import pytest
+
+from app.scheduler import AdmissionError, TurnScheduler
+
+
+def acquire_in_thread(scheduler, user_id, key="default", positions=None):
+    """Starts acquire() on a thread; the returned dict gets the ticket once admitted."""
+    result = {}
+
+    def run():
+        on_wait = (lambda position, waited: positions.append(position)) if positions is not None else None
+        try:
+            result["ticket"] = scheduler.acquire(user_id, key, on_wait=on_wait, timeout=5.0)
+            result["admitted"] = time.monotonic()
+        except AdmissionError as e:  # Turns a test leaves queued time out after it ends
+            result["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    result["thread"] = thread
+    return result
+
+
+def wait_for_queue(scheduler, depth):
+    deadline = time.monotonic() + 2.0
+    while scheduler.snapshot()["queue_depth"] < depth:
+        assert time.monotonic() < deadline, "turns never queued"
+        time.sleep(0.01)
+
+
+def test_throttled_provider_does_not_block_other_providers():
+    scheduler = TurnScheduler(max_in_flight=4, provider_rates={"openai": 0.5}, burst=1)
+    scheduler.release(scheduler.acquire("alice", "openai"))  # Spends openai's only token
+
+    positions = []
+    throttled = acquire_in_thread(scheduler, "alice", "openai", positions)
+    wait_for_queue(scheduler, 1)
+    start = time.monotonic()
+    other = acquire_in_thread(scheduler, "bob", "anthropic")
+    other["thread"].join(1.0)
+    assert "ticket" in other and other["admitted"] - start < 0.5
+    assert "ticket" not in throttled and positions and positions[-1] == 0
+
+    throttled["thread"].join(5.0)
+    assert throttled["ticket"].throttled
+    assert scheduler.snapshot()["throttled"] == 1
+
+
+def test_turns_are_admitted_by_fair_share():
+    scheduler = TurnScheduler(max_in_flight=2, max_per_user=4)
+    scheduler.acquire("alice")  # Alice keeps one turn running
+    carol = scheduler.acquire("carol")
+    heavy = acquire_in_thread(scheduler, "alice")
+    wait_for_queue(scheduler, 1)
+    light = acquire_in_thread(scheduler, "bob")
+    wait_for_queue(scheduler, 2)
+
+    scheduler.release(carol)
+    light["thread"].join(1.0)
+    # Bob's turn arrived later but ranks ahead of Alice's second one
+    assert "ticket" in light and "ticket" not in heavy
+
+
+def test_user_at_limit_is_passed_over():
+    scheduler = TurnScheduler(max_in_flight=4, max_per_user=1)
+    scheduler.acquire("alice")
+    blocked = acquire_in_thread(scheduler, "alice")
+    wait_for_queue(scheduler, 1)
+    other = acquire_in_thread(scheduler, "bob")
+    other["thread"].join(1.0)
+    assert "ticket" in other and "ticket" not in blocked
+
+
+def test_full_queue_rejects_and_waits_time_out():
+    scheduler = TurnScheduler(max_in_flight=1, max_queue=1)
+    scheduler.acquire("alice")
+    acquire_in_thread(scheduler, "bob")
+    wait_for_queue(scheduler, 1)
+    with pytest.raises(AdmissionError):
+        scheduler.acquire("carol")
+    with pytest.raises(AdmissionError):
+        TurnScheduler(max_in_flight=0).acquire("dave", timeout=0.1)
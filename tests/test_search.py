@@ -0,0 +1,127 @@
+# tests/test_search.py
+# Cached web search of app/search.py against the offline stub backend, and the TTLCache,
+# SingleFlight and TokenBucket helpers of app/utils.py it is built on.
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("agno")
+
+from app.search import CachedSearchTools, StubSearchBackend, normalize_query
+from app.utils import SingleFlight, TTLCache, TokenBucket
+
+
+def make_tools(latency=0.0, rate=100.0, burst=100):
+    backend = StubSearchBackend(latency=latency)
+    tools = CachedSearchTools(
+        backend=backend, cache=TTLCache(maxsize=16, ttl=60), flight=SingleFlight(),
+        limiter=TokenBucket(rate=rate, capacity=burst),
+    )
+    return tools, backend
+
+
+# --- CachedSearchTools ---
+def test_normalized_repeat_is_a_cache_hit():
+    tools, backend = make_tools()
+    first = tools.duckduckgo_search("Best  Pad Thai?")
+    assert tools.duckduckgo_search("best pad thai") == first
+    assert tools.duckduckgo_news("best pad thai") != first  # Search and news are cached apart
+    assert backend.calls == 2
+    stats = tools.stats()
+    assert stats["backend_calls"] == 2 and stats["hits"] == 1
+    assert normalize_query("  Ｐad   THAI!? ") == "pad thai"
+
+
+def test_concurrent_misses_share_one_backend_call():
+    tools, backend = make_tools(latency=0.2)
+    barrier = threading.Barrier(4)
+    results = []
+
+    def search():
+        barrier.wait()
+        results.append(tools.duckduckgo_search("green curry", max_results=3))
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5.0)
+    assert len(results) == 4 and len(set(results)) == 1
+    assert backend.calls == 1
+    assert tools.stats()["backend_calls"] == 1 and tools.stats()["coalesced"] == 3
+
+
+def test_misses_wait_for_the_rate_limiter():
+    tools, backend = make_tools(rate=10.0, burst=1)
+    start = time.monotonic()
+    tools.duckduckgo_search("ramen")
+    tools.duckduckgo_search("udon")  # Waits ~0.1s for the next token
+    assert time.monotonic() - start >= 0.08
+    assert backend.calls == 2 and tools.stats()["rate_limited_wait"] >= 0.08
+
+
+def test_rate_limit_timeout_raises_and_caches_nothing(monkeypatch):
+    monkeypatch.setattr("app.search.SEARCH_RATE_TIMEOUT", 0.05)
+    tools, backend = make_tools(rate=0.1, burst=1)
+    tools.duckduckgo_search("ramen")
+    with pytest.raises(RuntimeError, match="rate limit"):
+        tools.duckduckgo_search("udon")
+    assert backend.calls == 1 and tools.cache.get(("search", "udon", 5)) is None
+
+
+# --- TTLCache ---
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.evictions == 1
+    time.sleep(0.06)
+    assert cache.get("a", "gone") == "gone" and len(cache) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+# --- SingleFlight ---
+def test_single_flight_shares_errors_and_forgets_finished_keys():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        assert release.wait(5.0)
+        raise ValueError("backend down")
+
+    def call(fn):
+        try:
+            flight.do("key", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call, args=(fail,))
+    leader.start()
+    assert started.wait(2.0)
+    waiting = threading.Thread(target=call, args=(lambda: "not called",))
+    waiting.start()
+    while flight.coalesced == 0:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5.0)
+    waiting.join(5.0)
+    assert [str(e) for e in errors] == ["backend down"] * 2
+    assert flight.do("key", lambda: "fresh") == "fresh"  # Finished keys run again
+
+
+# --- TokenBucket ---
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=20.0, capacity=2)
+    assert bucket.try_acquire() == 0.0 and bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == pytest.approx(0.05, abs=0.01)
+    assert not bucket.acquire(timeout=0.01)
+    start = time.monotonic()
+    assert bucket.acquire(timeout=1.0)
+    assert time.monotonic() - start < 0.2
+    assert TokenBucket(rate=0.0, capacity=1).wait_time(2) == float("inf")